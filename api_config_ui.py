@@ -2,7 +2,7 @@ import os
 import time
 import json
 import requests
-from PyQt6.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton, QFileDialog, QTableWidget, QTableWidgetItem, QMessageBox, QLabel, QFormLayout, QSpinBox, QComboBox, QDialogButtonBox, QTextEdit
+from PyQt6.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton, QFileDialog, QTableWidget, QTableWidgetItem, QMessageBox, QLabel, QFormLayout, QSpinBox, QComboBox, QDialogButtonBox, QTextEdit, QCheckBox
 from PyQt6.QtCore import Qt
 from PyQt6.QtWidgets import QApplication
 from config_manager import ConfigManager, APIConfig
@@ -36,6 +36,30 @@ class EditConfigDialog(QDialog):
         self.system_prompt = QTextEdit()
         self.system_prompt.setPlaceholderText("例如：你是字幕提取助手，仅输出清晰可读的字幕文本")
         self.system_prompt.setFixedHeight(60)
+        self.image_format = QComboBox()
+        self.image_format.addItems(["png", "jpeg", "webp"])
+        self.image_quality = QSpinBox()
+        self.image_quality.setRange(1, 100)
+        self.image_quality.setValue(90)
+        self.image_grayscale = QCheckBox("灰度")
+        self.image_text_height = QSpinBox()
+        self.image_text_height.setRange(0, 1000)
+        self.image_text_height.setSuffix(" px")
+        self.image_text_height.setSpecialValueText("不缩放")
+        self.image_max_pixels = QSpinBox()
+        self.image_max_pixels.setRange(0, 100000000)
+        self.image_max_pixels.setSingleStep(10000)
+        self.image_max_pixels.setSpecialValueText("不限制")
+        self.rpm = QSpinBox()
+        self.rpm.setRange(0, 1000000)
+        self.rpm.setSpecialValueText("不限制")
+        self.tpm = QSpinBox()
+        self.tpm.setRange(0, 100000000)
+        self.tpm.setSingleStep(1000)
+        self.tpm.setSpecialValueText("不限制")
+        self.max_concurrency = QSpinBox()
+        self.max_concurrency.setRange(0, 1000)
+        self.max_concurrency.setSpecialValueText("不限制")
         self.toggle_btn = QPushButton("👁")
         self.copy_btn = QPushButton("复制")
         self.test_btn = QPushButton("测试")
@@ -61,6 +85,22 @@ class EditConfigDialog(QDialog):
         f.addRow("密钥", ak)
         f.addRow("Prompt", self.prompt)
         f.addRow("System Prompt", self.system_prompt)
+        enc = QHBoxLayout()
+        enc.addWidget(self.image_format)
+        enc.addWidget(QLabel("质量"))
+        enc.addWidget(self.image_quality)
+        enc.addWidget(self.image_grayscale)
+        f.addRow("图片编码", enc)
+        f.addRow("目标字高", self.image_text_height)
+        f.addRow("最大像素", self.image_max_pixels)
+        lim = QHBoxLayout()
+        lim.addWidget(QLabel("RPM"))
+        lim.addWidget(self.rpm)
+        lim.addWidget(QLabel("TPM"))
+        lim.addWidget(self.tpm)
+        lim.addWidget(QLabel("并发"))
+        lim.addWidget(self.max_concurrency)
+        f.addRow("速率限制", lim)
         tl = QHBoxLayout()
         tl.addWidget(self.test_btn)
         tl.addWidget(self.result_label)
@@ -88,6 +128,14 @@ class EditConfigDialog(QDialog):
             self.mode.setCurrentIndex(0)
             self.prompt.setPlainText(cfg.prompt or "")
             self.system_prompt.setPlainText(cfg.system_prompt or "")
+            self.image_format.setCurrentText(cfg.image_format or "png")
+            self.image_quality.setValue(cfg.image_quality)
+            self.image_grayscale.setChecked(cfg.image_grayscale)
+            self.image_text_height.setValue(cfg.image_text_height)
+            self.image_max_pixels.setValue(cfg.image_max_pixels)
+            self.rpm.setValue(cfg.rpm)
+            self.tpm.setValue(cfg.tpm)
+            self.max_concurrency.setValue(cfg.max_concurrency)
         self.toggle_btn.clicked.connect(self.on_toggle)
         self.copy_btn.clicked.connect(self.on_copy)
         self.test_btn.clicked.connect(self.on_test)
@@ -99,8 +147,24 @@ class EditConfigDialog(QDialog):
     def build(self) -> APIConfig:
         enc = self.manager.encrypt_key(self.api_key.text())
         if self.cfg:
-            return APIConfig(id=self.cfg.id, name=self.name.text(), url=self.url.text(), api_key_enc=enc, model=self.model.text(), timeout=self.timeout.value(), group=self.group.text() or "default", note=self.note.text(), prompt=self.prompt.toPlainText().strip(), system_prompt=self.system_prompt.toPlainText().strip(), api_base=self.api_base.text().strip(), api_path=(self.api_path.text().strip() or "/v1/chat/completions"), mode="openai")
-        return APIConfig(name=self.name.text(), url=self.url.text(), api_key_enc=enc, model=self.model.text(), timeout=self.timeout.value(), group=self.group.text() or "default", note=self.note.text(), prompt=self.prompt.toPlainText().strip(), system_prompt=self.system_prompt.toPlainText().strip(), api_base=self.api_base.text().strip(), api_path=(self.api_path.text().strip() or "/v1/chat/completions"), mode="openai")
+            return APIConfig(id=self.cfg.id, name=self.name.text(), url=self.url.text(), api_key_enc=enc, model=self.model.text(), timeout=self.timeout.value(), group=self.group.text() or "default", note=self.note.text(), prompt=self.prompt.toPlainText().strip(), system_prompt=self.system_prompt.toPlainText().strip(), api_base=self.api_base.text().strip(), api_path=(self.api_path.text().strip() or "/v1/chat/completions"), mode="openai", **self._image_settings(), **self._limit_settings())
+        return APIConfig(name=self.name.text(), url=self.url.text(), api_key_enc=enc, model=self.model.text(), timeout=self.timeout.value(), group=self.group.text() or "default", note=self.note.text(), prompt=self.prompt.toPlainText().strip(), system_prompt=self.system_prompt.toPlainText().strip(), api_base=self.api_base.text().strip(), api_path=(self.api_path.text().strip() or "/v1/chat/completions"), mode="openai", **self._image_settings(), **self._limit_settings())
+
+    def _image_settings(self) -> dict:
+        return {
+            "image_format": self.image_format.currentText(),
+            "image_quality": self.image_quality.value(),
+            "image_grayscale": self.image_grayscale.isChecked(),
+            "image_text_height": self.image_text_height.value(),
+            "image_max_pixels": self.image_max_pixels.value(),
+        }
+
+    def _limit_settings(self) -> dict:
+        return {
+            "rpm": self.rpm.value(),
+            "tpm": self.tpm.value(),
+            "max_concurrency": self.max_concurrency.value(),
+        }
 
     def update_full(self):
         base = (self.api_base.text() or "").rstrip('/')
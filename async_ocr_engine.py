@@ -0,0 +1,313 @@
+"""
+Async OCR Engine Module
+asyncio OpenAI-compatible engine over a bounded keep-alive connection pool
+"""
+
+import asyncio
+import json
+import ssl
+from urllib.parse import urlsplit
+
+from metrics import NULL_METRICS
+from ocr_engine import (CHAT_COMPLETIONS_PATH, encode_image, build_headers, build_payload, check_completion,
+                        build_batch_request, split_batch_answer, encode_settings_from_config, OCRRequestError,
+                        RetryPolicy, AdaptiveDeadline, classify_status, parse_retry_after, completion_tokens,
+                        estimate_request_tokens, ERROR_TIMEOUT, ERROR_CONNECTION, ERROR_PROTOCOL, ERROR_RATE_LIMIT)
+from rate_limiter import limiter_for_config
+
+
+class _Connection:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    def is_usable(self):
+        return not self.writer.is_closing() and not self.reader.at_eof()
+
+    def close(self):
+        try:
+            self.writer.close()
+        except Exception:
+            pass
+
+
+class AsyncConnectionPool:
+    """Minimal HTTP/1.1 client keeping up to `max_connections` keep-alive sockets to one host"""
+
+    def __init__(self, base_url, max_connections=16):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme or "http"
+        self.host = parts.hostname or "localhost"
+        default_port = 443 if self.scheme == "https" else 80
+        self.port = parts.port or default_port
+        # Host header per RFC 7230: IPv6 literals in brackets, the port unless it is the scheme's default
+        host = f"[{self.host}]" if ":" in self.host else self.host
+        self.host_header = host if self.port == default_port else f"{host}:{self.port}"
+        self.base_path = parts.path.rstrip('/')
+        self.max_connections = max_connections
+        self._ssl = ssl.create_default_context() if self.scheme == "https" else None
+        self._idle = []
+        self._slots = asyncio.Semaphore(max_connections)
+        self.opened = 0  # Total sockets opened, useful to confirm reuse
+
+    async def _open(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port, ssl=self._ssl)
+        self.opened += 1
+        return _Connection(reader, writer)
+
+    async def _acquire(self):
+        while self._idle:
+            conn = self._idle.pop()
+            if conn.is_usable():
+                return conn, True
+            conn.close()
+        return await self._open(), False
+
+    async def _read_body(self, reader, headers):
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size_line = await reader.readline()
+                size = int(size_line.split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    # Trailer section ends with an empty line
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    return b"".join(chunks)
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+        if "content-length" in headers:
+            return await reader.readexactly(int(headers["content-length"]))
+        return await reader.read()
+
+    async def _exchange(self, conn, request):
+        conn.writer.write(request)
+        await conn.writer.drain()
+        status_line = await conn.reader.readline()
+        if not status_line:
+            raise ConnectionResetError("connection closed by server")
+        version, status = status_line.split()[:2]
+        status = int(status)
+        headers = {}
+        while True:
+            line = await conn.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            k, _, v = line.decode("latin-1").partition(":")
+            headers[k.strip().lower()] = v.strip()
+        body = await self._read_body(conn.reader, headers)
+        connection = headers.get("connection", "").lower()
+        if version == b"HTTP/1.0":
+            persistent = connection == "keep-alive"
+        else:
+            persistent = connection != "close"
+        framed = "content-length" in headers or headers.get("transfer-encoding", "").lower() == "chunked"
+        return status, body, headers, persistent and framed
+
+    async def post_json(self, path, payload, headers, timeout):
+        return await self.post(path, json.dumps(payload).encode("utf-8"), headers, timeout)
+
+    async def post(self, path, body, headers, timeout):
+        lines = [f"POST {self.base_path}/{path.lstrip('/')} HTTP/1.1", f"Host: {self.host_header}", f"Content-Length: {len(body)}", "Connection: keep-alive"]
+        lines += [f"{k}: {v}" for k, v in headers.items()]
+        request = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+        async with self._slots:
+            # One deadline covers connecting too, so an unreachable host times out like a slow answer
+            return await asyncio.wait_for(self._send(request), timeout)
+
+    async def _send(self, request):
+        conn, reused = await self._acquire()
+        try:
+            try:
+                status, data, headers, keep = await self._exchange(conn, request)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                if not reused:
+                    raise
+                # The server dropped an idle keep-alive socket; retry once on a fresh one
+                conn.close()
+                conn = await self._open()
+                status, data, headers, keep = await self._exchange(conn, request)
+        except BaseException:
+            conn.close()
+            raise
+        if keep:
+            self._idle.append(conn)
+        else:
+            conn.close()
+        return status, data, headers
+
+    async def close(self):
+        while self._idle:
+            self._idle.pop().close()
+
+
+class AsyncOpenAIOCREngine:
+    """OpenAI-compatible engine for asyncio callers
+
+    At most `max_in_flight` requests are outstanding at once, all sharing one
+    pool of keep-alive connections. The pool belongs to the event loop that
+    first used it and is dropped by aclose(). Retries and deadlines work as in
+    OpenAIOCREngine.
+    """
+
+    is_async = True
+    metrics = NULL_METRICS  # Set by the extractor when instrumentation is on
+
+    def __init__(self, endpoint, api_key, model, prompt, system_prompt=None, max_in_flight=16, timeout=30,
+                 encode_settings=None, path=CHAT_COMPLETIONS_PATH, retry_policy=None, limiter=None):
+        self.endpoint = endpoint
+        self.api_key = api_key
+        self.model = model
+        self.prompt = prompt
+        self.system_prompt = system_prompt or ""
+        self.encode_settings = encode_settings
+        self.path = path
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.limiter = limiter
+        self.deadlines = {}
+        self.retries = 0
+        self.batch_fallbacks = 0
+        self._pool = None
+
+    @classmethod
+    def from_config(cls, cfg, api_key, prompt=None, max_in_flight=16):
+        return cls(cfg.api_base or cfg.url, api_key, cfg.model, prompt or cfg.prompt, cfg.system_prompt,
+                   max_in_flight=max_in_flight, timeout=cfg.timeout,
+                   encode_settings=encode_settings_from_config(cfg), path=cfg.api_path or CHAT_COMPLETIONS_PATH,
+                   limiter=limiter_for_config(cfg))
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = AsyncConnectionPool(self.endpoint, self.max_in_flight)
+        return self._pool
+
+    def _deadline(self, n_images):
+        deadline = self.deadlines.get(n_images)
+        if deadline is None:
+            deadline = self.deadlines[n_images] = AdaptiveDeadline(self.timeout)
+        return deadline
+
+    def _estimate_tokens(self, images):
+        if self.limiter is None or not self.limiter.tpm:
+            return 0
+        return estimate_request_tokens(images, self.prompt, self.system_prompt)
+
+    async def _post(self, pool, body, timeout):
+        """Send one serialized chat completion and return (answer text, tokens used or None); raises OCRRequestError"""
+        metrics = self.metrics
+        metrics.inc("requests")
+        try:
+            with metrics.timer("engine.http"):
+                status, data, headers = await pool.post(self.path, body, build_headers(self.api_key), timeout)
+            kind = classify_status(status)
+            if kind is not None:
+                raise OCRRequestError(kind, f"HTTP {status}", retry_after=parse_retry_after(headers.get("retry-after")))
+            metrics.observe_size("response", len(data))
+            with metrics.timer("engine.parse"):
+                j = json.loads(data)
+                return check_completion(j), completion_tokens(j)
+        except OCRRequestError:
+            metrics.inc("request_errors")
+            raise
+        except asyncio.TimeoutError:
+            metrics.inc("request_errors")
+            raise OCRRequestError(ERROR_TIMEOUT, f"no response within {timeout:.1f}s")
+        except (OSError, asyncio.IncompleteReadError) as e:
+            metrics.inc("request_errors")
+            raise OCRRequestError(ERROR_CONNECTION, str(e) or type(e).__name__)
+        except ValueError as e:
+            metrics.inc("request_errors")
+            raise OCRRequestError(ERROR_PROTOCOL, f"invalid response: {e}")
+
+    async def _request(self, pool, payload, n_images, should_stop, tokens=0):
+        """Send with retries; returns the answer text, or "" if should_stop() turns true while waiting"""
+        metrics = self.metrics
+        with metrics.timer("engine.serialize"):
+            body = json.dumps(payload).encode("utf-8")
+        metrics.observe_size("request", len(body))
+        deadline = self._deadline(n_images)
+        limiter = self.limiter
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        while True:
+            if limiter is not None:
+                waited = await limiter.acquire_async(tokens, should_stop)
+                if waited is None:
+                    return ""
+                metrics.observe_time("engine.queue_wait", waited)
+            t0 = loop.time()
+            try:
+                text, used = await self._post(pool, body, deadline.current(attempt))
+            except OCRRequestError as e:
+                if limiter is not None:
+                    limiter.release()
+                    if e.kind == ERROR_RATE_LIMIT and e.retry_after:
+                        limiter.pause(min(self.retry_policy.max_retry_after, e.retry_after))
+                if not self.retry_policy.should_retry(e.kind, attempt):
+                    metrics.inc("request_failures")
+                    raise OCRRequestError(e.kind, e.message, attempt + 1, e.retry_after)
+                self.retries += 1
+                metrics.inc(f"retries_{e.kind}")
+                end = loop.time() + self.retry_policy.delay(e, attempt)
+                while loop.time() < end:
+                    if should_stop and should_stop():
+                        return ""
+                    await asyncio.sleep(min(0.1, end - loop.time()))
+                attempt += 1
+                continue
+            except BaseException:
+                # Includes cancellation, e.g. the losing half of a hedged request
+                if limiter is not None:
+                    limiter.release()
+                raise
+            if limiter is not None:
+                limiter.release(tokens, used)
+            deadline.observe(loop.time() - t0)
+            return text
+
+    async def recognize_async(self, image_bgr, should_stop=None):
+        return await self._recognize(self._get_pool(), image_bgr, should_stop)
+
+    async def _recognize(self, pool, image_bgr, should_stop):
+        if should_stop and should_stop():
+            return ""
+        loop = asyncio.get_running_loop()
+        # PNG encoding releases the GIL, so keep it off the event loop
+        image_url = await loop.run_in_executor(None, encode_image, image_bgr, self.encode_settings, self.metrics)
+        payload = build_payload(self.model, self.prompt, self.system_prompt, [image_url])
+        return await self._request(pool, payload, 1, should_stop, self._estimate_tokens([image_bgr]))
+
+    async def recognize_batch_async(self, images, should_stop=None, strategy="multi_image"):
+        """Batched counterpart of OpenAIOCREngine.recognize_batch"""
+        if len(images) == 1:
+            return [await self.recognize_async(images[0], should_stop)]
+        if should_stop and should_stop():
+            return [""] * len(images)
+        loop = asyncio.get_running_loop()
+        payload = await loop.run_in_executor(None, build_batch_request, self.model, self.prompt,
+                                             self.system_prompt, images, strategy, self.encode_settings, self.metrics)
+        text = await self._request(self._get_pool(), payload, len(images), should_stop, self._estimate_tokens(images))
+        if should_stop and should_stop():
+            return [""] * len(images)
+        parts = split_batch_answer(text, len(images))
+        if parts is None:
+            self.batch_fallbacks += 1
+            return list(await asyncio.gather(*[self.recognize_async(img, should_stop) for img in images]))
+        return parts
+
+    def recognize(self, image_bgr, should_stop=None):
+        """Blocking convenience wrapper using a short-lived event loop and connection"""
+        async def once():
+            pool = AsyncConnectionPool(self.endpoint, 1)
+            try:
+                return await self._recognize(pool, image_bgr, should_stop)
+            finally:
+                await pool.close()
+        return asyncio.run(once())
+
+    async def aclose(self):
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
@@ -0,0 +1,4 @@
+"""
+Benchmark Suite
+Synthetic subtitled videos, a mock OpenAI-compatible server and a runner
+"""
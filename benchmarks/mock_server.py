@@ -0,0 +1,161 @@
+"""
+Mock Server Module
+Local OpenAI-compatible chat completions server answering with ground truth
+
+Images are decoded with synthetic.read_code and mapped back to subtitle text,
+after sleeping for a latency drawn from a configurable distribution:
+    fixed:MS            e.g. fixed:200
+    uniform:MIN,MAX     e.g. uniform:100,400
+    lognormal:MEDIAN,SIGMA   e.g. lognormal:300,0.5 (heavy tail, like real model servers)
+With `rpm` set, requests beyond that many in the last minute get 429 with Retry-After,
+like a hosted provider enforcing its rate limit.
+"""
+
+import base64
+import collections
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import cv2
+import numpy as np
+
+from ocr_engine import MOSAIC_SEPARATOR_PX
+from benchmarks.synthetic import read_code
+
+_MOSAIC_COUNT = re.compile(r"由(\d+)个字幕条")
+TOKENS_PER_IMAGE = 100  # Reported in the usage block, roughly a 1280x56 crop in 28px patches
+
+
+def parse_latency(spec):
+    """Return a function giving one latency sample in seconds"""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",")] if args else []
+    if kind == "fixed":
+        return lambda rng: values[0] / 1000
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == "lognormal":
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1]) / 1000
+    raise ValueError(f"unknown latency distribution: {spec}")
+
+
+class MockOCRServer:
+    """Threaded HTTP server; `texts` maps subtitle id to text"""
+
+    def __init__(self, texts, latency="fixed:0", error_rate=0.0, seed=0, port=0, rpm=0):
+        self.texts = texts
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.rpm = rpm
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.images = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.latencies = []
+        self._accepted = collections.deque()  # Arrival times within the last minute, for `rpm`
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                retry_after = server.over_limit()
+                if retry_after is not None:
+                    status, payload = 429, {"error": {"message": "rate limit exceeded"}}
+                else:
+                    status, payload = server.handle(json.loads(body))
+                out = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(out)))
+                if retry_after is not None:
+                    self.send_header("Retry-After", str(retry_after))
+                self.end_headers()
+                try:
+                    self.wfile.write(out)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # Client gave up on the request, e.g. a cancelled hedge
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def reset_counters(self):
+        with self.lock:
+            self.requests = self.images = self.errors = self.rate_limited = 0
+            self.latencies = []
+            self._accepted.clear()
+
+    def over_limit(self):
+        """Whole seconds until the next request would be accepted, or None to accept this one"""
+        if not self.rpm:
+            return None
+        now = time.monotonic()
+        with self.lock:
+            while self._accepted and self._accepted[0] <= now - 60:
+                self._accepted.popleft()
+            if len(self._accepted) >= self.rpm:
+                self.rate_limited += 1
+                return max(1, math.ceil(self._accepted[0] + 60 - now))
+            self._accepted.append(now)
+        return None
+
+    def _answer(self, image):
+        return self.texts.get(read_code(image), "")
+
+    def handle(self, request):
+        content = request["messages"][-1]["content"]
+        prompt = next((c["text"] for c in content if c["type"] == "text"), "")
+        images = []
+        for part in content:
+            if part["type"] == "image_url":
+                data = base64.b64decode(part["image_url"]["url"].split(",", 1)[1])
+                images.append(cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR))
+        m = _MOSAIC_COUNT.search(prompt)
+        if m and len(images) == 1:
+            k = int(m.group(1))
+            h = (images[0].shape[0] - MOSAIC_SEPARATOR_PX * (k - 1)) // k
+            images = [images[0][n * (h + MOSAIC_SEPARATOR_PX):n * (h + MOSAIC_SEPARATOR_PX) + h] for n in range(k)]
+        with self.lock:
+            self.requests += 1
+            self.images += len(images)
+            delay = self.latency(self.rng)
+            fail = self.rng.random() < self.error_rate
+            self.latencies.append(delay)
+        time.sleep(delay)
+        if fail:
+            with self.lock:
+                self.errors += 1
+            return 503, {"error": {"message": "mock overload"}}
+        texts = [self._answer(img) for img in images]
+        if len(texts) > 1:
+            answer = "\n".join(f"[{n + 1}] {t}" for n, t in enumerate(texts))
+        else:
+            answer = texts[0] if texts else ""
+        return 200, {"choices": [{"message": {"role": "assistant", "content": answer}}],
+                     "usage": {"total_tokens": TOKENS_PER_IMAGE * len(images) + len(prompt)}}
@@ -0,0 +1,128 @@
+"""
+Post-processing Benchmark
+Times the compiled post-processing pipeline against the hard-coded filter it replaced
+
+    python -m benchmarks.postprocess_bench                      # synthetic corpus
+    python -m benchmarks.postprocess_bench --size 500000
+    python -m benchmarks.postprocess_bench --corpus out.srt.journal --config configs
+
+--corpus reads JSON lines with "raw_text" or "text" fields (journals, exported results).
+Reject decisions of the two filters are compared; any disagreement is printed.
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+
+from benchmarks.synthetic import WORDS
+from postprocess import PostProcessor, load_postprocessor, format_hits
+
+DESCRIPTIVE = ["图中无字幕", "没有字幕", "图片中没有可读的文字", "画面中无文字内容", "未发现字幕",
+               "No subtitles.", "no readable text", "Nothing", "EMPTY", "该图没有内容",
+               "截图中无字幕", "这是一帧视频截图", "字幕：", "文本为空", "视频画面"]
+
+
+def legacy_filter(text):
+    """The filter post-processing replaced, kept verbatim as the reference"""
+    if not text:
+        return ""
+    no_subtitle_patterns = [
+        "图中无", "没有字幕", "无字幕", "没有文字", "无文字",
+        "没有可读", "无可读", "没有内容", "无内容",
+        "图片中无", "图片中没有", "画面无", "画面中无",
+        "未发现", "未找到", "不存在",
+        "no subtitle", "no text", "no readable",
+        "no content", "nothing", "empty",
+        "图中", "图片中", "画面", "此图", "该图",
+        "截图", "视频", "帧",
+    ]
+    text_lower = text.lower()
+    for pattern in no_subtitle_patterns:
+        if pattern in text_lower:
+            if len(text) <= 20 or text_lower.strip() == pattern:
+                return ""
+    description_indicators = [
+        "字幕", "文字", "文本", "内容",
+        "截图", "图片", "画面", "视频", "帧",
+    ]
+    if len(text) <= 15:
+        for indicator in description_indicators:
+            if indicator in text_lower:
+                return ""
+    return text
+
+
+def synthetic_corpus(size, seed=0, descriptive_ratio=0.1):
+    """Subtitle-like answers mixed with descriptive "no subtitles" answers"""
+    rng = random.Random(seed)
+    out = []
+    for _ in range(size):
+        if rng.random() < descriptive_ratio:
+            out.append(rng.choice(DESCRIPTIVE))
+        else:
+            lines = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 8))) for _ in range(rng.randint(1, 2))]
+            out.append("\n".join(lines))
+    return out
+
+
+def read_corpus(path):
+    out = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict):
+                text = record.get("raw_text", record.get("text"))
+                if isinstance(text, str):
+                    out.append(text)
+    return out
+
+
+def time_filter(fn, corpus, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for text in corpus:
+            fn(text)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="后处理规则基准测试")
+    parser.add_argument("--corpus", help="JSON Lines 文件（raw_text/text 字段），默认使用合成语料")
+    parser.add_argument("--size", type=int, default=200000, help="合成语料条数")
+    parser.add_argument("--config", help="包含 postprocess.json 的目录，默认内置规则")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    corpus = read_corpus(args.corpus) if args.corpus else synthetic_corpus(args.size, args.seed)
+    if not corpus:
+        print("语料为空")
+        return 1
+    processor = load_postprocessor(args.config) if args.config else PostProcessor()
+
+    mismatched = [t for t in corpus if (legacy_filter(t) == "") != (processor.apply(t) == "")]
+    legacy_s = time_filter(legacy_filter, corpus, args.repeat)
+    timing = PostProcessor(processor.spec)
+    compiled_s = time_filter(timing.apply, corpus, args.repeat)
+
+    n = len(corpus)
+    print(f"语料 {n} 条 | 旧过滤 {legacy_s * 1e6 / n:.2f}us/条 | 新管线 {compiled_s * 1e6 / n:.2f}us/条 | "
+          f"{legacy_s / compiled_s:.2f}x")
+    for stage in timing.stages:
+        print(f"  {stage.name:<24}{time_filter(stage.apply, corpus, args.repeat) * 1e6 / n:.2f}us/条")
+    print(f"命中: {format_hits(processor.stats())}")
+    print(f"拒绝判定不一致: {len(mismatched)}")
+    for text in mismatched[:10]:
+        print(f"  {text!r}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""
+Benchmark Runner
+Runs Extractor over synthetic videos against the mock server and records the results as JSON
+
+    python -m benchmarks.run                       # default scenarios, results in benchmarks/results/
+    python -m benchmarks.run --latency lognormal:300,0.5 --workers 8
+    python -m benchmarks.run --scenario 720p30_dense --compare benchmarks/results/old.json
+    python -m benchmarks.run --server-rpm 600 --rpm 600  # provider limit, enforced client-side too
+
+Every scenario runs in a fresh process so peak RSS is per scenario.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from benchmarks.synthetic import generate
+from benchmarks.mock_server import MockOCRServer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# name: (width, height, fps, duration_ms, mean_on_ms, gap_ratio)
+SCENARIOS = {
+    "360p25_sparse": (640, 360, 25.0, 60000, 3500, 0.5),
+    "720p30_dense": (1280, 720, 30.0, 60000, 1200, 0.2),
+    "1080p24_medium": (1920, 1080, 24.0, 60000, 2500, 0.3),
+    "720p60_medium": (1280, 720, 60.0, 30000, 2500, 0.3),
+}
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def score_timing(truth, entries):
+    """Match output entries to ground truth by text and overlap; report recall, precision and timing errors"""
+    from extractor import normalize_text
+    used = set()
+    start_err = []
+    end_err = []
+    for gt in truth:
+        best = None
+        for n, e in enumerate(entries):
+            if n in used or normalize_text(e["text"]) != normalize_text(gt["text"]):
+                continue
+            if e["start"] >= gt["end"] or e["end"] <= gt["start"]:
+                continue
+            if best is None or abs(e["start"] - gt["start"]) < abs(entries[best]["start"] - gt["start"]):
+                best = n
+        if best is not None:
+            used.add(best)
+            start_err.append(abs(entries[best]["start"] - gt["start"]))
+            end_err.append(abs(entries[best]["end"] - gt["end"]))
+    return {
+        "truth_entries": len(truth),
+        "output_entries": len(entries),
+        "matched": len(used),
+        "recall": len(used) / len(truth) if truth else 1.0,
+        "precision": len(used) / len(entries) if entries else 1.0,
+        "start_error_ms_mean": round(sum(start_err) / len(start_err), 1) if start_err else None,
+        "start_error_ms_p95": _percentile(start_err, 95),
+        "end_error_ms_mean": round(sum(end_err) / len(end_err), 1) if end_err else None,
+        "end_error_ms_p95": _percentile(end_err, 95),
+    }
+
+
+def _peak_rss_mb(who):
+    if who == "self" and os.path.exists("/proc/self/status"):
+        # ru_maxrss survives exec, so a spawned child would report the parent's peak
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF if who == "self" else resource.RUSAGE_CHILDREN).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_scenario(video, region, url, options):
+    """Child-process body: one extraction, returns measurements"""
+    from extractor import Extractor
+    from ocr_engine import OpenAIOCREngine
+    from async_ocr_engine import AsyncOpenAIOCREngine
+    from rate_limiter import get_limiter
+    prompt = "只返回图片中的可读字幕文本"
+    limiter = get_limiter("benchmark", options["rpm"], options["tpm"], options["max_concurrency"])
+    if options["engine"] == "async":
+        engine = AsyncOpenAIOCREngine(url, "", "mock", prompt, max_in_flight=options["workers"], limiter=limiter)
+    else:
+        engine = OpenAIOCREngine(url, "", "mock", prompt, limiter=limiter)
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, "out.srt")
+        extractor = Extractor(video, tuple(region), engine, options["sample_ms"], options["min_duration_ms"], out,
+                              sampling=options["sampling"], workers=options["workers"],
+                              batch_size=options["batch_size"], batch_strategy=options["batch_strategy"],
+                              refine=options["refine"], presence_threshold=options["presence_threshold"],
+                              segments=options["segments"])
+        t0 = time.perf_counter()
+        extractor.run()
+        wall = time.perf_counter() - t0
+        entries = list(extractor.entries)
+    return {
+        "error": extractor.error,
+        "wall_s": round(wall, 3),
+        "total_frames": extractor.total_frames,
+        "samples": extractor.frames_processed,
+        "video_fps": round(extractor.total_frames / wall, 1) if wall else None,
+        "samples_per_s": round(extractor.frames_processed / wall, 1) if wall else None,
+        "sampling": extractor.sampling_used,
+        "api_calls": extractor.api_calls,
+        "api_calls_skipped": extractor.api_calls_skipped,
+        "refine_calls": extractor.refine_calls,
+        "failed_samples": extractor.failed_samples,
+        "rate_limit_wait_s": round(limiter.waited, 3) if limiter is not None else 0.0,
+        "peak_rss_mb": _peak_rss_mb("self"),
+        "children_peak_rss_mb": _peak_rss_mb("children"),
+        "entries": entries,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(current, baseline_path):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {r["scenario"]: r for r in json.load(f)["results"]}
+    print(f"\n对比基线 {baseline_path}:")
+    for r in current["results"]:
+        old = baseline.get(r["scenario"])
+        if old is None or not old.get("wall_s") or not r.get("wall_s"):
+            continue
+        print(f"  {r['scenario']:<16} 耗时 {old['wall_s']:.2f}s -> {r['wall_s']:.2f}s ({old['wall_s'] / r['wall_s']:.2f}x) | "
+              f"请求 {old['requests']} -> {r['requests']} | 召回 {old['recall']:.3f} -> {r['recall']:.3f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="字幕提取基准测试")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="只运行指定场景（可重复）")
+    parser.add_argument("--workdir", default=os.path.join(HERE, ".cache"), help="合成视频缓存目录")
+    parser.add_argument("--output", help="结果 JSON 路径，默认 benchmarks/results/<时间>.json")
+    parser.add_argument("--compare", help="与之前的结果 JSON 对比")
+    parser.add_argument("--latency", default="lognormal:200,0.4", help="模拟服务延迟分布，默认 lognormal:200,0.4")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="模拟服务返回 503 的概率")
+    parser.add_argument("--server-rpm", type=int, default=0, help="模拟服务每分钟接受的请求数，超出返回 429")
+    parser.add_argument("--rpm", type=int, default=0, help="客户端限流：每分钟请求数")
+    parser.add_argument("--tpm", type=int, default=0, help="客户端限流：每分钟 token 数")
+    parser.add_argument("--max-concurrency", type=int, default=0, help="客户端限流：最大并发请求数")
+    parser.add_argument("--engine", choices=("sync", "async"), default="sync")
+    parser.add_argument("--sample-ms", type=int, default=800)
+    parser.add_argument("--min-duration-ms", type=int, default=0, help="默认 0，便于与真实时间轴比较")
+    parser.add_argument("--sampling", default="auto")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--batch-strategy", default="multi_image")
+    parser.add_argument("--refine", action="store_true")
+    parser.add_argument("--presence-threshold", type=float, default=None)
+    parser.add_argument("--segments", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    options = {k: getattr(args, k) for k in ("engine", "sample_ms", "min_duration_ms", "sampling", "workers", "batch_size",
+                                             "batch_strategy", "refine", "presence_threshold", "segments", "rpm", "tpm",
+                                             "max_concurrency")}
+    server = MockOCRServer({}, latency=args.latency, error_rate=args.error_rate, seed=args.seed,
+                           rpm=args.server_rpm).start()
+    ctx = multiprocessing.get_context("spawn")
+    report = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "latency": args.latency,
+        "error_rate": args.error_rate,
+        "server_rpm": args.server_rpm,
+        "options": options,
+        "results": [],
+    }
+    try:
+        for name in args.scenario or list(SCENARIOS):
+            width, height, fps, duration_ms, mean_on_ms, gap_ratio = SCENARIOS[name]
+            video, truth = generate(args.workdir, name, width, height, fps, duration_ms, mean_on_ms, gap_ratio, args.seed)
+            server.texts = {e["id"]: e["text"] for e in truth["timeline"]}
+            server.reset_counters()
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                result = pool.submit(run_scenario, video, truth["region"], server.url, options).result()
+            entries = result.pop("entries")
+            result.update(score_timing(truth["timeline"], entries))
+            result.update({
+                "scenario": name, "width": width, "height": height, "fps": fps, "duration_ms": duration_ms,
+                "requests": server.requests, "images": server.images, "server_errors": server.errors,
+                "server_rate_limited": server.rate_limited,
+            })
+            report["results"].append(result)
+            print(f"{name:<16} {result['wall_s']:>7.2f}s | {result['video_fps']} 帧/s | 请求 {server.requests} | "
+                  f"RSS {result['peak_rss_mb']}MB | 召回 {result['recall']:.3f} 精确 {result['precision']:.3f} | "
+                  f"起始误差 {result['start_error_ms_mean']}ms", flush=True)
+    finally:
+        server.stop()
+
+    out = args.output or os.path.join(HERE, "results", time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存: {out}")
+    if args.compare:
+        compare(report, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""
+Synthetic Video Module
+Generates videos with burned-in subtitles on a known timeline
+
+Each subtitle is drawn as visible text plus a row of white/black cells that
+encode its id, so the mock server can recover the ground truth from any crop
+of the subtitle strip even after resizing, grayscale or JPEG encoding.
+"""
+
+import json
+import os
+import random
+
+import cv2
+import numpy as np
+
+CODE_BITS = 12  # Up to 4095 distinct subtitles per video
+STRIP_TOP = 0.80  # Subtitle strip covers the bottom 20% of the frame
+CODE_X0 = 0.01  # Cell row geometry relative to the strip
+CODE_CELL_W = 0.02
+CODE_Y0 = 0.25
+CODE_Y1 = 0.75
+
+WORDS = ["今天", "我们", "一起", "出发", "天气", "不错", "小心", "后面", "快走", "明白",
+         "the", "quick", "brown", "fox", "jumps", "over", "lazy", "dog", "hello", "world"]
+
+
+def subtitle_region(width, height):
+    """(x, y, w, h) of the subtitle strip, the crop the extractor should use"""
+    y = int(height * STRIP_TOP)
+    return 0, y, width, height - y
+
+
+def make_timeline(duration_ms, mean_on_ms=2500, gap_ratio=0.3, seed=0):
+    """
+    Random subtitle timeline: entries last around `mean_on_ms`, and roughly
+    `gap_ratio` of the transitions go through a blank gap instead of cutting
+    straight to the next line. Returns [{"id", "start", "end", "text"}, ...] in ms.
+    """
+    rng = random.Random(seed)
+    entries = []
+    t = rng.randint(0, mean_on_ms // 2)
+    while True:
+        length = max(400, int(rng.gauss(mean_on_ms, mean_on_ms * 0.3)))
+        end = min(duration_ms, t + length)
+        if end - t < 400:
+            break
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 5))) + f" {len(entries) + 1}"
+        entries.append({"id": len(entries) + 1, "start": t, "end": end, "text": text})
+        t = end
+        if rng.random() < gap_ratio:
+            t += rng.randint(300, mean_on_ms)
+        if t >= duration_ms or len(entries) >= (1 << CODE_BITS) - 1:
+            break
+    return entries
+
+
+def draw_code(strip, code):
+    """Draw `code` as CODE_BITS cells on a dark band at the left of the strip"""
+    h, w = strip.shape[:2]
+    y0, y1 = int(h * CODE_Y0), int(h * CODE_Y1)
+    x0 = int(w * CODE_X0)
+    cell = max(2, int(w * CODE_CELL_W))
+    cv2.rectangle(strip, (x0, y0), (x0 + cell * CODE_BITS, y1), (0, 0, 0), -1)
+    for b in range(CODE_BITS):
+        if code >> b & 1:
+            cv2.rectangle(strip, (x0 + b * cell + 1, y0 + 1), (x0 + (b + 1) * cell - 2, y1 - 1), (255, 255, 255), -1)
+
+
+def read_code(image):
+    """Inverse of draw_code on a crop of the strip (any scale); 0 means no subtitle"""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    h, w = gray.shape[:2]
+    y0, y1 = int(h * CODE_Y0), int(h * CODE_Y1)
+    x0 = w * CODE_X0
+    cell = w * CODE_CELL_W
+    code = 0
+    for b in range(CODE_BITS):
+        # Sample the middle of each cell to stay clear of resampling blur at the edges
+        cx0 = int(x0 + (b + 0.3) * cell)
+        cx1 = max(cx0 + 1, int(x0 + (b + 0.7) * cell))
+        patch = gray[y0 + (y1 - y0) // 4:y1 - (y1 - y0) // 4, cx0:cx1]
+        if patch.size and patch.mean() > 128:
+            code |= 1 << b
+    return code
+
+
+def render_video(path, timeline, width=1280, height=720, fps=25.0, duration_ms=60000, seed=0):
+    """Write an mp4 with a moving background and the timeline burned into the subtitle strip"""
+    rng = np.random.default_rng(seed)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"cannot open video writer for {path}")
+    xs = np.linspace(0, 1, width, dtype=np.float32)
+    ys = np.linspace(0, 1, height, dtype=np.float32)[:, None]
+    noise = rng.integers(0, 24, size=(height, width, 1), dtype=np.uint8)
+    _, sy, _, sh = subtitle_region(width, height)
+    scale = sh / 120
+    total = int(duration_ms * fps / 1000)
+    n = 0
+    try:
+        for f in range(total):
+            t_ms = f * 1000 / fps
+            while n < len(timeline) and timeline[n]["end"] <= t_ms:
+                n += 1
+            phase = f / max(1.0, fps) * 0.5
+            base = (np.sin(xs * 6 + phase) * 0.5 + 0.5) * 90 + ys * 60
+            frame = np.dstack([base, base * 0.8 + 20, 140 - base * 0.5]).astype(np.uint8) + noise
+            if n < len(timeline) and timeline[n]["start"] <= t_ms:
+                entry = timeline[n]
+                strip = frame[sy:sy + sh]
+                draw_code(strip, entry["id"])
+                org = (int(width * 0.3), int(sh * 0.65))
+                cv2.putText(strip, entry["text"], org, cv2.FONT_HERSHEY_SIMPLEX, scale, (0, 0, 0), max(2, int(6 * scale)), cv2.LINE_AA)
+                cv2.putText(strip, entry["text"], org, cv2.FONT_HERSHEY_SIMPLEX, scale, (255, 255, 255), max(1, int(2 * scale)), cv2.LINE_AA)
+            writer.write(frame)
+    finally:
+        writer.release()
+
+
+def frame_aligned(timeline, fps):
+    """Ground truth in the extractor's time base: entries snap to the first frame they appear on"""
+    def snap(ms):
+        f = int(np.ceil(ms * fps / 1000 - 1e-9))
+        return int(f / fps * 1000)
+    return [dict(e, start=snap(e["start"]), end=snap(e["end"])) for e in timeline]
+
+
+def generate(workdir, name, width, height, fps, duration_ms, mean_on_ms=2500, gap_ratio=0.3, seed=0):
+    """
+    Create (or reuse) `<workdir>/<name>.mp4` with its `<name>.truth.json`
+    Returns (video_path, truth) where truth holds the timeline and the subtitle region
+    """
+    os.makedirs(workdir, exist_ok=True)
+    video = os.path.join(workdir, name + ".mp4")
+    truth_path = os.path.join(workdir, name + ".truth.json")
+    params = {"width": width, "height": height, "fps": fps, "duration_ms": duration_ms,
+              "mean_on_ms": mean_on_ms, "gap_ratio": gap_ratio, "seed": seed}
+    if os.path.exists(video) and os.path.exists(truth_path):
+        with open(truth_path, "r", encoding="utf-8") as f:
+            truth = json.load(f)
+        if truth.get("params") == params:
+            return video, truth
+    timeline = make_timeline(duration_ms, mean_on_ms, gap_ratio, seed)
+    render_video(video, timeline, width, height, fps, duration_ms, seed)
+    truth = {
+        "params": params,
+        "region": list(subtitle_region(width, height)),
+        "timeline": frame_aligned(timeline, fps),
+    }
+    with open(truth_path, "w", encoding="utf-8") as f:
+        json.dump(truth, f, ensure_ascii=False, indent=1)
+    return video, truth
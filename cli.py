@@ -0,0 +1,211 @@
+"""
+Command Line Entry
+Headless subtitle extraction for servers without a display; never imports PyQt6
+
+Progress, closed entries, completion and errors are written to stderr as one JSON object per line:
+    {"event": "progress", "progress": 42, "frames": 120, "total_frames": 9000, "entries": 17, "elapsed_ms": 5230}
+    {"event": "entry", "index": 16, "start": 61200, "end": 63400, "text": "...", "samples": 3}   (with --entries)
+    {"event": "done", "entries": 80, "elapsed_ms": 61200, "srt": "...", ...}
+    {"event": "error", "message": "..."}
+"""
+
+import argparse
+import dataclasses
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+
+from config_manager import ConfigManager
+from ocr_cache import OCRResultCache, CachedOCREngine
+from ocr_engine import BATCH_STRATEGIES
+from extraction_journal import ExtractionJournal, journal_path_for
+from extractor import Extractor, DEFAULT_WORKERS, SAMPLING_MODES, create_engine, create_pool_engine, engine_limiters
+from engine_pool import PooledOCREngine
+from metrics import Metrics
+from image_signature import CHANGE_THRESHOLD, parse_change_threshold
+from postprocess import load_postprocessor
+from extraction_events import EventPublisher, ProgressEvent, EntryEvent
+
+EXIT_ERROR = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
+
+def emit(event, **fields):
+    sys.stderr.write(json.dumps(dict(event=event, **fields), ensure_ascii=False) + "\n")
+    sys.stderr.flush()
+
+
+def parse_region(text):
+    try:
+        x, y, w, h = (int(v) for v in text.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError("区域格式应为 x,y,w,h")
+    if w <= 0 or h <= 0:
+        raise argparse.ArgumentTypeError("区域宽高必须大于 0")
+    return x, y, w, h
+
+
+def find_config(manager, key):
+    """Look up an APIConfig by id first, then by name"""
+    configs = manager.list_configs()
+    for cfg in configs:
+        if cfg.id == key:
+            return cfg
+    matches = [cfg for cfg in configs if cfg.name == key]
+    if len(matches) > 1:
+        raise LookupError(f"有多个名为 {key} 的配置，请改用 id")
+    if not matches:
+        raise LookupError(f"找不到 API 配置: {key}")
+    return matches[0]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="从视频中提取字幕（无界面）")
+    parser.add_argument("video", help="视频文件路径")
+    parser.add_argument("--region", type=parse_region, default=None, help="字幕区域 x,y,w,h（像素），默认全屏")
+    parser.add_argument("--sample-ms", type=int, default=800, help="采样间隔（毫秒），默认 800")
+    parser.add_argument("--min-duration-ms", type=int, default=1200, help="最短字幕时长（毫秒），默认 1200")
+    parser.add_argument("--config", help="API 配置名称或 id；默认使用界面中选中的配置，没有时读取 OCR_* 环境变量")
+    parser.add_argument("--group", help="使用该分组的全部 API 配置并按延迟和错误率负载均衡（与 --config 二选一）")
+    parser.add_argument("--hedge-percentile", type=float, metavar="P",
+                        help="配合 --group：请求超过最近延迟的第 P 百分位仍未返回时向另一配置发送副本，默认读取 OCR_HEDGE_PERCENTILE，0 关闭")
+    parser.add_argument("--hedge-budget", type=float, metavar="RATIO", help="副本请求占总请求的上限比例，默认 0.05")
+    parser.add_argument("--prompt", help="覆盖配置中的 Prompt")
+    parser.add_argument("--output", help="SRT 输出路径，默认与视频同目录同名")
+    parser.add_argument("--sampling", choices=SAMPLING_MODES, default="auto", help="抽帧方式，默认 auto")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help=f"并发识别数，默认 {DEFAULT_WORKERS}")
+    parser.add_argument("--batch-size", type=int, default=1, help="每次请求的图片数，默认 1")
+    parser.add_argument("--batch-strategy", choices=BATCH_STRATEGIES, default="multi_image")
+    parser.add_argument("--refine", action="store_true", help="把 --sample-ms 当作粗采样间隔并二分细化字幕边界")
+    parser.add_argument("--change-threshold", type=parse_change_threshold, default=CHANGE_THRESHOLD,
+                        help=f"画面变化门限，不超过时复用上一次的识别结果，off 关闭，默认 {CHANGE_THRESHOLD}")
+    parser.add_argument("--presence-threshold", type=float, default=None, help="本地字幕检测阈值，默认关闭")
+    parser.add_argument("--segments", type=int, default=1, help="分段并行的进程数，默认 1")
+    parser.add_argument("--resume", action="store_true", help="存在断点记录时从中断处继续")
+    parser.add_argument("--no-cache", action="store_true", help="不使用识别结果缓存")
+    parser.add_argument("--base-dir", default=os.getcwd(), help="configs/ 所在目录，默认当前目录")
+    parser.add_argument("--interval", type=float, default=0.5, help="进度输出间隔（秒），默认 0.5")
+    parser.add_argument("--entries", action="store_true", help="每条字幕确定后输出 entry 事件（重试恢复后从 index 0 重新输出）")
+    parser.add_argument("--metrics", action="store_true", help="记录各阶段耗时，结束时写出 <输出名>.metrics.json")
+    parser.add_argument("--metrics-prom", metavar="PATH", help="同时写出 Prometheus 文本格式指标（供 node exporter 采集）")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not os.path.exists(args.video):
+        emit("error", message=f"视频不存在: {args.video}")
+        return EXIT_USAGE
+
+    manager = ConfigManager(args.base_dir)
+    if args.group:
+        group = manager.list_group(args.group)
+        if not group:
+            emit("error", message=f"分组 {args.group} 中没有 API 配置")
+            return EXIT_USAGE
+        cfg = group[0]
+        engine = create_pool_engine(group, [manager.decrypt_key(c.api_key_enc) for c in group],
+                                    hedge_percentile=args.hedge_percentile, hedge_budget=args.hedge_budget)
+    else:
+        try:
+            cfg = find_config(manager, args.config) if args.config else manager.get_selected()
+        except LookupError as e:
+            emit("error", message=str(e))
+            return EXIT_USAGE
+        engine = create_engine(cfg, manager.decrypt_key(cfg.api_key_enc)) if cfg is not None else create_engine()
+    if args.prompt:
+        engine.prompt = args.prompt
+    if not args.no_cache:
+        engine = CachedOCREngine(engine, OCRResultCache(os.path.join(args.base_dir, "configs", "ocr_cache.sqlite3")))
+
+    try:
+        postprocessor = load_postprocessor(os.path.join(args.base_dir, "configs"))
+    except ValueError as e:
+        emit("error", message=f"后处理规则无效: {e}")
+        return EXIT_USAGE
+
+    out = args.output or os.path.splitext(args.video)[0] + ".srt"
+    journal_path = journal_path_for(out)
+    resume = args.resume and ExtractionJournal(journal_path).exists()
+    # The worker only enqueues; events are written from this thread so a slow stderr never stalls it
+    events = queue.SimpleQueue()
+    extractor = Extractor(args.video, args.region, engine, args.sample_ms, args.min_duration_ms, out,
+                          sampling=args.sampling, workers=args.workers, batch_size=args.batch_size,
+                          batch_strategy=args.batch_strategy, refine=args.refine, change_threshold=args.change_threshold,
+                          presence_threshold=args.presence_threshold, segments=args.segments,
+                          journal_path=journal_path, resume=resume,
+                          metrics=Metrics() if args.metrics or args.metrics_prom else None, postprocessor=postprocessor,
+                          events=EventPublisher(events.put, progress_interval=args.interval))
+    emit("start", video=args.video, output=out, model=engine.model,
+         config=args.group if args.group else cfg.name if cfg is not None else None, resume=resume)
+
+    thread = threading.Thread(target=extractor.run, daemon=True)
+    thread.start()
+    interrupted = False
+    while thread.is_alive() or not events.empty():
+        try:
+            event = events.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        except KeyboardInterrupt:
+            # Stop cleanly: the entries closed so far are committed and the journal is kept
+            extractor.stopped = True
+            interrupted = True
+            continue
+        if isinstance(event, ProgressEvent):
+            emit("progress", **dataclasses.asdict(event))
+        elif isinstance(event, EntryEvent) and args.entries:
+            emit("entry", **dataclasses.asdict(event))
+    thread.join()
+
+    if extractor.error:
+        emit("error", message=extractor.error, journal=journal_path if os.path.exists(journal_path) else None)
+        return EXIT_ERROR
+    if extractor.stopped:
+        emit("stopped", frames=extractor.frames_processed, entries=len(extractor.entries),
+             journal=journal_path if os.path.exists(journal_path) else None)
+        return EXIT_INTERRUPTED if interrupted else EXIT_ERROR
+    stats = {
+        "entries": extractor.entries_count,
+        "elapsed_ms": extractor.elapsed_ms,
+        "frames": extractor.frames_processed,
+        "total_frames": extractor.total_frames,
+        "sampling": extractor.sampling_used,
+        "api_calls": extractor.api_calls,
+        "api_calls_skipped": extractor.api_calls_skipped,
+        "presence_skipped": extractor.presence_skipped,
+        "refine_calls": extractor.refine_calls,
+        "resumed_samples": extractor.resumed_samples,
+        "failed_samples": extractor.failed_samples,
+        "recovered_samples": extractor.recovered_samples,
+        "last_request_error": extractor.last_request_error,
+        "srt": out,
+        "txt": out.replace('.srt', '.txt'),
+        "jsonl": out.replace('.srt', '.jsonl'),
+    }
+    if isinstance(engine, CachedOCREngine):
+        stats["cache_hits"] = engine.hits
+    pool = engine.engine if isinstance(engine, CachedOCREngine) else engine
+    if isinstance(pool, PooledOCREngine):
+        stats["pool"] = pool.stats()
+        stats["failovers"] = pool.failovers
+        stats["hedges"] = pool.hedges
+        stats["hedge_wins"] = pool.hedge_wins
+    stats["postprocess_hits"] = extractor.postprocessor.stats()
+    limiters = engine_limiters(engine)
+    if limiters:
+        stats["rate_limit_queued"] = sum(lim.queued for lim in limiters)
+        stats["rate_limit_wait_s"] = round(sum(lim.waited for lim in limiters), 3)
+    if extractor.metrics.enabled:
+        stats["metrics"] = extractor.write_metrics_report(prometheus_path=args.metrics_prom)
+    emit("done", **stats)
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -6,7 +6,7 @@ from typing import List, Optional, Callable
 from cryptography.fernet import Fernet
 
 class APIConfig:
-    def __init__(self, id: Optional[str]=None, name: str="", url: str="", api_key_enc: str="", model: str="", timeout: int=30, group: str="default", note: str="", prompt: str="", system_prompt: str="", api_base: str="", api_path: str="/v1/chat/completions", mode: str="openai"):
+    def __init__(self, id: Optional[str]=None, name: str="", url: str="", api_key_enc: str="", model: str="", timeout: int=30, group: str="default", note: str="", prompt: str="", system_prompt: str="", api_base: str="", api_path: str="/v1/chat/completions", mode: str="openai", image_format: str="png", image_quality: int=90, image_grayscale: bool=False, image_text_height: int=0, image_max_pixels: int=0, rpm: int=0, tpm: int=0, max_concurrency: int=0):
         self.id = id or str(uuid.uuid4())
         self.name = name
         self.url = url
@@ -20,6 +20,14 @@ class APIConfig:
         self.api_base = api_base
         self.api_path = api_path
         self.mode = mode
+        self.image_format = image_format
+        self.image_quality = image_quality
+        self.image_grayscale = image_grayscale
+        self.image_text_height = image_text_height
+        self.image_max_pixels = image_max_pixels
+        self.rpm = rpm  # Requests per minute, 0 = unlimited
+        self.tpm = tpm  # Tokens per minute, 0 = unlimited
+        self.max_concurrency = max_concurrency  # Requests in flight, 0 = unlimited
 
     def to_dict(self):
         return {
@@ -36,6 +44,14 @@ class APIConfig:
             "api_base": self.api_base,
             "api_path": self.api_path,
             "mode": self.mode,
+            "image_format": self.image_format,
+            "image_quality": self.image_quality,
+            "image_grayscale": self.image_grayscale,
+            "image_text_height": self.image_text_height,
+            "image_max_pixels": self.image_max_pixels,
+            "rpm": self.rpm,
+            "tpm": self.tpm,
+            "max_concurrency": self.max_concurrency,
         }
 
     @staticmethod
@@ -54,6 +70,14 @@ class APIConfig:
             api_base=d.get("api_base", d.get("url", "")),
             api_path=d.get("api_path", "/v1/chat/completions"),
             mode=d.get("mode", "openai"),
+            image_format=d.get("image_format", "png"),
+            image_quality=int(d.get("image_quality", 90)),
+            image_grayscale=bool(d.get("image_grayscale", False)),
+            image_text_height=int(d.get("image_text_height", 0)),
+            image_max_pixels=int(d.get("image_max_pixels", 0)),
+            rpm=int(d.get("rpm", 0)),
+            tpm=int(d.get("tpm", 0)),
+            max_concurrency=int(d.get("max_concurrency", 0)),
         )
 
 class ConfigManager:
@@ -146,6 +170,9 @@ class ConfigManager:
     def list_configs(self) -> List[APIConfig]:
         return list(self.configs)
 
+    def list_group(self, group: str) -> List[APIConfig]:
+        return [c for c in self.configs if c.group == group]
+
     def search(self, text: str) -> List[APIConfig]:
         t = text.lower().strip()
         if not t:
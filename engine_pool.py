@@ -0,0 +1,461 @@
+"""
+Engine Pool Module
+Spreads recognition requests across several OCR engines (e.g. every API config in a group)
+"""
+
+import asyncio
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from metrics import NULL_METRICS
+from ocr_engine import (OCRRequestError, RetryPolicy, AdaptiveDeadline, ERROR_RATE_LIMIT, ERROR_SERVER,
+                        ERROR_PROTOCOL)
+
+LATENCY_ALPHA = 0.3  # EWMA weight of the newest latency sample
+ERROR_ALPHA = 0.1  # EWMA weight of the newest success/failure outcome
+EJECT_AFTER = 3  # Consecutive failures before a member is taken out of rotation
+EJECT_BASE_S = 5.0  # First cooldown; doubles on every failed probe
+EJECT_MAX_S = 120.0
+HEDGE_BUDGET = 0.05  # Default cap on hedges as a fraction of requests
+HEDGE_BURST = 10.0  # Unused hedge budget saved up at most this many hedges
+HEDGE_MIN_SAMPLES = 20  # Latencies needed before the hedge delay is trusted
+HEDGE_THREADS = 64  # Sync members run on a shared executor so the caller can wait on two of them
+
+
+def member_retry_policy():
+    """Retries for pool members: connection errors and timeouts fail over to another member instead"""
+    return RetryPolicy(retries={ERROR_RATE_LIMIT: 1, ERROR_SERVER: 1, ERROR_PROTOCOL: 1})
+
+
+class PoolMember:
+    """One engine of the pool with its live health statistics"""
+
+    def __init__(self, engine, name):
+        self.engine = engine
+        self.name = name
+        self.outstanding = 0
+        self.latency = None  # EWMA seconds, None until the first success
+        self.error_rate = 0.0  # EWMA of failures
+        self.consecutive_failures = 0
+        self.ejected = False
+        self.ejected_until = 0.0
+        self.cooldown = EJECT_BASE_S
+        self.probing = False  # A probe request is in flight for an ejected member
+        self.requests = 0
+        self.failures = 0
+        self.ejections = 0
+
+    def score(self):
+        """Expected wait for one more request: lower is better; unmeasured members go first"""
+        latency = self.latency if self.latency is not None else 0.0
+        return (self.outstanding + 1) * (latency + 0.001) / max(0.05, 1.0 - self.error_rate)
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "requests": self.requests,
+            "failures": self.failures,
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "outstanding": self.outstanding,
+            "ejected": self.ejected,
+            "ejections": self.ejections,
+        }
+
+
+class PooledOCREngine:
+    """
+    Load-balances across member engines by live latency and error rate
+
+    Each request goes to the better of two randomly drawn healthy members, scored by
+    outstanding requests x EWMA latency, penalized by the EWMA error rate. A member
+    failing EJECT_AFTER times in a row is ejected for a cooldown; afterwards a single
+    probe request decides whether it comes back or stays out for twice as long.
+    A failed request fails over to the other members before OCRRequestError is raised.
+
+    With `hedge_percentile` set, a request still unanswered after that percentile of recent
+    latency is duplicated to a second healthy member; the first answer wins and the other
+    is cancelled (async) or told to stop and ignored (sync, its HTTP request can't be aborted).
+    Hedges are limited to `hedge_budget` x requests, with at most HEDGE_BURST saved up.
+    """
+
+    metrics = NULL_METRICS  # Set by the extractor when instrumentation is on
+
+    def __init__(self, engines, names=None, hedge_percentile=None, hedge_budget=HEDGE_BUDGET):
+        if not engines:
+            raise ValueError("engine pool needs at least one engine")
+        names = names or [getattr(e, "endpoint", f"engine-{n}") for n, e in enumerate(engines)]
+        self.members = [PoolMember(e, name) for e, name in zip(engines, names)]
+        self.is_async = all(getattr(e, "is_async", False) for e in engines)
+        self.hedge_percentile = hedge_percentile if len(self.members) > 1 else None
+        self.hedge_budget = hedge_budget
+        self.failovers = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._hedge_tokens = 0.0
+        self._hedge_delays = {}  # images per request -> AdaptiveDeadline used as the hedge trigger
+        self._executor = None
+        self._lock = threading.Lock()
+        self._rng = random.Random()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"], state["_rng"]
+        state["_executor"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._rng = random.Random()
+
+    # Attributes the extractor, cache and GUI read from a single engine
+    @property
+    def model(self):
+        # Part of the cache key, so a pool over different models never shares entries with one of them
+        return "+".join(sorted({m.engine.model for m in self.members}))
+
+    @property
+    def prompt(self):
+        return self.members[0].engine.prompt
+
+    @prompt.setter
+    def prompt(self, value):
+        for m in self.members:
+            m.engine.prompt = value
+
+    @property
+    def system_prompt(self):
+        return self.members[0].engine.system_prompt
+
+    @property
+    def endpoint(self):
+        return ", ".join(m.name for m in self.members)
+
+    @property
+    def max_in_flight(self):
+        return sum(getattr(m.engine, "max_in_flight", 1) for m in self.members)
+
+    def stats(self):
+        with self._lock:
+            return [m.stats() for m in self.members]
+
+    def _pick(self, candidates):
+        """Power of two choices among `candidates` (caller holds the lock)"""
+        if len(candidates) > 2:
+            candidates = self._rng.sample(candidates, 2)
+        return min(candidates, key=PoolMember.score)
+
+    def _acquire(self, exclude):
+        """Pick a member not in `exclude` and count the request against it; None when all were tried"""
+        now = time.monotonic()
+        with self._lock:
+            remaining = [m for m in self.members if m not in exclude]
+            if not remaining:
+                return None
+            probes = [m for m in remaining if m.ejected and m.ejected_until <= now and not m.probing]
+            if probes:
+                member = probes[0]
+                member.probing = True
+            else:
+                healthy = [m for m in remaining if not m.ejected]
+                if healthy:
+                    member = self._pick(healthy)
+                else:
+                    # Everything is ejected: the member closest to its probe is the best bet
+                    member = min(remaining, key=lambda m: m.ejected_until)
+            member.outstanding += 1
+            member.requests += 1
+            if exclude:
+                self.failovers += 1
+        if exclude:
+            self.metrics.inc("pool_failovers")
+        return member
+
+    def _acquire_hedge(self, exclude):
+        """A healthy member for a duplicate request if the budget allows one, else None"""
+        with self._lock:
+            if self._hedge_tokens < 1.0:
+                return None
+            healthy = [m for m in self.members if m not in exclude and not m.ejected]
+            if not healthy:
+                return None
+            self._hedge_tokens -= 1.0
+            self.hedges += 1
+            member = self._pick(healthy)
+            member.outstanding += 1
+            member.requests += 1
+        self.metrics.inc("pool_hedges")
+        return member
+
+    def _hedge_delay(self, n_images):
+        """Seconds to wait before hedging a request of `n_images`, None while too few latencies are known"""
+        with self._lock:
+            self._hedge_tokens = min(HEDGE_BURST, self._hedge_tokens + self.hedge_budget)
+            trigger = self._hedge_delays.get(n_images)
+            if trigger is None:
+                trigger = self._hedge_delays[n_images] = AdaptiveDeadline(
+                    math.inf, floor=0.0, multiplier=1.0, quantile=self.hedge_percentile,
+                    min_samples=HEDGE_MIN_SAMPLES)
+        delay = trigger.current()
+        return None if delay == math.inf else delay
+
+    def _observe_latency(self, n_images, seconds):
+        trigger = self._hedge_delays.get(n_images)
+        if trigger is not None:
+            trigger.observe(seconds)
+
+    def _won(self, member, elapsed, pending, hedged):
+        """Book the winning attempt; losers get the time they had been running as a lower bound"""
+        self._release(member, elapsed)
+        now = time.perf_counter()
+        for other, t0, _ in pending:
+            if other.probing:
+                self._abandon(other)  # A probe that never answered proves nothing
+            else:
+                self._release(other, now - t0)
+        if hedged:
+            with self._lock:
+                self.hedge_wins += 1
+            self.metrics.inc("pool_hedge_wins")
+
+    def _abandon(self, member):
+        """Release a request that ended without a verdict (stop, cancellation)"""
+        with self._lock:
+            member.outstanding -= 1
+            member.probing = False
+
+    def _release(self, member, latency=None, error=None):
+        with self._lock:
+            member.outstanding -= 1
+            if error is None:
+                member.latency = latency if member.latency is None else \
+                    member.latency + LATENCY_ALPHA * (latency - member.latency)
+                member.error_rate *= 1.0 - ERROR_ALPHA
+                member.consecutive_failures = 0
+                if member.ejected:
+                    member.ejected = member.probing = False
+                    member.cooldown = EJECT_BASE_S
+                return
+            member.failures += 1
+            member.error_rate += ERROR_ALPHA * (1.0 - member.error_rate)
+            member.consecutive_failures += 1
+            if member.probing:
+                member.probing = False
+                member.cooldown = min(EJECT_MAX_S, member.cooldown * 2)
+                member.ejected_until = time.monotonic() + member.cooldown
+            elif not member.ejected and member.consecutive_failures >= EJECT_AFTER:
+                member.ejected = True
+                member.ejections += 1
+                member.ejected_until = time.monotonic() + member.cooldown
+                self.metrics.inc("pool_ejections")
+
+    def _call(self, fn, n_images, should_stop):
+        if self.hedge_percentile is not None:
+            return self._call_hedged(fn, n_images, should_stop)
+        tried = []
+        error = None
+        while True:
+            member = self._acquire(tried)
+            if member is None:
+                raise error
+            t0 = time.perf_counter()
+            try:
+                result = fn(member.engine, should_stop)
+            except OCRRequestError as e:
+                self._release(member, error=e)
+                error = e
+                tried.append(member)
+                if should_stop and should_stop():
+                    raise
+                continue
+            except BaseException:
+                self._abandon(member)
+                raise
+            if should_stop and should_stop():
+                self._abandon(member)
+            else:
+                self._release(member, time.perf_counter() - t0)
+            return result
+
+    def _call_hedged(self, fn, n_images, should_stop):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(HEDGE_THREADS, thread_name_prefix="ocr-pool")
+        settled = threading.Event()
+
+        def stop():
+            # Lets the losing attempt give up its retries once the winner is in
+            return settled.is_set() or bool(should_stop and should_stop())
+
+        delay = self._hedge_delay(n_images)
+        pending = {}  # future -> (member, start, is_hedge)
+        tried = []
+        error = None
+        hedged = False
+        try:
+            while True:
+                if not pending:
+                    member = self._acquire(tried)
+                    if member is None:
+                        raise error
+                    tried.append(member)
+                    attempt_t0 = time.perf_counter()
+                    pending[self._executor.submit(fn, member.engine, stop)] = (member, attempt_t0, False)
+                done, _ = wait(pending, timeout=None if hedged else delay, return_when=FIRST_COMPLETED)
+                if not done:
+                    hedged = True  # At most one hedge per request
+                    member = self._acquire_hedge(tried)
+                    if member is not None:
+                        tried.append(member)
+                        pending[self._executor.submit(fn, member.engine, stop)] = (member, time.perf_counter(), True)
+                    continue
+                for future in done:
+                    member, t0, is_hedge = pending.pop(future)
+                    elapsed = time.perf_counter() - t0
+                    try:
+                        result = future.result()
+                    except OCRRequestError as e:
+                        self._release(member, error=e)
+                        error = e
+                        continue
+                    except BaseException:
+                        self._abandon(member)
+                        raise
+                    if should_stop and should_stop():
+                        self._abandon(member)
+                        return result
+                    # A winning hedge means the original attempt took at least this long
+                    self._observe_latency(n_images, time.perf_counter() - attempt_t0)
+                    self._won(member, elapsed, pending.values(), is_hedge)
+                    pending.clear()
+                    return result
+                if error is not None and should_stop and should_stop():
+                    raise error
+        finally:
+            settled.set()
+            for member, _, _ in pending.values():
+                self._abandon(member)
+
+    async def _call_async(self, fn, n_images, should_stop):
+        if self.hedge_percentile is not None:
+            return await self._call_hedged_async(fn, n_images, should_stop)
+        tried = []
+        error = None
+        while True:
+            member = self._acquire(tried)
+            if member is None:
+                raise error
+            t0 = time.perf_counter()
+            try:
+                result = await fn(member.engine, should_stop)
+            except OCRRequestError as e:
+                self._release(member, error=e)
+                error = e
+                tried.append(member)
+                if should_stop and should_stop():
+                    raise
+                continue
+            except BaseException:
+                self._abandon(member)
+                raise
+            if should_stop and should_stop():
+                self._abandon(member)
+            else:
+                self._release(member, time.perf_counter() - t0)
+            return result
+
+    async def _call_hedged_async(self, fn, n_images, should_stop):
+        delay = self._hedge_delay(n_images)
+        pending = {}  # task -> (member, start, is_hedge)
+        tried = []
+        error = None
+        hedged = False
+        try:
+            while True:
+                if not pending:
+                    member = self._acquire(tried)
+                    if member is None:
+                        raise error
+                    tried.append(member)
+                    attempt_t0 = time.perf_counter()
+                    pending[_start(fn(member.engine, should_stop))] = (member, attempt_t0, False)
+                done, _ = await asyncio.wait(pending, timeout=None if hedged else delay,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    member = self._acquire_hedge(tried)
+                    if member is not None:
+                        tried.append(member)
+                        pending[_start(fn(member.engine, should_stop))] = (member, time.perf_counter(), True)
+                    continue
+                for task in done:
+                    member, t0, is_hedge = pending.pop(task)
+                    elapsed = time.perf_counter() - t0
+                    try:
+                        result = task.result()
+                    except OCRRequestError as e:
+                        self._release(member, error=e)
+                        error = e
+                        continue
+                    except BaseException:
+                        self._abandon(member)
+                        raise
+                    if should_stop and should_stop():
+                        self._abandon(member)
+                        return result
+                    # A winning hedge means the original attempt took at least this long
+                    self._observe_latency(n_images, time.perf_counter() - attempt_t0)
+                    self._won(member, elapsed, pending.values(), is_hedge)
+                    for loser in pending:
+                        loser.cancel()
+                    pending.clear()
+                    return result
+                if error is not None and should_stop and should_stop():
+                    raise error
+        finally:
+            for task, (member, _, _) in pending.items():
+                task.cancel()
+                self._abandon(member)
+
+    def recognize(self, image_bgr, should_stop=None):
+        return self._call(lambda e, stop: e.recognize(image_bgr, should_stop=stop), 1, should_stop)
+
+    def recognize_batch(self, images, should_stop=None, strategy="multi_image"):
+        return self._call(lambda e, stop: e.recognize_batch(images, should_stop=stop, strategy=strategy),
+                          len(images), should_stop)
+
+    async def recognize_async(self, image_bgr, should_stop=None):
+        return await self._call_async(lambda e, stop: e.recognize_async(image_bgr, should_stop=stop), 1, should_stop)
+
+    async def recognize_batch_async(self, images, should_stop=None, strategy="multi_image"):
+        return await self._call_async(
+            lambda e, stop: e.recognize_batch_async(images, should_stop=stop, strategy=strategy),
+            len(images), should_stop)
+
+    async def aclose(self):
+        for m in self.members:
+            if hasattr(m.engine, "aclose"):
+                await m.engine.aclose()
+
+
+def _start(coro):
+    task = asyncio.ensure_future(coro)
+    # A loser may fail just before it is cancelled; retrieve that so asyncio doesn't warn about it
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    return task
+
+
+def format_pool_stats(stats):
+    """Log lines describing each member"""
+    lines = []
+    for s in stats:
+        latency = f"{s['latency_ms']:.0f}ms" if s["latency_ms"] is not None else "-"
+        state = "已摘除" if s["ejected"] else "正常"
+        lines.append(f"{s['name']}: 请求 {s['requests']} | 失败 {s['failures']} | 延迟 {latency} | "
+                     f"错误率 {s['error_rate'] * 100:.1f}% | 摘除 {s['ejections']} 次 | {state}")
+    return lines
@@ -0,0 +1,75 @@
+"""
+Extraction Events Module
+Typed events published by the extraction worker: progress, closed subtitle entries, errors and the end of a run
+
+The worker hands every event to a callback on its own thread and never waits on the consumer: the GUI passes
+a Qt signal bridge (delivered queued on the GUI thread), headless callers a queue's put. Progress is rate
+limited; entries, errors and the finish are always delivered, in order.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+
+PROGRESS_INTERVAL_S = 0.1
+
+
+@dataclass(frozen=True)
+class ProgressEvent:
+    progress: int  # Percent, 0-100
+    frames: int
+    total_frames: int
+    entries: int
+    elapsed_ms: int
+
+
+@dataclass(frozen=True)
+class EntryEvent:
+    """A subtitle entry was closed; `index` restarts at 0 when the entries are rebuilt after retries"""
+    index: int
+    start: int
+    end: int
+    text: str
+    samples: int
+
+
+@dataclass(frozen=True)
+class ErrorEvent:
+    message: str
+
+
+@dataclass(frozen=True)
+class FinishedEvent:
+    status: str  # "done", "stopped" or "error"
+    entries: int
+    frames: int
+    elapsed_ms: int
+
+
+class EventPublisher:
+    """Passes events to `callback`; without one every call is a cheap no-op"""
+
+    def __init__(self, callback=None, progress_interval=PROGRESS_INTERVAL_S):
+        self.callback = callback
+        self.progress_interval = progress_interval
+        self._next_progress = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.callback is not None
+
+    def progress_due(self):
+        """True at most once per progress_interval, so callers only build the events that are sent"""
+        if self.callback is None:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_progress:
+                return False
+            self._next_progress = now + self.progress_interval
+            return True
+
+    def publish(self, event):
+        if self.callback is not None:
+            self.callback(event)
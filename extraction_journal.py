@@ -0,0 +1,138 @@
+"""
+Extraction Journal Module
+Append-only record of processed samples so an interrupted extraction can resume
+"""
+
+import json
+import os
+import time
+
+JOURNAL_VERSION = 1
+SYNC_INTERVAL_S = 2.0  # fsync at most this often; each line is still flushed as written
+
+
+def journal_path_for(output_path):
+    """Journal file kept next to the SRT output"""
+    return os.path.splitext(output_path)[0] + ".journal.jsonl"
+
+
+def segment_journal_path(journal_path, segment_start):
+    """Per-process journal of a segment-parallel run"""
+    return os.path.splitext(journal_path)[0] + f".{segment_start}.jsonl"
+
+
+class ExtractionJournal:
+    """JSON-lines journal: one header line, then one line per segmenter feed
+
+    Sample lines carry the frame index, timestamp, crop hash and the raw model
+    text; boundary lines carry refinement results. Replaying them in order
+    rebuilds the segmenter exactly, and the last sample index tells where to
+    seek when resuming. A torn final line from a crash is ignored on load.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fh = None
+        self._last_sync = 0.0
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self):
+        """Return (header, records); header is None if the file is missing or unreadable"""
+        header = None
+        records = []
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        break  # Partially written line; everything before it is intact
+                    if header is None:
+                        if rec.get("type") != "header" or rec.get("version") != JOURNAL_VERSION:
+                            return None, []
+                        header = rec
+                    else:
+                        records.append(rec)
+        except OSError:
+            return None, []
+        return header, records
+
+    def matches(self, header):
+        """True if the journal on disk was written for the same job parameters"""
+        existing, _ = self.load()
+        if existing is None:
+            return False
+        return all(existing.get(k) == v for k, v in header.items())
+
+    def last_sample(self):
+        """(frame_index, t_ms) of the last journaled sample, or None"""
+        _, records = self.load()
+        for rec in reversed(records):
+            if rec.get("k") == "s":
+                return rec["i"], rec["t"]
+        return None
+
+    def start(self, header):
+        """Begin a fresh journal, replacing any previous one"""
+        self.close()
+        self._fh = open(self.path, "w", encoding="utf-8")
+        self._write(dict(header, type="header", version=JOURNAL_VERSION), sync=True)
+
+    def reopen(self):
+        """Continue appending to the existing journal after a resume"""
+        self.close()
+        header, records = self.load()
+        # Rewrite the intact part so a torn tail line doesn't corrupt later appends. The copy is
+        # synced before it replaces the journal, so a crash at any point leaves one intact checkpoint.
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for rec in [header] + records:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            f.flush()
+            try:
+                os.fsync(f.fileno())
+            except OSError:
+                pass
+        os.replace(tmp_path, self.path)
+        self._fh = open(self.path, "a", encoding="utf-8")
+        self._last_sync = time.time()
+        return header, records
+
+    def record_sample(self, index, t_ms, crop_hash, raw_text):
+        """raw_text None marks a sample whose request failed; resume retries it with the other failures"""
+        self._write({"k": "s", "i": index, "t": t_ms, "h": crop_hash, "text": raw_text})
+
+    def record_boundary(self, t_ms, text):
+        self._write({"k": "b", "t": t_ms, "text": text})
+
+    def _write(self, rec, sync=False):
+        if self._fh is None:
+            return
+        self._fh.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        self._fh.flush()
+        if sync or time.time() - self._last_sync > SYNC_INTERVAL_S:
+            self._sync()
+
+    def _sync(self):
+        self._fh.flush()
+        try:
+            os.fsync(self._fh.fileno())
+        except OSError:
+            pass
+        self._last_sync = time.time()
+
+    def close(self):
+        if self._fh is not None:
+            self._sync()
+            self._fh.close()
+            self._fh = None
+
+    def discard(self):
+        """Delete the journal once the output files are complete"""
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
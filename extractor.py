@@ -0,0 +1,1300 @@
+"""
+Extractor Module
+Qt-free extraction core: sampling, recognition, segmentation and subtitle writers
+"""
+
+import os
+import asyncio
+import collections
+import itertools
+import threading
+import queue
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait
+import time
+import cv2
+import json
+from image_signature import crop_signature, signature_distance, perceptual_hash, CHANGE_THRESHOLD
+from ocr_engine import OpenAIOCREngine, BATCH_STRATEGIES, OCRRequestError
+from async_ocr_engine import AsyncOpenAIOCREngine
+from subtitle_detector import SubtitlePresenceDetector, evaluate_presence, suggest_threshold
+from extraction_journal import ExtractionJournal, segment_journal_path
+from engine_pool import PooledOCREngine, member_retry_policy, HEDGE_BUDGET
+from rate_limiter import get_limiter, set_process_share, concurrency_cap
+from postprocess import PostProcessor
+from metrics import Metrics, NULL_METRICS
+from extraction_events import EventPublisher, ProgressEvent, EntryEvent, ErrorEvent, FinishedEvent
+
+DEFAULT_PROMPT = "只返回图片中的可读字幕文本"
+DEFAULT_WORKERS = 4  # OCR_WORKERS default: concurrent engine calls, or requests in flight for the async engine
+
+
+def create_engine(cfg=None, api_key=""):
+    """
+    OCR engine for an APIConfig, or from the OCR_* environment variables when cfg is None
+    OCR_ENGINE=async selects the asyncio engine with OCR_WORKERS (default DEFAULT_WORKERS) requests in flight
+    """
+    use_async = os.getenv("OCR_ENGINE", "") == "async"
+    max_in_flight = int(os.getenv("OCR_WORKERS", str(DEFAULT_WORKERS)))
+    if cfg is not None:
+        prompt = cfg.prompt or os.getenv("OCR_PROMPT", DEFAULT_PROMPT)
+        if use_async:
+            return AsyncOpenAIOCREngine.from_config(cfg, api_key, prompt=prompt, max_in_flight=max_in_flight)
+        return OpenAIOCREngine.from_config(cfg, api_key, prompt=prompt)
+    api_key = os.getenv("OCR_API_KEY", "")
+    endpoint = os.getenv("OCR_API_ENDPOINT", "http://localhost:1234")
+    model = os.getenv("OCR_API_MODEL", "qwen/qwen3-vl-8b")
+    prompt = os.getenv("OCR_PROMPT", DEFAULT_PROMPT)
+    system_prompt = os.getenv("OCR_SYSTEM_PROMPT", "")
+    timeout = int(os.getenv("OCR_TIMEOUT", "30"))
+    limiter = get_limiter("env", int(os.getenv("OCR_RPM", "0")), int(os.getenv("OCR_TPM", "0")),
+                          int(os.getenv("OCR_MAX_CONCURRENCY", "0")))
+    if use_async:
+        return AsyncOpenAIOCREngine(endpoint, api_key, model, prompt, system_prompt, max_in_flight=max_in_flight, timeout=timeout,
+                                    limiter=limiter)
+    return OpenAIOCREngine(endpoint, api_key, model, prompt, system_prompt, timeout=timeout, limiter=limiter)
+
+
+def create_pool_engine(cfgs, api_keys, hedge_percentile=None, hedge_budget=None):
+    """
+    PooledOCREngine over several APIConfigs, e.g. every config of a group
+    Hedging defaults to OCR_HEDGE_PERCENTILE / OCR_HEDGE_BUDGET; a percentile of 0 turns it off
+    """
+    engines = []
+    for cfg, api_key in zip(cfgs, api_keys):
+        engine = create_engine(cfg, api_key)
+        engine.retry_policy = member_retry_policy()
+        engines.append(engine)
+    if hedge_percentile is None:
+        hedge_percentile = float(os.getenv("OCR_HEDGE_PERCENTILE", "0"))
+    if hedge_budget is None:
+        hedge_budget = float(os.getenv("OCR_HEDGE_BUDGET", str(HEDGE_BUDGET)))
+    return PooledOCREngine(engines, [cfg.name for cfg in cfgs], hedge_percentile=hedge_percentile or None,
+                           hedge_budget=hedge_budget)
+
+
+def iter_engines(engine):
+    """The engine and every engine it wraps (CachedOCREngine, PooledOCREngine members)"""
+    engines = [engine]
+    while engines:
+        engine = engines.pop()
+        yield engine
+        if vars(engine).get("engine") is not None:
+            engines.append(vars(engine)["engine"])
+        engines.extend(m.engine for m in vars(engine).get("members", ()))
+
+
+def engine_limiters(engine):
+    """Distinct RateLimiters used anywhere in an engine chain"""
+    limiters = []
+    for e in iter_engines(engine):
+        limiter = vars(e).get("limiter")
+        if limiter is not None and limiter not in limiters:
+            limiters.append(limiter)
+    return limiters
+
+
+def metrics_report_path(output_path):
+    """Run report kept next to the SRT output"""
+    return os.path.splitext(output_path)[0] + ".metrics.json"
+
+
+def format_srt_timestamp(ms):
+    h = ms // 3600000
+    m = (ms % 3600000) // 60000
+    s = (ms % 60000) // 1000
+    msr = ms % 1000
+    return f"{h:02}:{m:02}:{s:02},{msr:03}"
+
+def write_srt(entries, path):
+    lines = []
+    for i, e in enumerate(entries, 1):
+        lines.append(str(i))
+        lines.append(f"{format_srt_timestamp(e['start'])} --> {format_srt_timestamp(e['end'])}")
+        lines.append(e['text'])
+        lines.append("")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines))
+
+def write_txt(entries, path):
+    """Write entries as plain text article"""
+    lines = []
+    for i, e in enumerate(entries, 1):
+        lines.append(e['text'])
+        lines.append("")  # Add blank line between entries
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines).strip())
+
+class StreamingSubtitleWriter:
+    """Writes SRT, TXT and JSONL outputs entry by entry as the segmenter closes them
+
+    Output goes to `<name>.part` files that downstream tools can tail while the
+    extraction runs; commit() renames them into place, abort() removes them.
+    JSONL rows carry start/end in ms, text and the number of samples behind the entry.
+    Entries arrive seconds apart, so by default each one is flushed right away;
+    `flush_interval` (seconds) batches flushes for very dense output.
+    """
+
+    def __init__(self, srt_path, flush_interval=0.0):
+        self.paths = {
+            "srt": srt_path,
+            "txt": srt_path.replace('.srt', '.txt'),
+            "jsonl": srt_path.replace('.srt', '.jsonl'),
+        }
+        self.flush_interval = flush_interval
+        self.count = 0
+        self._files = {kind: open(path + ".part", 'w', encoding='utf-8') for kind, path in self.paths.items()}
+        self._last_flush = time.time()
+
+    def write(self, entry):
+        self.count += 1
+        srt, txt, jsonl = self._files["srt"], self._files["txt"], self._files["jsonl"]
+        if self.count > 1:
+            srt.write("\n")
+            txt.write("\n\n")
+        srt.write(f"{self.count}\n{format_srt_timestamp(entry['start'])} --> {format_srt_timestamp(entry['end'])}\n{entry['text']}\n")
+        txt.write(entry['text'].lstrip() if self.count == 1 else entry['text'])
+        jsonl.write(json.dumps({"start": entry['start'], "end": entry['end'], "text": entry['text'],
+                                "samples": entry.get('samples', 0)}, ensure_ascii=False) + "\n")
+        if time.time() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        for f in self._files.values():
+            f.flush()
+        self._last_flush = time.time()
+
+    def close(self):
+        """Close the part files and leave them on disk"""
+        for f in self._files.values():
+            f.close()
+
+    def commit(self):
+        """Atomically move the finished files into place"""
+        self.close()
+        for path in self.paths.values():
+            os.replace(path + ".part", path)
+
+    def abort(self):
+        self.close()
+        for path in self.paths.values():
+            try:
+                os.remove(path + ".part")
+            except OSError:
+                pass
+
+class FrameReader:
+    """Random-access crop reader on its own capture, remembering a few recent signatures"""
+
+    def __init__(self, video_path, crop_fn, keep=64):
+        self.cap = cv2.VideoCapture(video_path)
+        self.crop_fn = crop_fn
+        self.keep = keep
+        self._signatures = collections.OrderedDict()
+
+    def crop(self, index):
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+        ret, frame = self.cap.read()
+        if not ret:
+            return None
+        return self.crop_fn(frame)
+
+    def signature(self, index):
+        if index in self._signatures:
+            self._signatures.move_to_end(index)
+            return self._signatures[index]
+        crop = self.crop(index)
+        sig = crop_signature(crop) if crop is not None else None
+        self._signatures[index] = sig
+        if len(self._signatures) > self.keep:
+            self._signatures.popitem(last=False)
+        return sig
+
+    def release(self):
+        self.cap.release()
+
+class SubtitleSegmenter:
+    """Turns a time-ordered stream of (t_ms, text) samples into subtitle entries"""
+
+    def __init__(self, min_duration_ms, on_entry=None):
+        self.min_duration_ms = min_duration_ms
+        self.on_entry = on_entry  # Called with each entry as soon as it is closed
+        self.entries = []
+        self.prev_text = None
+        self.cur_start_ms = None
+        self.cur_samples = 0
+        self.last_ms = 0
+
+    def _close(self, t_ms):
+        end_ms = max(t_ms, self.cur_start_ms + self.min_duration_ms)
+        entry = {"start": self.cur_start_ms, "end": end_ms, "text": self.prev_text, "samples": self.cur_samples}
+        self.entries.append(entry)
+        if self.on_entry is not None:
+            self.on_entry(entry)
+
+    def feed(self, t_ms, text, samples=1):
+        """samples > 1 stands for that many consecutive samples ending at t_ms"""
+        self.last_ms = t_ms
+        if text and self.prev_text is None:
+            self.prev_text = text
+            self.cur_start_ms = t_ms
+            self.cur_samples = samples
+        elif text and self.prev_text is not None:
+            if normalize_text(text) != normalize_text(self.prev_text):
+                self._close(t_ms)
+                self.prev_text = text
+                self.cur_start_ms = t_ms
+                self.cur_samples = samples
+            else:
+                self.cur_samples += samples
+        elif not text and self.prev_text is not None:
+            self._close(t_ms)
+            self.prev_text = None
+            self.cur_start_ms = None
+
+    def finish(self):
+        """Close the entry still on screen at the last sample and return all entries"""
+        if self.prev_text is not None and self.cur_start_ms is not None:
+            self._close(self.last_ms)
+            self.prev_text = None
+            self.cur_start_ms = None
+        return self.entries
+
+SAMPLING_MODES = ("auto", "read", "grab", "seek")
+SAMPLE_OCR = "ocr"
+SAMPLE_REUSE = "reuse"
+SAMPLE_BLANK = "blank"
+RETRY_GIVE_UP = 3  # The end-of-run retry pass stops after this many failures in a row
+
+class Extractor:
+    def __init__(self, video_path, region, engine, sample_ms, min_duration_ms, output_path, sampling="auto", change_threshold=CHANGE_THRESHOLD, workers=1, batch_size=1, batch_strategy="multi_image", refine=False,
+                 presence_threshold=None, presence_eval=False, segments=1,
+                 journal_path=None, resume=False, metrics=None, postprocessor=None, events=None):
+        self.video_path = video_path
+        self.region = region
+        self.engine = engine
+        self.sample_ms = sample_ms
+        self.min_duration_ms = min_duration_ms
+        self.output_path = output_path
+        if sampling not in SAMPLING_MODES:
+            raise ValueError(f"unknown sampling mode: {sampling}")
+        self.sampling = sampling
+        self.sampling_used = None  # Mode actually used after "auto" resolution
+        self.grab_cost_ms = 0.0
+        self.seek_cost_ms = 0.0
+        # Crops whose signature differs from the last recognized one by at most this
+        # signature_distance reuse the previous text; None disables the gate
+        self.change_threshold = change_threshold
+        self.api_calls = 0
+        self.api_calls_skipped = 0
+        self.workers = max(1, int(workers))  # Concurrent engine calls; 1 keeps the serial path
+        self.batch_size = max(1, int(batch_size))  # Crops per request; engines without recognize_batch get them one by one
+        if batch_strategy not in BATCH_STRATEGIES:
+            raise ValueError(f"unknown batch strategy: {batch_strategy}")
+        self.batch_strategy = batch_strategy
+        # Treat sample_ms as a coarse interval and bisect between disagreeing samples down to one frame
+        self.refine = refine
+        self.refine_calls = 0
+        self.refine_frames = 0
+        # Local subtitle-presence check; negatives become empty text without a request.
+        # In eval mode every crop is still recognized and scores are compared with the OCR results.
+        self.detector = SubtitlePresenceDetector(presence_threshold) if presence_threshold is not None else None
+        self.presence_eval = presence_eval and self.detector is not None
+        self.presence_skipped = 0
+        self.presence_records = []  # (score, has_text) pairs collected in eval mode
+        self.presence_report = None
+        self._presence_scores = {}
+        # Split the video into this many time ranges, each decoded and recognized in its own process;
+        # never more than the engine's concurrency limit, which the processes split between them
+        self.segments = max(1, int(segments))
+        cap = concurrency_cap(engine)
+        if cap is not None:
+            self.segments = min(self.segments, cap)
+        self._on_sample = None
+        # Every processed sample is appended to this journal; resume replays it and continues after the last one
+        self.journal_path = journal_path
+        self.resume = resume
+        self.resumed_samples = 0
+        self._journal = None
+        self._crop_hashes = {}
+        # Samples whose requests failed after the engine's retries get one more try after the pass;
+        # every feed is kept so the entries can be rebuilt with the recovered texts
+        self.failed_samples = 0
+        self.recovered_samples = 0
+        self.last_request_error = None
+        self._failed = []
+        self._feeds = []
+        # Filters and cleans every answer (configs/postprocess.json in the GUI and CLI)
+        self.postprocessor = postprocessor if postprocessor is not None else PostProcessor()
+        # Per-stage timers; NULL_METRICS keeps every call a no-op when instrumentation is off
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self._bind_metrics()
+        # Progress, closed entries, errors and the finish, pushed to the GUI or a headless caller
+        self.events = events if events is not None else EventPublisher()
+        self.progress = 0
+        self.done = False
+        self.stopped = False  # Add stop flag
+        self.error = None
+        self.started_at = 0.0
+        self.finished_at = 0.0
+        self.elapsed_ms = 0
+        self.frames_processed = 0
+        self.total_frames = 0
+        self.entries_count = 0
+        self.current_entries_count = 0  # Track current entries count during extraction
+        self.entries = []
+
+    def _bind_metrics(self):
+        """Share self.metrics with the engine and any engines it wraps (CachedOCREngine, PooledOCREngine)"""
+        for engine in iter_engines(self.engine):
+            if hasattr(type(engine), "metrics"):
+                engine.metrics = self.metrics
+
+    def _measure_sampling_costs(self, cap, total, step):
+        """Time a few grab() calls and a few seeks, then rewind to the first frame"""
+        probes = min(step, 8)
+        t0 = time.perf_counter()
+        grabbed = 0
+        for _ in range(probes):
+            if not cap.grab():
+                break
+            grabbed += 1
+        grab_ms = (time.perf_counter() - t0) * 1000 / max(1, grabbed)
+        targets = [int(total * f) for f in (0.25, 0.5, 0.75)]
+        targets = [t for t in targets if t > probes]
+        seek_ms = float("inf")
+        if targets:
+            t0 = time.perf_counter()
+            for t in targets:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, t)
+                cap.grab()
+            seek_ms = (time.perf_counter() - t0) * 1000 / len(targets)
+        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        return grab_ms, seek_ms
+
+    def _choose_sampling(self, cap, total, step):
+        """Resolve the sampling mode, picking seek or grab from measured costs in auto mode"""
+        if self.sampling != "auto":
+            if self.sampling == "seek" and total <= 0:
+                return "grab"  # Seeking needs a known frame count
+            return self.sampling
+        if step <= 1:
+            return "read"
+        if total <= 0:
+            return "grab"
+        self.grab_cost_ms, self.seek_cost_ms = self._measure_sampling_costs(cap, total, step)
+        # A seek replaces (step - 1) grabs; keep a margin since seek cost varies with GOP position
+        if self.seek_cost_ms < self.grab_cost_ms * (step - 1) * 0.8:
+            return "seek"
+        return "grab"
+
+    def _iter_frames(self, cap, start, end, step):
+        """Yield (frame_index, frame) for every sampled frame in [start, end) without decoding skipped ones
+        end <= 0 means read until the stream runs out; start must be a multiple of step
+        """
+        mode = self.sampling_used
+        if mode == "seek":
+            i = start
+            while i < end:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, i)
+                ret, frame = cap.read()
+                if not ret:
+                    return
+                yield i, frame
+                i += step
+            return
+        if start > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        i = start
+        while end <= 0 or i < end:
+            if i % step != 0:
+                if mode == "grab":
+                    ret = cap.grab()
+                else:
+                    ret, _ = cap.read()
+                if not ret:
+                    return
+                i += 1
+                continue
+            ret, frame = cap.read()
+            if not ret:
+                return
+            yield i, frame
+            i += 1
+
+    def _crop(self, frame):
+        if self.region is None:
+            return frame
+        x, y, w, h = self.region
+        x = max(0, x)
+        y = max(0, y)
+        w = max(1, w)
+        h = max(1, h)
+        x2 = min(frame.shape[1], x + w)
+        y2 = min(frame.shape[0], y + h)
+        return frame[y:y2, x:x2]
+
+    def _iter_samples(self, cap, fps, start, end, step):
+        """
+        Yield (frame_index, t_ms, crop, kind) for every sampled frame
+        kind is SAMPLE_OCR (send to the engine), SAMPLE_REUSE (matches the last crop sent)
+        or SAMPLE_BLANK (the presence detector found no subtitle)
+        """
+        ref_signature = None
+        metrics = self.metrics
+        frames = self._iter_frames(cap, start, end, step)
+        while True:
+            with metrics.timer("decode"):
+                item = next(frames, None)
+            if item is None or self.stopped:
+                return
+            i, frame = item
+            crop = self._crop(frame)
+            t_ms = int((i / max(1, fps)) * 1000)
+            with metrics.timer("gate"):
+                signature = crop_signature(crop) if self.change_threshold is not None else None
+                reuse = ref_signature is not None and signature_distance(signature, ref_signature) <= self.change_threshold
+            if reuse:
+                yield i, t_ms, None, SAMPLE_REUSE
+                continue
+            if self.detector is not None:
+                with metrics.timer("presence"):
+                    score = self.detector.score(crop)
+                if self.presence_eval:
+                    self._presence_scores[i] = score
+                elif score < self.detector.threshold:
+                    yield i, t_ms, None, SAMPLE_BLANK
+                    continue
+            ref_signature = signature
+            if self._journal is not None:
+                self._crop_hashes[i] = perceptual_hash(crop)
+            yield i, t_ms, crop, SAMPLE_OCR
+
+    def _group_samples(self, samples):
+        """Group samples so each group holds up to batch_size crops for the engine plus the samples that follow them"""
+        group = []
+        pending = 0
+        for sample in samples:
+            if sample[3] == SAMPLE_OCR and pending >= self.batch_size:
+                yield group
+                group = []
+                pending = 0
+            group.append(sample)
+            if sample[3] == SAMPLE_OCR:
+                pending += 1
+        if group:
+            yield group
+
+    def _recognize_crops(self, crops, should_stop):
+        """Texts for `crops`, with None for every crop whose request failed"""
+        with self.metrics.timer("recognize"):
+            try:
+                if len(crops) > 1 and hasattr(self.engine, "recognize_batch"):
+                    texts = self.engine.recognize_batch(crops, should_stop=should_stop, strategy=self.batch_strategy)
+                else:
+                    texts = [self.engine.recognize(crop, should_stop=should_stop) for crop in crops]
+            except OCRRequestError as e:
+                self.last_request_error = str(e)
+                return [None] * len(crops)
+        return [t.strip() for t in texts]
+
+    async def _recognize_crops_async(self, crops, should_stop):
+        with self.metrics.timer("recognize"):
+            try:
+                if len(crops) > 1 and hasattr(self.engine, "recognize_batch_async"):
+                    texts = await self.engine.recognize_batch_async(crops, should_stop=should_stop, strategy=self.batch_strategy)
+                else:
+                    texts = await asyncio.gather(*[self.engine.recognize_async(crop, should_stop=should_stop) for crop in crops])
+            except OCRRequestError as e:
+                self.last_request_error = str(e)
+                return [None] * len(crops)
+        return [t.strip() for t in texts]
+
+    def _recognize_one(self, crop):
+        """Single request for refinement; None when it failed"""
+        try:
+            text = self.engine.recognize(crop, should_stop=lambda: self.stopped)
+        except OCRRequestError as e:
+            self.last_request_error = str(e)
+            return None
+        self.refine_calls += 1
+        return self.postprocessor.apply(text.strip())
+
+    def _expand_group(self, group, texts, raw_text):
+        """Pair each sample of a group with its text, filling reuses from the last recognized result
+        A failed request leaves None for its sample and the reuses that follow it
+        """
+        it = iter(texts)
+        out = []
+        for i, t_ms, crop, kind in group:
+            if kind == SAMPLE_REUSE:
+                self.api_calls_skipped += 1
+            elif kind == SAMPLE_BLANK:
+                self.presence_skipped += 1
+                out.append((i, t_ms, ""))
+                continue
+            else:
+                raw_text = next(it)
+                self.api_calls += 1
+            out.append((i, t_ms, raw_text))
+        return out, raw_text
+
+    def _recognize_serial(self, samples):
+        raw_text = ""
+        for group in self._group_samples(samples):
+            crops = [crop for _, _, crop, kind in group if kind == SAMPLE_OCR]
+            texts = self._recognize_crops(crops, lambda: self.stopped) if crops else []
+            out, raw_text = self._expand_group(group, texts, raw_text)
+            yield from out
+
+    def _recognize_pipelined(self, samples):
+        """Decode on one thread, recognize on `workers` threads, and yield results back in sample order"""
+        window = self.workers * 4
+        slots = threading.Semaphore(window)  # Bounds groups decoded but not yet consumed
+        work = queue.Queue()
+        cond = threading.Condition()
+        results = {}
+        state = {"decoded": 0, "decoder_done": False, "error": None}
+        halt = threading.Event()  # Set when the consumer goes away early
+        should_stop = lambda: self.stopped or halt.is_set()
+
+        def decoder():
+            try:
+                for seq, group in enumerate(self._group_samples(samples)):
+                    if should_stop():
+                        return
+                    while not slots.acquire(timeout=0.2):
+                        if should_stop():
+                            return
+                    crops = [crop for _, _, crop, kind in group if kind == SAMPLE_OCR]
+                    if crops:
+                        work.put((seq, group, crops))
+                    else:
+                        with cond:
+                            results[seq] = (group, [])
+                            cond.notify_all()
+                    with cond:
+                        state["decoded"] = seq + 1
+            except Exception as e:
+                with cond:
+                    state["error"] = e
+            finally:
+                for _ in range(self.workers):
+                    work.put(None)
+                with cond:
+                    state["decoder_done"] = True
+                    cond.notify_all()
+
+        def worker():
+            while True:
+                item = work.get()
+                if item is None:
+                    return
+                seq, group, crops = item
+                try:
+                    texts = self._recognize_crops(crops, should_stop)
+                except Exception as e:
+                    texts = [""] * len(crops)
+                    with cond:
+                        state["error"] = state["error"] or e
+                with cond:
+                    results[seq] = (group, texts)
+                    cond.notify_all()
+
+        threads = [threading.Thread(target=decoder, daemon=True)]
+        threads += [threading.Thread(target=worker, daemon=True) for _ in range(self.workers)]
+        for t in threads:
+            t.start()
+        raw_text = ""
+        next_seq = 0
+        try:
+            while True:
+                with cond:
+                    while next_seq not in results:
+                        if state["error"] is not None:
+                            raise state["error"]
+                        if self.stopped:
+                            return
+                        if state["decoder_done"] and next_seq >= state["decoded"]:
+                            return
+                        cond.wait(0.2)
+                    group, texts = results.pop(next_seq)
+                next_seq += 1
+                slots.release()
+                out, raw_text = self._expand_group(group, texts, raw_text)
+                yield from out
+        finally:
+            # Let the decoder observe the halt flag and unblock; workers exit on their sentinels
+            halt.set()
+            for _ in range(window):
+                slots.release()
+
+    def _recognize_async(self, samples):
+        """Keep up to two windows of requests outstanding from a single event loop thread"""
+        window = max(1, getattr(self.engine, "max_in_flight", self.workers)) * 2
+        out = queue.Queue()
+        halt = threading.Event()
+        should_stop = lambda: self.stopped or halt.is_set()
+        done = object()
+
+        async def pipeline():
+            loop = asyncio.get_running_loop()
+            decode_pool = ThreadPoolExecutor(1)  # Decoding stays sequential and off the loop
+            pending = collections.deque()
+
+            def emit_ready():
+                while pending and (pending[0][1] is None or pending[0][1].done()):
+                    group, task = pending.popleft()
+                    out.put((group, [] if task is None else task.result()))
+
+            try:
+                groups = self._group_samples(samples)
+                while not should_stop():
+                    group = await loop.run_in_executor(decode_pool, next, groups, None)
+                    if group is None:
+                        break
+                    crops = [crop for _, _, crop, kind in group if kind == SAMPLE_OCR]
+                    task = asyncio.ensure_future(self._recognize_crops_async(crops, should_stop)) if crops else None
+                    pending.append((group, task))
+                    emit_ready()
+                    while len(pending) >= window and not should_stop():
+                        await asyncio.wait([pending[0][1]])
+                        emit_ready()
+                while pending and not should_stop():
+                    if pending[0][1] is not None:
+                        await asyncio.wait([pending[0][1]])
+                    emit_ready()
+            finally:
+                tasks = [task for _, task in pending if task is not None]
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                decode_pool.shutdown(wait=True)
+                await self.engine.aclose()
+
+        def loop_thread():
+            try:
+                asyncio.run(pipeline())
+                out.put(done)
+            except BaseException as e:
+                out.put(e)
+
+        t = threading.Thread(target=loop_thread, daemon=True)
+        t.start()
+        raw_text = ""
+        try:
+            while True:
+                try:
+                    item = out.get(timeout=0.2)
+                except queue.Empty:
+                    if self.stopped:
+                        return
+                    continue
+                if item is done:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                group, texts = item
+                results, raw_text = self._expand_group(group, texts, raw_text)
+                yield from results
+        finally:
+            halt.set()
+
+    def _refine_boundary(self, reader, lo, hi):
+        """
+        Locate where the text changes between two coarse samples
+        lo/hi are (frame_index, text); returns [(first_frame_index, text), ...] for every change in (lo, hi]
+        """
+        threshold = self.change_threshold if self.change_threshold is not None else CHANGE_THRESHOLD
+        lo = (lo[0], lo[1], reader.signature(lo[0]))
+        hi = (hi[0], hi[1], reader.signature(hi[0]))
+        return self._bisect(reader, lo, hi, threshold)
+
+    def _refine_tail(self, reader, segmenter, fps, prev, last):
+        crop = reader.crop(last)
+        if crop is None:
+            return
+        threshold = self.change_threshold if self.change_threshold is not None else CHANGE_THRESHOLD
+        if signature_distance(crop_signature(crop), reader.signature(prev[0])) <= threshold:
+            text = prev[1]
+        else:
+            text = self._recognize_one(crop)
+            if text is None:
+                return
+            for idx, boundary_text in self._refine_boundary(reader, prev, (last, text)):
+                self._feed(segmenter, int((idx / max(1, fps)) * 1000), boundary_text)
+        self._feed(segmenter, int((last / max(1, fps)) * 1000), text)
+
+    def _bisect(self, reader, lo, hi, threshold):
+        while hi[0] - lo[0] > 1:
+            if self.stopped:
+                break
+            mid = (lo[0] + hi[0]) // 2
+            crop = reader.crop(mid)
+            if crop is None:
+                break
+            signature = crop_signature(crop)
+            self.refine_frames += 1
+            d_lo = signature_distance(signature, lo[2])
+            d_hi = signature_distance(signature, hi[2])
+            # Only OCR the midpoint when it looks like neither end
+            if d_lo <= threshold and d_lo <= d_hi:
+                lo = (mid, lo[1], signature)
+                continue
+            if d_hi <= threshold:
+                hi = (mid, hi[1], signature)
+                continue
+            if self.detector is not None and not self.presence_eval and not self.detector.has_subtitle(crop):
+                text = ""
+            else:
+                text = self._recognize_one(crop)
+                if text is None:
+                    # Keep the boundary at the coarse position rather than guess
+                    break
+            if normalize_text(text) == normalize_text(lo[1]):
+                lo = (mid, lo[1], signature)
+            elif normalize_text(text) == normalize_text(hi[1]):
+                hi = (mid, hi[1], signature)
+            else:
+                # A third text sits in between; resolve both halves separately
+                m = (mid, text, signature)
+                return self._bisect(reader, lo, m, threshold) + self._bisect(reader, m, hi, threshold)
+        return [(hi[0], hi[1])]
+
+    def _process(self, cap, fps, total, step, start, end, segmenter, first=None, prev=None):
+        """
+        Recognize the sampled frames in [start, end) and feed them to `segmenter`
+        first/prev carry samples already replayed from a journal.
+        Returns the first and last (frame_index, text) seen, for stitching neighbouring ranges
+        """
+        samples = self._iter_samples(cap, fps, start, end, step)
+        if getattr(self.engine, "is_async", False):
+            results = self._recognize_async(samples)
+        elif self.workers > 1:
+            results = self._recognize_pipelined(samples)
+        else:
+            results = self._recognize_serial(samples)
+        reader = FrameReader(self.video_path, self._crop) if self.refine else None
+        journal = self._journal
+        metrics = self.metrics
+        try:
+            for i, t_ms, raw_text in results:
+                if self.stopped:
+                    break
+                score = self._presence_scores.pop(i, None)
+                if raw_text is None:
+                    # The entry around it carries on; the sample is retried after the pass
+                    self._failed.append(i)
+                    self._feeds.append((t_ms, None, i))
+                else:
+                    # Post-process: drop descriptive responses, strip labels and quotes
+                    text = self.postprocessor.apply(raw_text)
+                    if score is not None:
+                        self.presence_records.append((score, bool(text)))
+                    if reader is not None and prev is not None and normalize_text(text) != normalize_text(prev[1]):
+                        with metrics.timer("refine"):
+                            boundaries = self._refine_boundary(reader, prev, (i, text))
+                        for idx, boundary_text in boundaries:
+                            boundary_ms = int((idx / max(1, fps)) * 1000)
+                            self._feed(segmenter, boundary_ms, boundary_text)
+                            if journal is not None:
+                                journal.record_boundary(boundary_ms, boundary_text)
+                    if first is None:
+                        first = (i, text)
+                    prev = (i, text)
+                    with metrics.timer("segment"):
+                        self._feed(segmenter, t_ms, text, i)
+                if journal is not None:
+                    with metrics.timer("journal"):
+                        journal.record_sample(i, t_ms, self._crop_hashes.pop(i, None), raw_text)
+                self.current_entries_count = len(segmenter.entries)
+                self.progress = int((i + 1) / max(1, total) * 100)
+                self.frames_processed += 1
+                if self.events.progress_due():
+                    self._publish_progress()
+                if self._on_sample is not None:
+                    self._on_sample(i)
+            if reader is not None and prev is not None and not self.stopped and end == total and prev[0] < total - 1:
+                # Coarse sampling rarely lands on the last frame; resolve the tail so the final entry ends on time
+                with metrics.timer("refine"):
+                    self._refine_tail(reader, segmenter, fps, prev, total - 1)
+        finally:
+            results.close()
+            if reader is not None:
+                reader.release()
+        return first, prev
+
+    def _feed(self, segmenter, t_ms, text, index=None):
+        """Feed the segmenter and remember the feed for a rebuild; index is None for refined boundaries"""
+        segmenter.feed(t_ms, text)
+        self._feeds.append((t_ms, text, index))
+
+    def _retry_failed(self):
+        """
+        One more request for each sample that failed during the pass, after the load that broke it
+        may have eased. Returns {frame_index: filtered_text} for the samples that succeeded now
+        """
+        reader = FrameReader(self.video_path, self._crop)
+        threshold = self.change_threshold if self.change_threshold is not None else CHANGE_THRESHOLD
+        recovered = {}
+        ref = None  # (signature, text) of the last recovered crop
+        consecutive = 0
+        try:
+            for i in self._failed:
+                if self.stopped or consecutive >= RETRY_GIVE_UP:
+                    break
+                crop = reader.crop(i)
+                if crop is None:
+                    continue
+                signature = crop_signature(crop)
+                if ref is not None and signature_distance(signature, ref[0]) <= threshold:
+                    recovered[i] = ref[1]
+                    continue
+                with self.metrics.timer("retry"):
+                    try:
+                        raw_text = self.engine.recognize(crop, should_stop=lambda: self.stopped)
+                    except OCRRequestError as e:
+                        self.last_request_error = str(e)
+                        consecutive += 1
+                        ref = None
+                        continue
+                if self.stopped:
+                    break
+                consecutive = 0
+                self.api_calls += 1
+                recovered[i] = self.postprocessor.apply(raw_text.strip())
+                ref = (signature, recovered[i])
+        finally:
+            reader.release()
+        self.recovered_samples += len(recovered)
+        self.failed_samples += len(self._failed) - len(recovered)
+        return recovered
+
+    def _replay_feeds(self, segmenter, recovered):
+        """
+        Rebuild `segmenter` from the recorded feeds, with the recovered texts in place of the failures
+        Returns the first and last (frame_index, text) sample fed
+        """
+        first = last = None
+        feeds, self._feeds = self._feeds, []
+        for t_ms, text, i in feeds:
+            if text is None:
+                text = recovered.get(i)
+                if text is None:
+                    continue
+            self._feed(segmenter, t_ms, text, i)
+            if i is not None:
+                if first is None:
+                    first = (i, text)
+                last = (i, text)
+        self.current_entries_count = len(segmenter.entries)
+        return first, last
+
+    def _journal_header(self, fps, total, start, end):
+        """Job parameters a journal must match before it is resumed"""
+        return {
+            "video": os.path.abspath(self.video_path),
+            "frames": total,
+            "fps": round(fps, 3),
+            "region": list(self.region) if self.region else None,
+            "sample_ms": self.sample_ms,
+            "refine": self.refine,
+            "range": [start, end],
+            "segments": self.segments,
+        }
+
+    def _open_journal(self, path, header, segmenter):
+        """
+        Start a journal at `path`, or replay a matching one into `segmenter` when resuming
+        Returns the first and last replayed (frame_index, text) and the frame index of the last
+        journaled sample, failed ones included, or (None, None, None)
+        """
+        journal = ExtractionJournal(path)
+        first = prev = last_index = None
+        if self.resume and journal.matches(header):
+            _, records = journal.reopen()
+            for rec in records:
+                if rec["k"] == "b":
+                    self._feed(segmenter, rec["t"], rec["text"])
+                    continue
+                last_index = rec["i"]
+                self.frames_processed += 1
+                self.resumed_samples += 1
+                if rec["text"] is None:
+                    self._failed.append(rec["i"])
+                    self._feeds.append((rec["t"], None, rec["i"]))
+                    continue
+                text = self.postprocessor.apply(rec["text"])
+                self._feed(segmenter, rec["t"], text, rec["i"])
+                if first is None:
+                    first = (rec["i"], text)
+                prev = (rec["i"], text)
+            self.current_entries_count = len(segmenter.entries)
+        else:
+            journal.start(header)
+        self._journal = journal
+        return first, prev, last_index
+
+    def _publish_progress(self):
+        elapsed_ms = int((time.time() - self.started_at) * 1000) if self.started_at else 0
+        self.events.publish(ProgressEvent(self.progress, self.frames_processed, self.total_frames,
+                                          self.current_entries_count, elapsed_ms))
+
+    def _entry_sink(self, writer):
+        """on_entry for a new segmenter: stream each entry to `writer` and publish it"""
+        index = itertools.count()
+
+        def on_entry(entry):
+            writer.write(entry)
+            if self.events.enabled:
+                self.events.publish(EntryEvent(next(index), entry["start"], entry["end"], entry["text"],
+                                               entry["samples"]))
+        return on_entry
+
+    def run(self):
+        """Extract the subtitles; the outcome is left in done/error/stopped and published as events"""
+        try:
+            self._run()
+        except Exception as e:
+            # Not one of the handled failures; still report it so consumers are not left waiting
+            self.error = self.error or f"提取失败: {e}"
+            self.done = True
+            raise
+        finally:
+            self._publish_finished()
+
+    def _publish_finished(self):
+        if not self.events.enabled:
+            return
+        self._publish_progress()
+        if self.error:
+            self.events.publish(ErrorEvent(self.error))
+            status = "error"
+        else:
+            status = "stopped" if self.stopped else "done"
+        entries = self.entries_count if status == "done" else len(self.entries)
+        elapsed_ms = self.elapsed_ms or (int((time.time() - self.started_at) * 1000) if self.started_at else 0)
+        self.events.publish(FinishedEvent(status, entries, self.frames_processed, elapsed_ms))
+
+    def _run(self):
+        cap = cv2.VideoCapture(self.video_path)
+        if not cap.isOpened():
+            self.error = "无法打开视频"
+            self.done = True
+            return
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.total_frames = total
+        step = max(1, int(fps * self.sample_ms / 1000))
+        writer = StreamingSubtitleWriter(self.output_path)
+        segmenter = SubtitleSegmenter(self.min_duration_ms, on_entry=self._entry_sink(writer))
+        self.entries = segmenter.entries  # Shared with the GUI so partial results survive a stop
+        self.started_at = time.time()
+        try:
+            if self.segments > 1 and total > step * self.segments:
+                cap.release()
+                self._run_segments(fps, total, step, segmenter)
+            else:
+                first = prev = None
+                start = 0
+                if self.journal_path:
+                    first, prev, last_index = self._open_journal(self.journal_path,
+                                                                 self._journal_header(fps, total, 0, total), segmenter)
+                    # Failed samples journaled after the last success are back in _failed and wait for the retry pass
+                    if last_index is not None:
+                        start = last_index + step
+                self.sampling_used = self._choose_sampling(cap, total, step)
+                self._process(cap, fps, total, step, start, total, segmenter, first, prev)
+                if self._failed and not self.stopped:
+                    recovered = self._retry_failed()
+                    if recovered:
+                        # Entries around the recovered samples were already streamed; rewrite them all
+                        writer.abort()
+                        writer = StreamingSubtitleWriter(self.output_path)
+                        segmenter = SubtitleSegmenter(self.min_duration_ms, on_entry=self._entry_sink(writer))
+                        self._replay_feeds(segmenter, recovered)
+                        self.entries = segmenter.entries
+        except Exception as e:
+            # The journal keeps everything processed so far; the run can be resumed
+            self.error = f"提取失败: {e}"
+            writer.close()
+            self.done = True
+            return
+        finally:
+            cap.release()
+            if self._journal is not None:
+                self._journal.close()
+        if self.failed_samples and self.failed_samples >= self.frames_processed:
+            # Not a single request got through; keep the journal so the run can be resumed later
+            self.error = f"识别请求全部失败: {self.last_request_error}"
+            writer.abort()
+            self.done = True
+            return
+        if self.stopped:
+            # Keep the entries closed so far as the partial result
+            if segmenter.entries:
+                writer.commit()
+            else:
+                writer.abort()
+            self.done = True
+            return
+        with self.metrics.timer("finalize"):
+            entries = segmenter.finish()
+        if self.presence_eval:
+            self.presence_report = evaluate_presence(self.presence_records, self.detector.threshold)
+            self.presence_report["suggested_threshold"] = suggest_threshold(self.presence_records)
+        self.current_entries_count = len(entries)
+        with self.metrics.timer("finalize"):
+            if entries:
+                writer.commit()
+            else:
+                writer.abort()
+        if self._journal is not None:
+            self._journal.discard()
+            if self.segments > 1:
+                for start, _ in self._segment_bounds(total, step):
+                    ExtractionJournal(segment_journal_path(self.journal_path, start)).discard()
+        self.entries_count = len(entries)
+        self.finished_at = time.time()
+        self.elapsed_ms = int((self.finished_at - self.started_at) * 1000)
+        self.metrics.observe_time("total", self.finished_at - self.started_at)
+        self.done = True
+
+    def write_metrics_report(self, path=None, prometheus_path=None):
+        """Write the JSON run report (next to the output by default) and optionally a Prometheus textfile"""
+        path = path or metrics_report_path(self.output_path)
+        self.metrics.write_json(path, {
+            "video": os.path.abspath(self.video_path),
+            "output": self.output_path,
+            "elapsed_ms": self.elapsed_ms,
+            "total_frames": self.total_frames,
+            "frames_processed": self.frames_processed,
+            "sampling": self.sampling_used,
+            "api_calls": self.api_calls,
+            "api_calls_skipped": self.api_calls_skipped,
+            "refine_calls": self.refine_calls,
+            "entries": self.entries_count,
+            "postprocess_hits": self.postprocessor.stats(),
+        })
+        if prometheus_path:
+            self.metrics.write_prometheus(prometheus_path)
+        return path
+
+    def _segment_bounds(self, total, step):
+        """Split [0, total) into self.segments ranges whose starts fall on the sampling grid"""
+        n_samples = (total + step - 1) // step
+        bounds = [round(n_samples * k / self.segments) * step for k in range(self.segments)] + [total]
+        return [(a, b) for a, b in zip(bounds, bounds[1:]) if a < b]
+
+    def _segment_kwargs(self):
+        return {
+            "video_path": self.video_path, "region": self.region, "engine": self.engine,
+            "sample_ms": self.sample_ms, "min_duration_ms": self.min_duration_ms, "output_path": self.output_path,
+            "sampling": self.sampling, "change_threshold": self.change_threshold, "workers": self.workers,
+            "batch_size": self.batch_size, "batch_strategy": self.batch_strategy, "refine": self.refine,
+            "presence_threshold": self.detector.threshold if self.detector is not None else None,
+            "presence_eval": self.presence_eval,
+            # Each child times into its own registry; the parent merges them afterwards
+            "metrics": Metrics() if self.metrics.enabled else None,
+            "postprocessor": self.postprocessor.fresh(),
+        }
+
+    def _run_segments(self, fps, total, step, segmenter):
+        """
+        Run each time segment in its own process and stitch the timelines in order
+        Every segment replays into the one segmenter, so an entry spanning a boundary
+        merges exactly as it would in a single pass.
+        """
+        bounds = self._segment_bounds(total, step)
+        kwargs = self._segment_kwargs()
+        resume = False
+        if self.journal_path:
+            # The top-level journal only holds the header; each segment journals into its own file
+            header = self._journal_header(fps, total, 0, total)
+            self._journal = ExtractionJournal(self.journal_path)
+            resume = self.resume and self._journal.matches(header)
+            if not resume:
+                self._journal.start(header)
+                self._journal.close()
+        ctx = multiprocessing.get_context("spawn")  # Forking a process with GUI/decoder threads is unsafe
+        progress_q = ctx.Queue()
+        stop_event = ctx.Event()
+        done_per_segment = {}
+        with ProcessPoolExecutor(max_workers=len(bounds), mp_context=ctx, initializer=_init_segment_worker,
+                                 initargs=(progress_q, stop_event, len(bounds), ctx.Value("i", 0))) as pool:
+            futures = []
+            for start, end in bounds:
+                path = segment_journal_path(self.journal_path, start) if self.journal_path else None
+                futures.append(pool.submit(_extract_segment, dict(kwargs, journal_path=path, resume=resume), start, end))
+            pending = set(futures)
+            while pending:
+                finished, pending = wait(pending, timeout=0.1)
+                if self.stopped:
+                    stop_event.set()
+                try:
+                    while True:
+                        start, count = progress_q.get_nowait()
+                        done_per_segment[start] = count
+                except queue.Empty:
+                    pass
+                self.frames_processed = sum(done_per_segment.values())
+                self.progress = int(self.frames_processed * step / max(1, total) * 100)
+                if self.events.progress_due():
+                    self._publish_progress()
+                for f in finished:
+                    if f.exception() is not None:
+                        stop_event.set()
+                        raise f.exception()
+        # After a stop every child has returned what it processed so far; stitch that like a full run
+        parts = [f.result() for f in futures]
+        reader = FrameReader(self.video_path, self._crop) if self.refine and not self.stopped else None
+        try:
+            prev = None
+            for k, part in enumerate(parts):
+                first = part["first"]
+                if reader is not None and prev is not None and first is not None \
+                        and normalize_text(first[1]) != normalize_text(prev[1]):
+                    # The change falls between two segments, so neither child could refine it
+                    with self.metrics.timer("refine"):
+                        boundaries = self._refine_boundary(reader, prev, first)
+                    for idx, boundary_text in boundaries:
+                        segmenter.feed(int((idx / max(1, fps)) * 1000), boundary_text)
+                for t_ms, text, samples in part["timeline"]:
+                    segmenter.feed(t_ms, text, samples)
+                if part["stopped"] and part["timeline"] and k + 1 < len(parts):
+                    # Close the entry at the segment's last sample rather than across the frames it never reached
+                    segmenter.feed(part["timeline"][-1][0], "")
+                if part["last"] is not None:
+                    prev = part["last"]
+        finally:
+            if reader is not None:
+                reader.release()
+        self.sampling_used = parts[0]["sampling_used"]
+        self.frames_processed = 0
+        for part in parts:
+            for name in SEGMENT_STATS:
+                setattr(self, name, getattr(self, name) + part["stats"][name])
+            self.presence_records.extend(part["presence_records"])
+            for name, value in part["engine_stats"].items():
+                setattr(self.engine, name, getattr(self.engine, name, 0) + value)
+            if part["metrics"] is not None:
+                self.metrics.merge(part["metrics"])
+            self.postprocessor.merge_hits(part["postprocess_hits"])
+            self.last_request_error = part["last_request_error"] or self.last_request_error
+        self.current_entries_count = len(segmenter.entries)
+        if not self.stopped:
+            self.progress = 100
+
+    def run_segment(self, start, end, on_sample=None):
+        """Process one segment for _run_segments and return its compressed timeline and counters"""
+        cap = cv2.VideoCapture(self.video_path)
+        if not cap.isOpened():
+            raise RuntimeError("无法打开视频")
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.total_frames = total
+        step = max(1, int(fps * self.sample_ms / 1000))
+        self.sampling_used = self._choose_sampling(cap, total, step)
+        self._on_sample = on_sample
+        counters = {name: getattr(self.engine, name) for name in SEGMENT_ENGINE_COUNTERS
+                    if isinstance(getattr(self.engine, name, None), int)}
+        timeline = TimelineRecorder()
+        first = last = None
+        resume_at = start
+        if self.journal_path:
+            first, last, last_index = self._open_journal(self.journal_path, self._journal_header(fps, total, start, end),
+                                                         timeline)
+            if last_index is not None:
+                resume_at = last_index + step
+        try:
+            first, last = self._process(cap, fps, total, step, resume_at, end, timeline, first, last)
+            if self._failed and not self.stopped:
+                recovered = self._retry_failed()
+                if recovered:
+                    timeline = TimelineRecorder()
+                    first, last = self._replay_feeds(timeline, recovered)
+        finally:
+            cap.release()
+            if self._journal is not None:
+                self._journal.close()
+        engine_stats = {name: getattr(self.engine, name) - start_value for name, start_value in counters.items()}
+        return {
+            "timeline": timeline.points,
+            "stopped": self.stopped,
+            "first": first,
+            "last": last,
+            "sampling_used": self.sampling_used,
+            "presence_records": self.presence_records,
+            "stats": {name: getattr(self, name) for name in SEGMENT_STATS},
+            "engine_stats": engine_stats,
+            "metrics": self.metrics if self.metrics.enabled else None,
+            "last_request_error": self.last_request_error,
+            "postprocess_hits": self.postprocessor.stats(),
+        }
+
+
+class TimelineRecorder:
+    """Segmenter stand-in that keeps only the feeds that matter for replay
+
+    Repeats of the current text collapse into one point carrying the latest
+    timestamp and the number of samples, so replaying `points` into a
+    SubtitleSegmenter gives the same entries as feeding it every sample.
+    """
+
+    def __init__(self):
+        self.points = []
+        self.entries = []  # Mirrors SubtitleSegmenter for progress reporting; never filled
+        self._repeat = False
+
+    def feed(self, t_ms, text, samples=1):
+        if self.points and normalize_text(text) == normalize_text(self.points[-1][1]):
+            # Same text as the run in progress: only the latest timestamp and the count matter
+            if self._repeat:
+                _, run_text, n = self.points[-1]
+                self.points[-1] = (t_ms, run_text, n + samples)
+            else:
+                self.points.append((t_ms, self.points[-1][1], samples))
+                self._repeat = True
+            return
+        self.points.append((t_ms, text, samples))
+        self._repeat = False
+
+
+SEGMENT_STATS = ("frames_processed", "api_calls", "api_calls_skipped", "presence_skipped", "refine_calls", "refine_frames",
+                 "resumed_samples", "failed_samples", "recovered_samples")
+SEGMENT_ENGINE_COUNTERS = ("hits", "misses", "coalesced")
+_segment_progress = None
+_segment_stop = None
+
+
+def _init_segment_worker(progress_q, stop_event, segments, counter):
+    global _segment_progress, _segment_stop
+    _segment_progress = progress_q
+    _segment_stop = stop_event
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+    # Rate limits are per process, so each segment gets its share of the config's budget
+    set_process_share(segments, index)
+
+
+def _extract_segment(kwargs, start, end):
+    """Process-pool entry point: run one segment with a fresh Extractor and decoder"""
+    extractor = Extractor(**kwargs)
+    last_report = [time.time()]
+
+    def on_sample(i):
+        if _segment_stop is not None and _segment_stop.is_set():
+            extractor.stopped = True
+        now = time.time()
+        if _segment_progress is not None and now - last_report[0] > 0.2:
+            last_report[0] = now
+            _segment_progress.put((start, extractor.frames_processed))
+
+    result = extractor.run_segment(start, end, on_sample)
+    if _segment_progress is not None:
+        _segment_progress.put((start, extractor.frames_processed))
+    return result
+
+def normalize_text(t):
+    return ''.join(t.lower().split())
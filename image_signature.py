@@ -0,0 +1,71 @@
+"""
+Image Signature Module
+Cheap downscaled signatures of subtitle crops for change detection
+"""
+
+import cv2
+import numpy as np
+
+from subtitle_detector import BRIGHT_LEVEL
+
+SIGNATURE_HEIGHT = 32  # Rows of the signature; the width follows the crop's aspect ratio
+MAX_SIGNATURE_WIDTH = 1024
+CELL_TOLERANCE = 32  # Text coverage difference (of 255) treated as noise along glyph edges
+# Largest signature_distance treated as "unchanged". On 1280x144 bands, one-glyph edits ("here"/"hare",
+# "21"/"27", "O"/"Q", "there."/"there,", "rn"/"m") score 0.0039-0.17, while the same text over a moving
+# background scores 0.001 or less in 9 of 10 samples (at most 0.0029). Glyphs that differ by a few
+# pixels (I/l) stay below any useful threshold, and dark or low-contrast text is not seen at all.
+CHANGE_THRESHOLD = 0.002
+
+
+def parse_change_threshold(text):
+    """CHANGE_THRESHOLD for "", None (gate off) for "off", otherwise the number"""
+    text = (text or "").strip().lower()
+    if not text:
+        return CHANGE_THRESHOLD
+    return None if text in ("off", "none") else float(text)
+
+
+def crop_signature(image_bgr, height=SIGNATURE_HEIGHT):
+    """
+    Text coverage map of the crop: per cell, the share (0-255) of pixels at least BRIGHT_LEVEL
+    Only the bright glyph pixels count, so video moving behind the outlined text leaves the
+    signature alone. `height` rows tall, proportionally wide.
+    """
+    if image_bgr.ndim == 3:
+        gray = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2GRAY)
+    else:
+        gray = image_bgr
+    h, w = gray.shape[:2]
+    width = max(1, min(MAX_SIGNATURE_WIDTH, round(w * height / max(1, h))))
+    text = (gray >= BRIGHT_LEVEL).astype(np.float32)
+    return (cv2.resize(text, (width, height), interpolation=cv2.INTER_AREA) * 255).astype(np.int16)
+
+
+def signature_distance(a, b, tolerance=CELL_TOLERANCE):
+    """
+    Largest fraction of cells changed by more than `tolerance` in any square window (0.0-1.0)
+    The window is as wide as the signature is tall, about one glyph, so a changed character scores the
+    same on a short line as on a long one instead of being averaged away over the whole band.
+    """
+    if a is None or b is None or a.shape != b.shape:
+        return 1.0
+    changed = np.count_nonzero(np.abs(a - b) > tolerance, axis=0)
+    window = min(a.shape[0], a.shape[1])
+    sums = np.concatenate(([0], np.cumsum(changed)))
+    return float((sums[window:] - sums[:-window]).max()) / (window * a.shape[0])
+
+
+def perceptual_hash(image_bgr, size=(65, 16), margin=8):
+    """Gradient hash of the crop as a hex string
+
+    A bit is set where a pixel differs from its left neighbour by more than
+    `margin` gray levels, so flat backgrounds hash the same despite codec noise.
+    """
+    if image_bgr.ndim == 3:
+        gray = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2GRAY)
+    else:
+        gray = image_bgr
+    small = cv2.resize(gray, size, interpolation=cv2.INTER_AREA).astype(np.int16)
+    bits = np.abs(small[:, 1:] - small[:, :-1]) > margin
+    return np.packbits(bits.flatten()).tobytes().hex()
@@ -0,0 +1,76 @@
+"""
+Log Sink Module
+Bounded, batched log buffer for the GUI log view, with an optional rotating log file
+
+Writers may be on any thread. The view drains the sink once per UI tick and appends the batch in one go;
+if it falls behind, the oldest pending lines are dropped instead of piling up. File output goes through a
+QueueListener so disk I/O never runs on the writer's thread.
+"""
+
+import collections
+import logging
+import logging.handlers
+import queue
+import threading
+
+MAX_LOG_LINES = 5000  # Lines kept in the view and pending in the sink
+LOG_FILE_MAX_BYTES = 10 * 1024 * 1024
+LOG_FILE_BACKUPS = 3
+
+
+class LogSink:
+    """Thread-safe ring buffer of pending log lines, drained in batches"""
+
+    def __init__(self, max_lines=MAX_LOG_LINES, file_path=None, max_bytes=LOG_FILE_MAX_BYTES,
+                 backups=LOG_FILE_BACKUPS):
+        self.max_lines = max_lines
+        self.file_path = file_path
+        self.dropped = 0  # Lines that never reached the view because it fell behind
+        self._pending = collections.deque(maxlen=max_lines)
+        self._lock = threading.Lock()
+        self._logger = None
+        self._listener = None
+        if file_path:
+            handler = logging.handlers.RotatingFileHandler(file_path, maxBytes=max_bytes, backupCount=backups,
+                                                           encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            log_queue = queue.SimpleQueue()
+            self._listener = logging.handlers.QueueListener(log_queue, handler)
+            self._listener.start()
+            self._logger = logging.getLogger(f"{__name__}.{id(self)}")
+            self._logger.propagate = False
+            self._logger.setLevel(logging.INFO)
+            self._logger.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    def write(self, text):
+        """Queue `text` (may span several lines) for the view and the log file"""
+        lines = str(text).split("\n")
+        with self._lock:
+            self.dropped += max(0, len(self._pending) + len(lines) - self.max_lines)
+            self._pending.extend(lines)
+        logger = self._logger
+        if logger is not None:
+            for line in lines:
+                logger.info(line)
+
+    def drain(self):
+        """(lines, dropped since the last drain) pending for the view"""
+        with self._lock:
+            lines = list(self._pending)
+            self._pending.clear()
+            dropped, self.dropped = self.dropped, 0
+        return lines, dropped
+
+    def clear(self):
+        """Forget pending lines (the log file keeps everything)"""
+        with self._lock:
+            self._pending.clear()
+            self.dropped = 0
+
+    def close(self):
+        if self._listener is not None:
+            self._listener.stop()
+            for handler in self._listener.handlers:
+                handler.close()
+            self._listener = None
+            self._logger = None
@@ -1,23 +1,32 @@
 import sys
 import os
-import base64
+import multiprocessing
 import threading
 import time
 import cv2
 import numpy as np
-import requests
-import json
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QLabel, QPushButton,
                                QFileDialog, QVBoxLayout, QHBoxLayout, QMessageBox,
-                               QSlider, QComboBox, QProgressBar, QTextEdit, QDialog,
-                               QDialogButtonBox, QListWidget, QListWidgetItem,
-                               QLineEdit, QPlainTextEdit, QInputDialog, QStyle, QStyleOptionComboBox)
+                               QSlider, QComboBox, QProgressBar, QDialog,
+                               QPlainTextEdit, QStyle, QStyleOptionComboBox, QCheckBox)
 from PyQt6.QtGui import QPixmap, QImage, QPainter, QColor, QPen
-from PyQt6.QtCore import Qt, QRect, QTimer
+from PyQt6.QtCore import Qt, QRect, QSize, QTimer, QObject, pyqtSignal
 from prompt_manager import PromptManager
 from prompt_config_ui import PromptConfigDialog
-from config_manager import ConfigManager, APIConfig
+from config_manager import ConfigManager
 from api_config_ui import APIConfigDialog
+from ocr_cache import OCRResultCache, CachedOCREngine
+from ocr_engine import OpenAIOCREngine
+from async_ocr_engine import AsyncOpenAIOCREngine
+from extraction_journal import ExtractionJournal, journal_path_for
+from engine_pool import PooledOCREngine, format_pool_stats
+from metrics import Metrics
+from image_signature import parse_change_threshold
+from postprocess import load_postprocessor, format_hits
+from preview_cache import FrameCache, FrameDecoder, ThumbnailIndex
+from log_sink import LogSink, MAX_LOG_LINES
+from extraction_events import EventPublisher, ProgressEvent, EntryEvent, ErrorEvent, FinishedEvent
+from extractor import Extractor, DEFAULT_WORKERS, create_engine, create_pool_engine, format_srt_timestamp, engine_limiters
 
 class ArrowComboBox(QComboBox):
     def __init__(self, parent=None):
@@ -42,99 +51,13 @@ class ArrowComboBox(QComboBox):
         self.arrow_label.setGeometry(rect)
 
 
-class DummyEngine:
-    def recognize(self, image_bgr):
-        return ""
-
-class OpenAIOCREngine:
-    def __init__(self, endpoint, api_key, model, prompt, system_prompt=None):
-        self.endpoint = endpoint
-        self.api_key = api_key
-        self.model = model
-        self.prompt = prompt
-        self.system_prompt = system_prompt or ""
-        self.session = requests.Session()
-
-    def _encode_image(self, image_bgr):
-        _, buf = cv2.imencode('.png', image_bgr)
-        return "data:image/png;base64," + base64.b64encode(buf.tobytes()).decode('ascii')
-
-    def recognize(self, image_bgr, should_stop=None):
-        """
-        Recognize text with optional stop check
-        should_stop: callable that returns True if should stop processing
-        """
-        # Quick check before making request
-        if should_stop and should_stop():
-            return ""
-
-        headers = {"Content-Type": "application/json"}
-        if self.api_key:
-            headers["Authorization"] = f"Bearer {self.api_key}"
-        image_url = self._encode_image(image_bgr)
-        messages = []
-        if self.system_prompt:
-            messages.append({"role": "system", "content": self.system_prompt})
-        messages.append({
-            "role": "user",
-            "content": [
-                {"type": "text", "text": self.prompt},
-                {"type": "image_url", "image_url": {"url": image_url}}
-            ]
-        })
-        payload = {"model": self.model, "messages": messages, "temperature": 0}
-
-        # Use shorter timeout to allow more frequent stop checks
-        timeout = 5  # Reduced from 30 to 5 seconds for very responsive stop
-
-        try:
-            r = self.session.post(self.endpoint.rstrip('/') + "/v1/chat/completions", headers=headers, json=payload, timeout=timeout)
-            j = r.json()
-            c = j.get("choices", [])
-            if not c:
-                return ""
-            m = c[0].get("message", {})
-            content = m.get("content", "")
-            if isinstance(content, list) and content and isinstance(content[0], dict):
-                t = content[0].get("text", "")
-                return t.strip()
-            if isinstance(content, str):
-                return content.strip()
-            return ""
-        except Exception:
-            return ""
-
-def format_srt_timestamp(ms):
-    h = ms // 3600000
-    m = (ms % 3600000) // 60000
-    s = (ms % 60000) // 1000
-    msr = ms % 1000
-    return f"{h:02}:{m:02}:{s:02},{msr:03}"
-
-def write_srt(entries, path):
-    lines = []
-    for i, e in enumerate(entries, 1):
-        lines.append(str(i))
-        lines.append(f"{format_srt_timestamp(e['start'])} --> {format_srt_timestamp(e['end'])}")
-        lines.append(e['text'])
-        lines.append("")
-    with open(path, 'w', encoding='utf-8') as f:
-        f.write("\n".join(lines))
-
-def write_txt(entries, path):
-    """Write entries as plain text article"""
-    lines = []
-    for i, e in enumerate(entries, 1):
-        lines.append(e['text'])
-        lines.append("")  # Add blank line between entries
-    with open(path, 'w', encoding='utf-8') as f:
-        f.write("\n".join(lines).strip())
-
 class VideoLabel(QLabel):
     def __init__(self):
         super().__init__()
         self.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.pix = None
+        self.frame = None  # BGR ndarray currently shown
+        self.frame_size = (0, 0)  # Full-resolution size; the frame may be a smaller thumbnail
+        self._scaled = None  # Frame scaled to draw_rect, rebuilt only on a new frame or a resize
         self.selecting = False
         self.rect = QRect()
         self.start_pos = None
@@ -143,28 +66,77 @@ class VideoLabel(QLabel):
         self.scale_y = 1.0
         self._rect_cb = None
 
-    def set_image(self, img_bgr):
+    def set_image(self, img_bgr, frame_size=None):
         h, w, _ = img_bgr.shape
-        img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
-        qimg = QImage(img_rgb.data, w, h, 3 * w, QImage.Format.Format_RGB888)
-        self.pix = QPixmap.fromImage(qimg)
-        self.setPixmap(self.pix)
+        size = frame_size or (w, h)
+        self.frame = img_bgr
+        self._scaled = None
+        if size != self.frame_size:
+            self.frame_size = size
+            self._update_layout()
+            self.updateGeometry()
         self.update()
 
+    def sizeHint(self):
+        if self.frame is None:
+            return super().sizeHint()
+        m = self.contentsMargins()
+        return QSize(self.frame_size[0] + m.left() + m.right(), self.frame_size[1] + m.top() + m.bottom())
+
+    def minimumSizeHint(self):
+        return self.sizeHint()
+
+    def resizeEvent(self, e):
+        super().resizeEvent(e)
+        self._update_layout()
+        self._scaled = None
+
+    def _update_layout(self):
+        lw = self.width()
+        lh = self.height()
+        iw, ih = self.frame_size
+        if iw > 0 and ih > 0 and lw > 0 and lh > 0:
+            s = min(lw / iw, lh / ih)
+            tw = max(1, int(iw * s))
+            th = max(1, int(ih * s))
+            self.draw_rect = QRect((lw - tw) // 2, (lh - th) // 2, tw, th)
+            self.scale_x = iw / tw
+            self.scale_y = ih / th
+        else:
+            self.draw_rect = QRect()
+
+    def _scaled_pixmap(self):
+        """
+        Pixmap for draw_rect, made by wrapping the BGR buffer as-is (no colour conversion)
+        Larger frames are downscaled in numpy first; smaller ones (thumbnails) are kept at their size
+        and stretched by the painter, which is cheaper than building a full-size pixmap per slider step.
+        """
+        dpr = self.devicePixelRatioF()
+        tw = max(1, round(self.draw_rect.width() * dpr))
+        th = max(1, round(self.draw_rect.height() * dpr))
+        img = self.frame
+        if tw < img.shape[1]:
+            # INTER_LINEAR: INTER_AREA costs ~50ms on a 4K frame and the preview only needs to look right
+            img = cv2.resize(img, (tw, th), interpolation=cv2.INTER_LINEAR)
+        img = np.ascontiguousarray(img)
+        h, w = img.shape[:2]
+        pix = QPixmap.fromImage(QImage(img.data, w, h, img.strides[0], QImage.Format.Format_BGR888))
+        if w == tw:
+            pix.setDevicePixelRatio(dpr)
+        return pix
+
     def mousePressEvent(self, e):
-        if self.pix is None:
+        if self.frame is None:
             return
         if e.button() == Qt.MouseButton.LeftButton:
             self.selecting = True
             self.start_pos = e.position().toPoint()
-            self.rect = QRect(self.start_pos, self.start_pos)
-            self.update()
+            self._set_selection(QRect(self.start_pos, self.start_pos))
 
     def mouseMoveEvent(self, e):
-        if self.selecting and self.pix is not None:
+        if self.selecting and self.frame is not None:
             cur = e.position().toPoint()
-            self.rect = QRect(self.start_pos, cur).normalized()
-            self.update()
+            self._set_selection(QRect(self.start_pos, cur).normalized())
             if self._rect_cb:
                 r = self.get_selection_rect_in_image()
                 if r:
@@ -175,30 +147,30 @@ class VideoLabel(QLabel):
             self.selecting = False
             self.update()
 
+    def _set_selection(self, rect):
+        # Repaint only the strip the outline moved through; the cached pixmap is blitted, not rescaled
+        dirty = self.rect.united(rect) if not self.rect.isNull() else rect
+        self.rect = rect
+        self.update(dirty.adjusted(-2, -2, 2, 2))
+
     def paintEvent(self, e):
         super().paintEvent(e)
-        if self.pix is not None:
+        if self.frame is not None:
             p = QPainter(self)
-            lw = self.width()
-            lh = self.height()
-            iw = self.pix.width()
-            ih = self.pix.height()
-            if iw > 0 and ih > 0 and lw > 0 and lh > 0:
-                s = min(lw / iw, lh / ih)
-                tw = int(iw * s)
-                th = int(ih * s)
-                ox = (lw - tw) // 2
-                oy = (lh - th) // 2
-                self.draw_rect = QRect(ox, oy, tw, th)
-                self.scale_x = iw / max(1, tw)
-                self.scale_y = ih / max(1, th)
-                p.drawPixmap(self.draw_rect, self.pix)
+            if not self.draw_rect.isEmpty():
+                if self._scaled is None:
+                    self._scaled = self._scaled_pixmap()
+                if self._scaled.deviceIndependentSize().toSize() == self.draw_rect.size():
+                    p.drawPixmap(self.draw_rect.topLeft(), self._scaled)
+                else:
+                    p.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+                    p.drawPixmap(self.draw_rect, self._scaled)
             if not self.rect.isNull():
                 p.setPen(QPen(QColor(255, 0, 0, 200), 2))
                 p.drawRect(self.rect)
 
     def get_selection_rect_in_image(self):
-        if self.pix is None or self.rect.isNull() or self.draw_rect.isNull():
+        if self.frame is None or self.rect.isNull() or self.draw_rect.isNull():
             return None
         sel = self.rect.intersected(self.draw_rect)
         if sel.isNull():
@@ -211,8 +183,7 @@ class VideoLabel(QLabel):
         y = int(ry * self.scale_y)
         w = int(rw * self.scale_x)
         h = int(rh * self.scale_y)
-        iw = self.pix.width()
-        ih = self.pix.height()
+        iw, ih = self.frame_size
         x = max(0, min(x, iw - 1))
         y = max(0, min(y, ih - 1))
         w = max(1, min(w, iw - x))
@@ -222,148 +193,30 @@ class VideoLabel(QLabel):
     def set_rect_callback(self, cb):
         self._rect_cb = cb
 
-class Extractor:
-    def __init__(self, video_path, region, engine, sample_ms, min_duration_ms, output_path):
-        self.video_path = video_path
-        self.region = region
-        self.engine = engine
-        self.sample_ms = sample_ms
-        self.min_duration_ms = min_duration_ms
-        self.output_path = output_path
-        self.progress = 0
-        self.done = False
-        self.stopped = False  # Add stop flag
-        self.error = None
-        self.started_at = 0.0
-        self.finished_at = 0.0
-        self.elapsed_ms = 0
-        self.frames_processed = 0
-        self.total_frames = 0
-        self.entries_count = 0
-        self.current_entries_count = 0  # Track current entries count during extraction
-
-    def _filter_subtitle_text(self, text):
-        """Filter out descriptive responses when no subtitles are present"""
-        if not text:
-            return ""
+class PreviewSignals(QObject):
+    """Carries FrameDecoder callbacks from the decoder thread to the GUI thread"""
+    opened = pyqtSignal(object)  # VideoInfo
+    open_failed = pyqtSignal(str, str)  # path, message
+    frame_ready = pyqtSignal(int, object)  # index, BGR frame
+
+
+class ExtractionSignals(QObject):
+    """Carries Extractor events from the worker thread to the GUI thread"""
+    progress = pyqtSignal(object)  # ProgressEvent
+    entry = pyqtSignal(object)  # EntryEvent
+    error = pyqtSignal(object)  # ErrorEvent
+    finished = pyqtSignal(object)  # FinishedEvent
+
+    def publish(self, event):
+        if isinstance(event, ProgressEvent):
+            self.progress.emit(event)
+        elif isinstance(event, EntryEvent):
+            self.entry.emit(event)
+        elif isinstance(event, ErrorEvent):
+            self.error.emit(event)
+        elif isinstance(event, FinishedEvent):
+            self.finished.emit(event)
 
-        # List of keywords that indicate no subtitles (in Chinese and English)
-        no_subtitle_patterns = [
-            # Chinese patterns
-            "图中无", "没有字幕", "无字幕", "没有文字", "无文字",
-            "没有可读", "无可读", "没有内容", "无内容",
-            "图片中无", "图片中没有", "画面无", "画面中无",
-            "未发现", "未找到", "不存在",
-            # English patterns
-            "no subtitle", "no text", "no readable",
-            "no content", "nothing", "empty",
-            # Common descriptive phrases
-            "图中", "图片中", "画面", "此图", "该图",
-            "截图", "视频", "帧",
-        ]
-
-        # Convert to lowercase for matching
-        text_lower = text.lower()
-
-        # Check if text contains no-subtitle patterns
-        for pattern in no_subtitle_patterns:
-            if pattern in text_lower:
-                # Check if text is short (descriptive responses are usually short)
-                if len(text) <= 20 or text_lower.strip() == pattern:
-                    return ""
-
-        # Additional check: if text looks like a description rather than subtitles
-        # Subtitles usually contain dialogue, while descriptions explain the image
-        description_indicators = [
-            "字幕", "文字", "文本", "内容",
-            "截图", "图片", "画面", "视频", "帧",
-        ]
-
-        # If text contains these words AND is short, it's likely a description
-        if len(text) <= 15:
-            for indicator in description_indicators:
-                if indicator in text_lower:
-                    return ""
-
-        return text
-
-    def run(self):
-        cap = cv2.VideoCapture(self.video_path)
-        if not cap.isOpened():
-            self.error = "无法打开视频"
-            self.done = True
-            return
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        self.total_frames = total
-        step = max(1, int(fps * self.sample_ms / 1000))
-        entries = []
-        prev_text = None
-        cur_start_ms = None
-        i = 0
-        self.started_at = time.time()
-        while True:
-            if self.stopped:
-                cap.release()
-                self.done = True
-                return
-            ret, frame = cap.read()
-            if not ret:
-                break
-            if i % step != 0:
-                i += 1
-                continue
-            crop = frame
-            if self.region is not None:
-                x, y, w, h = self.region
-                x = max(0, x)
-                y = max(0, y)
-                w = max(1, w)
-                h = max(1, h)
-                x2 = min(frame.shape[1], x + w)
-                y2 = min(frame.shape[0], y + h)
-                crop = frame[y:y2, x:x2]
-            raw_text = self.engine.recognize(crop, should_stop=lambda: self.stopped).strip()
-            # Post-process: filter out descriptive responses when no subtitles
-            text = self._filter_subtitle_text(raw_text)
-            t_ms = int((i / max(1, fps)) * 1000)
-            if text and prev_text is None:
-                prev_text = text
-                cur_start_ms = t_ms
-            elif text and prev_text is not None:
-                if normalize_text(text) != normalize_text(prev_text):
-                    end_ms = max(t_ms, cur_start_ms + self.min_duration_ms)
-                    entries.append({"start": cur_start_ms, "end": end_ms, "text": prev_text})
-                    self.current_entries_count += 1
-                    prev_text = text
-                    cur_start_ms = t_ms
-            elif not text and prev_text is not None:
-                end_ms = max(t_ms, cur_start_ms + self.min_duration_ms)
-                entries.append({"start": cur_start_ms, "end": end_ms, "text": prev_text})
-                self.current_entries_count += 1
-                prev_text = None
-                cur_start_ms = None
-            self.progress = int((i + 1) / max(1, total) * 100)
-            self.frames_processed += 1
-            i += 1
-        if prev_text is not None and cur_start_ms is not None:
-            end_ms = max(t_ms, cur_start_ms + self.min_duration_ms)
-            entries.append({"start": cur_start_ms, "end": end_ms, "text": prev_text})
-            self.current_entries_count += 1
-        self.entries = entries  # Store entries for potential save on stop
-        cap.release()
-        if entries:
-            write_srt(entries, self.output_path)
-            # Also write as plain text
-            txt_path = self.output_path.replace('.srt', '.txt')
-            write_txt(entries, txt_path)
-        self.entries_count = len(entries)
-        self.finished_at = time.time()
-        self.elapsed_ms = int((self.finished_at - self.started_at) * 1000)
-        self.done = True
-
-def normalize_text(t):
-    return ''.join(t.lower().split())
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -372,10 +225,26 @@ class MainWindow(QMainWindow):
         self.setStyleSheet(self.get_modern_stylesheet())
         self.video_path = None
         self.first_frame = None
-        self.cap = None
         self.fps = 0.0
         self.frame_count = 0
         self.cur_index = 0
+        self.frame_cache = FrameCache()
+        self.thumbnails = None
+        self.opening_path = None
+        self.video_info = None  # VideoInfo shown in the window
+        self.decoder_video = None  # VideoInfo the decoder holds; differs from video_info after a superseded open
+        self.preview_signals = PreviewSignals()
+        self.preview_signals.opened.connect(self.on_video_opened)
+        self.preview_signals.open_failed.connect(self.on_video_open_failed)
+        self.preview_signals.frame_ready.connect(self.on_frame_ready)
+        self.frame_decoder = FrameDecoder(self.frame_cache, on_opened=self.preview_signals.opened.emit,
+                                          on_error=self.preview_signals.open_failed.emit,
+                                          on_frame=self.preview_signals.frame_ready.emit)
+        self.extraction_signals = ExtractionSignals()
+        self.extraction_signals.progress.connect(self.on_extract_progress)
+        self.extraction_signals.entry.connect(self.on_extract_entry)
+        self.extraction_signals.error.connect(self.on_extract_error)
+        self.extraction_signals.finished.connect(self.on_extract_finished)
         self.label = VideoLabel()
         self.open_btn = QPushButton("打开视频")
         self.open_btn.setObjectName("open_btn")
@@ -400,6 +269,9 @@ class MainWindow(QMainWindow):
         self.api_btn = QPushButton("管理API")
         self.api_btn.setObjectName("api_btn")
 
+        self.pool_check = QCheckBox("同组负载均衡")
+        self.pool_check.setToolTip("把请求分散到所选配置所在分组的全部 API 配置，按实时延迟和错误率分配，故障的配置自动摘除")
+
         self.stop_btn = QPushButton("终止")
         self.stop_btn.setObjectName("stop_btn")
 
@@ -414,8 +286,10 @@ class MainWindow(QMainWindow):
         self.progress_bar.setRange(0, 10000)
         self.progress_bar.setFormat("0.00%")
 
-        self.log_view = QTextEdit()
+        self.log_view = QPlainTextEdit()
         self.log_view.setReadOnly(True)
+        self.log_view.setUndoRedoEnabled(False)  # Undo history would grow with every append
+        self.log_view.setMaximumBlockCount(MAX_LOG_LINES)
 
         self.open_btn.clicked.connect(self.open_video)
         self.extract_btn.clicked.connect(self.start_extract)
@@ -437,6 +311,7 @@ class MainWindow(QMainWindow):
         ctrl.addWidget(self.extract_btn)
         ctrl.addWidget(self.api_combo, 2)
         ctrl.addWidget(self.api_btn)
+        ctrl.addWidget(self.pool_check)
         ctrl.addWidget(self.stop_btn)
         ctrl.addWidget(self.prompt_combo, 2)
         ctrl.addWidget(self.suggest_prompt_btn)
@@ -455,10 +330,6 @@ class MainWindow(QMainWindow):
         lay.addWidget(self.log_view)
         w.setLayout(lay)
         self.setCentralWidget(w)
-        self.timer = QTimer()
-        self.timer.setInterval(100)  # Faster update for smoother UI (100ms instead of 500ms)
-        self.timer.timeout.connect(self.poll_extractor)
-
         # Animation timer for status text flashing during stop
         self.anim_timer = QTimer()
         self.anim_timer.setInterval(200)  # Faster animation (200ms)
@@ -466,6 +337,18 @@ class MainWindow(QMainWindow):
         self._stop_animation = False
         self._stop_status_original = ""
 
+        # Log lines are batched and appended once per tick; the timer only runs while lines are pending
+        self.log_sink = LogSink(file_path=os.getenv("OCR_LOG_FILE") or None)
+        self.log_timer = QTimer()
+        self.log_timer.setInterval(100)
+        self.log_timer.timeout.connect(self.flush_log)
+
+        # Slider moves show cached frames or thumbnails; the exact frame is decoded once the slider settles
+        self.seek_timer = QTimer()
+        self.seek_timer.setSingleShot(True)
+        self.seek_timer.setInterval(120)
+        self.seek_timer.timeout.connect(self.on_seek_settled)
+
         self.extractor = None
         self.thread = None
         self.manager = ConfigManager(os.getcwd())
@@ -475,6 +358,7 @@ class MainWindow(QMainWindow):
         self.last_progress_ts = 0.0
         self.custom_prompt_override = None
         self.prompt_manager = PromptManager(os.path.join(os.getcwd(), "configs"))
+        self.ocr_cache = OCRResultCache(os.path.join(os.getcwd(), "configs", "ocr_cache.sqlite3"))
         self.init_prompt_presets()
         self.refresh_api_combo()
         self.stop_btn.setEnabled(False)
@@ -483,23 +367,31 @@ class MainWindow(QMainWindow):
         path, _ = QFileDialog.getOpenFileName(self, "选择视频", "", "视频文件 (*.mp4 *.mkv *.avi *.mov)")
         if not path:
             return
-        if self.cap:
-            self.cap.release()
-        self.cap = cv2.VideoCapture(path)
-        if not self.cap.isOpened():
-            QMessageBox.critical(self, "错误", "无法打开视频")
-            return
-        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 0.0
-        if self.fps <= 0:
-            self.fps = 25.0
-        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
-        ret, frame = self.cap.read()
-        if not ret:
-            QMessageBox.critical(self, "错误", "无法读取视频帧")
-            return
-        self.video_path = path
-        self.first_frame = frame
-        self.label.set_image(frame)
+        # Opening and probing run on the decoder thread (slow on network storage); see on_video_opened
+        self.opening_path = path
+        self.seek_timer.stop()
+        self.slider.setEnabled(False)
+        self.status_label.setText(f"正在打开 {os.path.basename(path)} ...")
+        self.frame_decoder.open(path)
+
+    def on_video_opened(self, info):
+        self.decoder_video = info
+        if info.path != self.opening_path:
+            return  # Superseded by a later open, which follows
+        self.opening_path = None
+        self.show_video(info)
+
+    def show_video(self, info):
+        self.video_info = info
+        if self.thumbnails is not None:
+            self.thumbnails.stop()
+        self.video_path = info.path
+        self.fps = info.fps
+        self.frame_count = info.frame_count
+        self.first_frame = info.first_frame
+        self.thumbnails = ThumbnailIndex(info.path, self.frame_count, self.fps,
+                                         defer_to=self.frame_decoder.busy).start()
+        self.label.set_image(info.first_frame)
         self.extract_btn.setEnabled(True)
         self.slider.setRange(0, max(0, self.frame_count - 1))
         self.slider.setValue(0)
@@ -508,12 +400,14 @@ class MainWindow(QMainWindow):
         self.status_label.setText(self.format_time(self.cur_index))
 
     def build_engine(self):
-        api_key = os.getenv("OCR_API_KEY", "")
-        endpoint = os.getenv("OCR_API_ENDPOINT", "http://localhost:1234")
-        model = os.getenv("OCR_API_MODEL", "qwen/qwen3-vl-8b")
-        prompt = os.getenv("OCR_PROMPT", "只返回图片中的可读字幕文本")
-        system_prompt = os.getenv("OCR_SYSTEM_PROMPT", "")
-        return OpenAIOCREngine(endpoint, api_key, model, prompt, system_prompt)
+        cfg = self.manager.get_selected()
+        if cfg is not None and self.pool_check.isChecked():
+            group = self.manager.list_group(cfg.group)
+            if len(group) > 1:
+                return create_pool_engine(group, [self.manager.decrypt_key(c.api_key_enc) for c in group])
+        if cfg is not None:
+            return create_engine(cfg, self.manager.decrypt_key(cfg.api_key_enc))
+        return create_engine()
 
     def open_api_manager(self):
         dialog = APIConfigDialog(self, self.manager)
@@ -592,7 +486,7 @@ class MainWindow(QMainWindow):
             self._stop_animation = True
             self.anim_timer.start()
 
-            self.log_view.append(f"[{time.strftime('%H:%M:%S')}] ⚠️ 用户请求终止提取...")
+            self.log(f"[{time.strftime('%H:%M:%S')}] ⚠️ 用户请求终止提取...")
 
     def animate_stop_status(self):
         """Animate status text while stopping"""
@@ -612,47 +506,89 @@ class MainWindow(QMainWindow):
         if not self.video_path:
             return
         # Clear log before starting
+        self.log_sink.clear()
         self.log_view.clear()
         self._last_log_time = time.time()  # Initialize logging timer
 
         r = self.label.get_selection_rect_in_image()
         base = os.path.splitext(os.path.basename(self.video_path))[0] + ".srt"
         out = os.path.join(os.path.dirname(self.video_path), base)
-        engine = self.build_engine()
-        self.extractor = Extractor(self.video_path, r, engine, 800, 1200, out)
-        self.extractor.current_entries_count = 0  # Initialize entry count
+        engine = CachedOCREngine(self.build_engine(), self.ocr_cache)
+        workers = int(os.getenv("OCR_WORKERS", str(DEFAULT_WORKERS)))
+        batch_size = int(os.getenv("OCR_BATCH_SIZE", "1"))
+        batch_strategy = os.getenv("OCR_BATCH_STRATEGY", "multi_image")
+        refine = os.getenv("OCR_REFINE", "") == "1"
+        sample_ms = int(os.getenv("OCR_COARSE_MS", "2000")) if refine else 800
+        presence = os.getenv("OCR_PRESENCE_THRESHOLD", "")
+        presence_threshold = float(presence) if presence else None
+        presence_eval = os.getenv("OCR_PRESENCE_EVAL", "") == "1"
+        change_threshold = parse_change_threshold(os.getenv("OCR_CHANGE_THRESHOLD", ""))
+        segments = int(os.getenv("OCR_SEGMENTS", "1"))
+        metrics = Metrics() if os.getenv("OCR_METRICS", "") == "1" or os.getenv("OCR_METRICS_PROM") else None
+        try:
+            postprocessor = load_postprocessor(os.path.join(os.getcwd(), "configs"))
+        except ValueError as e:
+            QMessageBox.warning(self, "后处理规则无效", f"无法加载后处理规则，请检查配置文件：\n{e}")
+            return
+        journal_path = journal_path_for(out)
+        resume = False
+        journal = ExtractionJournal(journal_path)
+        if journal.exists():
+            last = journal.last_sample()
+            where = f"（已处理到 {format_srt_timestamp(last[1])}）" if last else ""
+            answer = QMessageBox.question(self, "继续提取", f"发现上次未完成的提取记录{where}，是否从中断处继续？\n选择“否”将重新开始。")
+            resume = answer == QMessageBox.StandardButton.Yes
+        self.extractor = Extractor(self.video_path, r, engine, sample_ms, 1200, out, workers=workers,
+                                   batch_size=batch_size, batch_strategy=batch_strategy, refine=refine,
+                                   change_threshold=change_threshold, presence_threshold=presence_threshold, presence_eval=presence_eval,
+                                   segments=segments, journal_path=journal_path, resume=resume, metrics=metrics,
+                                   postprocessor=postprocessor,
+                                   events=EventPublisher(self.extraction_signals.publish))
 
         # Log extraction start info
-        self.log_view.append(f"[{time.strftime('%H:%M:%S')}] === 开始提取字幕 ===")
-        self.log_view.append(f"视频文件: {self.video_path}")
+        self.log(f"[{time.strftime('%H:%M:%S')}] === 开始提取字幕 ===")
+        self.log(f"视频文件: {self.video_path}")
         if r:
             x, y, w, h = r
-            self.log_view.append(f"字幕区域: x={x} y={y} w={w} h={h}")
+            self.log(f"字幕区域: x={x} y={y} w={w} h={h}")
         else:
-            self.log_view.append("字幕区域: 全屏")
-        self.log_view.append(f"输出文件: {out}")
-        self.log_view.append(f"模型: {engine.model}")
-        self.log_view.append(f"采样间隔: {self.extractor.sample_ms}ms")
-        self.log_view.append(f"最短字幕时长: {self.extractor.min_duration_ms}ms")
-        self.log_view.append("" + "-" * 60)
+            self.log("字幕区域: 全屏")
+        self.log(f"输出文件: {out}")
+        self.log(f"模型: {engine.model}")
+        if isinstance(engine.engine, PooledOCREngine):
+            self.log(f"负载均衡: {len(engine.engine.members)} 个配置 ({engine.engine.endpoint})")
+            if engine.engine.hedge_percentile is not None:
+                self.log(f"对冲请求: 超过延迟 p{engine.engine.hedge_percentile:g} 未返回时发送副本，"
+                         f"上限 {engine.engine.hedge_budget * 100:g}% 请求")
+        for limiter in engine_limiters(engine):
+            self.log(f"速率限制: RPM {limiter.rpm or '不限'} | TPM {limiter.tpm or '不限'} | "
+                     f"并发 {limiter.max_concurrency or '不限'}")
+        settings = getattr(engine, "encode_settings", None)
+        if settings is not None:
+            self.log(f"图片编码: {settings.format} q={settings.quality} 灰度={'是' if settings.grayscale else '否'} "
+                     f"目标字高={settings.target_text_height or '-'} 最大像素={settings.max_pixels or '-'}")
+        self.log(f"采样间隔: {self.extractor.sample_ms}ms" + (" (粗采样 + 二分细化边界)" if refine else ""))
+        self.log(f"最短字幕时长: {self.extractor.min_duration_ms}ms")
+        if getattr(engine, "is_async", False):
+            self.log(f"并发识别数: {engine.max_in_flight} (asyncio)")
+        else:
+            self.log(f"并发识别数: {self.extractor.workers}")
+        if resume:
+            self.log(f"断点续传: {journal_path}")
+        if self.extractor.segments > 1:
+            self.log(f"分段并行: {self.extractor.segments} 个进程")
+        if self.extractor.batch_size > 1:
+            self.log(f"批量识别: 每次 {self.extractor.batch_size} 张 ({self.extractor.batch_strategy})")
+        self.log("" + "-" * 60)
 
         self.thread = threading.Thread(target=self.extractor.run, daemon=True)
         self.thread.start()
-        self.timer.start()
         self.extract_btn.setEnabled(False)
         self.stop_btn.setEnabled(True)
         self.status_label.setText("正在提取…")
 
-        # Force immediate UI update to show the initial logs
-        QApplication.processEvents()
-
-    def poll_extractor(self):
-        if not self.extractor:
-            return
-        p = self.extractor.progress
-
-        # Process UI events to ensure smooth UI updates (critical for responsive UI)
-        QApplication.processEvents()
+    def on_extract_progress(self, event):
+        p = event.progress
 
         # Update progress bar
         self.progress_bar.setValue(int(p * 100))
@@ -660,86 +596,202 @@ class MainWindow(QMainWindow):
 
         # Update status label (unless animation is running)
         if not self._stop_animation:
-            if self.extractor.started_at:
-                elapsed = int((time.time() - self.extractor.started_at) * 1000)
-                self.status_label.setText(f"进度 {p}% | 已用 {elapsed/1000:.1f}s | 已识别: {self.extractor.current_entries_count}")
-            else:
-                self.status_label.setText(f"进度 {p}%")
+            self.status_label.setText(f"进度 {p}% | 已用 {event.elapsed_ms/1000:.1f}s | 已识别: {event.entries}")
 
         # Real-time log updates - show updates every 500ms for good visibility
-        current_entry_count = getattr(self.extractor, 'current_entries_count', 0)
         current_time = time.time()
         if current_time - self._last_log_time > 0.5:
             self._last_log_time = current_time
-            log_entry = f"[{time.strftime('%H:%M:%S')}] 进度: {p:.1f}% | 已处理帧: {self.extractor.frames_processed}/{self.extractor.total_frames} | 识别条目: {current_entry_count}"
-            self.log_view.append(log_entry)
-
-        if self.extractor.done:
-            # Stop animation when extraction is done
-            if self._stop_animation:
-                self.anim_timer.stop()
-                self._stop_animation = False
+            log_entry = f"[{time.strftime('%H:%M:%S')}] 进度: {p:.1f}% | 已处理帧: {event.frames}/{event.total_frames} | 识别条目: {event.entries}"
+            self.log(log_entry)
+
+    def on_extract_entry(self, event):
+        # Entries restart from #1 when recovered samples are replayed into a new segmenter
+        if event.index == 0 and self.extractor.recovered_samples:
+            self.log("--- 失败的采样已重试恢复，重建字幕条目 ---")
+        self.log(f"  #{event.index + 1} {format_srt_timestamp(event.start)} --> {format_srt_timestamp(event.end)} "
+                 f"{event.text.replace(chr(10), ' / ')}")
+
+    def on_extract_error(self, event):
+        self.log(f"[{time.strftime('%H:%M:%S')}] ❌ 错误: {event.message}")
+        if self.extractor.journal_path and os.path.exists(self.extractor.journal_path):
+            self.log("已处理的进度保存在记录文件中，重新提取时可选择继续")
+
+    def on_extract_finished(self, event):
+        # Stop animation when extraction is done
+        if self._stop_animation:
+            self.anim_timer.stop()
+            self._stop_animation = False
 
-            self.timer.stop()
-            self.extract_btn.setEnabled(True)
-            self.stop_btn.setEnabled(False)
+        self.extract_btn.setEnabled(True)
+        self.stop_btn.setEnabled(False)
 
-            if self.extractor.error:
-                self.log_view.append(f"[{time.strftime('%H:%M:%S')}] ❌ 错误: {self.extractor.error}")
-                QMessageBox.critical(self, "错误", self.extractor.error)
-                self.status_label.setText("发生错误")
-            elif self.extractor.stopped:
-                self.status_label.setText("已终止")
-                self.log_view.append(f"[{time.strftime('%H:%M:%S')}] --- 提取已终止 ---")
-                self.log_view.append(f"已处理帧数: {self.extractor.frames_processed}/{self.extractor.total_frames}")
-                self.log_view.append(f"已识别条目: {current_entry_count}")
-                if self.extractor.entries:
-                    # Save partial results when stopped
-                    write_srt(self.extractor.entries, self.extractor.output_path)
-                    txt_path = self.extractor.output_path.replace('.srt', '.txt')
-                    write_txt(self.extractor.entries, txt_path)
-                    self.log_view.append(f"[⚠️] 已保存部分结果到文件")
-                QMessageBox.information(self, "已终止", f"提取已终止。\n已处理 {self.extractor.frames_processed} 帧，识别 {current_entry_count} 条字幕")
-                self.progress_bar.setValue(0)
-                self.progress_bar.setFormat("0.00%")
-            else:
-                self.log_view.append(f"[{time.strftime('%H:%M:%S')}] === 提取完成 ===")
-                self.log_view.append(f"总耗时: {self.extractor.elapsed_ms/1000:.1f}秒")
-                self.log_view.append(f"处理帧数: {self.extractor.frames_processed}/{self.extractor.total_frames}")
-                self.log_view.append(f"识别字幕条目: {self.extractor.entries_count}")
-                self.log_view.append(f"输出文件 (SRT): {self.extractor.output_path}")
-                self.log_view.append(f"输出文件 (TXT): {self.extractor.output_path.replace('.srt', '.txt')}")
-
-                detail = []
-                detail.append(f"总耗时: {self.extractor.elapsed_ms/1000:.1f}s")
-                detail.append(f"处理帧数: {self.extractor.frames_processed}/{self.extractor.total_frames}")
-                rect = self.label.get_selection_rect_in_image()
-                if rect:
-                    x, y, w, h = rect
-                    detail.append(f"裁切区域: x={x} y={y} w={w} h={h}")
-                detail.append(f"采样间隔: {self.extractor.sample_ms}ms")
-                detail.append(f"最短字幕时长: {self.extractor.min_duration_ms}ms")
-                detail.append(f"识别条目: {self.extractor.entries_count}")
-                detail.append(f"SRT输出: {self.extractor.output_path}")
-                detail.append(f"TXT输出: {self.extractor.output_path.replace('.srt', '.txt')}")
-                if isinstance(self.extractor.engine, OpenAIOCREngine):
-                    detail.append(f"模型: {self.extractor.engine.model}")
-                    detail.append(f"端点: {self.extractor.engine.endpoint}")
-                QMessageBox.information(self, "完成", "\n".join(detail))
-                self.status_label.setText("完成")
-                self.progress_bar.setValue(0)
-                self.progress_bar.setFormat("0.00%")
+        if event.status == "error":
+            QMessageBox.critical(self, "错误", self.extractor.error)
+            self.status_label.setText("发生错误")
+        elif event.status == "stopped":
+            self.status_label.setText("已终止")
+            self.log(f"[{time.strftime('%H:%M:%S')}] --- 提取已终止 ---")
+            self.log(f"已处理帧数: {event.frames}/{self.extractor.total_frames}")
+            self.log(f"已识别条目: {event.entries}")
+            if self.extractor.entries:
+                # The extractor commits the entries closed before the stop
+                self.log("[⚠️] 已保存部分结果到文件")
+            QMessageBox.information(self, "已终止", f"提取已终止。\n已处理 {event.frames} 帧，识别 {event.entries} 条字幕")
+            self.progress_bar.setValue(0)
+            self.progress_bar.setFormat("0.00%")
+        else:
+            self.log(f"[{time.strftime('%H:%M:%S')}] === 提取完成 ===")
+            self.log(f"总耗时: {self.extractor.elapsed_ms/1000:.1f}秒")
+            self.log(f"处理帧数: {self.extractor.frames_processed}/{self.extractor.total_frames}")
+            self.log(f"识别字幕条目: {self.extractor.entries_count}")
+            self.log(f"采样方式: {self.format_sampling(self.extractor)}")
+            self.log(f"API调用: {self.extractor.api_calls} | 画面未变化跳过: {self.extractor.api_calls_skipped}")
+            if self.extractor.resumed_samples:
+                self.log(f"从记录恢复的采样: {self.extractor.resumed_samples}")
+            if self.extractor.detector is not None and not self.extractor.presence_eval:
+                self.log(f"本地判定无字幕跳过: {self.extractor.presence_skipped}")
+            if self.extractor.presence_report:
+                rep = self.extractor.presence_report
+                self.log(f"字幕检测评估 (阈值 {rep['threshold']:.2f}): 精确率 {rep['precision']:.3f} | 召回率 {rep['recall']:.3f} | "
+                         f"可跳过 {rep['skip_rate']*100:.1f}% | 建议阈值 {rep['suggested_threshold']:.2f}")
+            if self.extractor.failed_samples or self.extractor.recovered_samples:
+                self.log(f"请求失败的采样: 结束前重试恢复 {self.extractor.recovered_samples} | "
+                         f"仍失败 {self.extractor.failed_samples}")
+                if self.extractor.last_request_error:
+                    self.log(f"最近的请求错误: {self.extractor.last_request_error}")
+            if isinstance(self.extractor.engine.engine, PooledOCREngine):
+                pool = self.extractor.engine.engine
+                self.log(f"负载均衡: 故障转移 {pool.failovers} 次")
+                if pool.hedge_percentile is not None:
+                    self.log(f"对冲请求: 发送 {pool.hedges} 次 | 副本先返回 {pool.hedge_wins} 次")
+                for line in format_pool_stats(pool.stats()):
+                    self.log("  " + line)
+            self.log(f"后处理命中: {format_hits(self.extractor.postprocessor.stats())}")
+            limiters = engine_limiters(self.extractor.engine)
+            if any(lim.queued for lim in limiters):
+                self.log(f"限流排队: {sum(lim.queued for lim in limiters)} 次 | "
+                         f"共等待 {sum(lim.waited for lim in limiters):.1f}s")
+            if self.extractor.refine:
+                self.log(f"边界细化: 检查 {self.extractor.refine_frames} 帧 | 额外识别 {self.extractor.refine_calls} 次")
+            if isinstance(self.extractor.engine, CachedOCREngine):
+                cached = self.extractor.engine
+                self.log(f"缓存命中: {cached.hits} | 未命中: {cached.misses} | 合并请求: {cached.coalesced}")
+            self.log(f"输出文件 (SRT): {self.extractor.output_path}")
+            self.log(f"输出文件 (TXT): {self.extractor.output_path.replace('.srt', '.txt')}")
+            self.log(f"输出文件 (JSONL): {self.extractor.output_path.replace('.srt', '.jsonl')}")
+            if self.extractor.metrics.enabled:
+                self.log("各阶段耗时:")
+                for line in self.extractor.metrics.format_lines():
+                    self.log("  " + line)
+                try:
+                    report_path = self.extractor.write_metrics_report(prometheus_path=os.getenv("OCR_METRICS_PROM") or None)
+                    self.log(f"运行报告: {report_path}")
+                except OSError as e:
+                    self.log(f"[⚠️] 运行报告写入失败: {e}")
+
+            detail = []
+            detail.append(f"总耗时: {self.extractor.elapsed_ms/1000:.1f}s")
+            detail.append(f"处理帧数: {self.extractor.frames_processed}/{self.extractor.total_frames}")
+            rect = self.label.get_selection_rect_in_image()
+            if rect:
+                x, y, w, h = rect
+                detail.append(f"裁切区域: x={x} y={y} w={w} h={h}")
+            detail.append(f"采样间隔: {self.extractor.sample_ms}ms")
+            detail.append(f"采样方式: {self.format_sampling(self.extractor)}")
+            detail.append(f"API调用: {self.extractor.api_calls} (跳过 {self.extractor.api_calls_skipped})")
+            detail.append(f"最短字幕时长: {self.extractor.min_duration_ms}ms")
+            detail.append(f"识别条目: {self.extractor.entries_count}")
+            if self.extractor.failed_samples:
+                detail.append(f"⚠️ {self.extractor.failed_samples} 个采样重试后仍识别失败，对应时间段沿用前后字幕")
+            detail.append(f"SRT输出: {self.extractor.output_path}")
+            detail.append(f"TXT输出: {self.extractor.output_path.replace('.srt', '.txt')}")
+            if isinstance(self.extractor.engine, CachedOCREngine):
+                detail.append(f"缓存命中: {self.extractor.engine.hits}")
+            if self.extractor.metrics.enabled:
+                rep = self.extractor.metrics.report()
+                recognize = rep["stages"].get("recognize")
+                if recognize:
+                    detail.append(f"识别耗时: p50 {recognize['p50']*1000:.0f}ms | p95 {recognize['p95']*1000:.0f}ms | "
+                                  f"p99 {recognize['p99']*1000:.0f}ms")
+                sent = rep["sizes"].get("request")
+                if sent:
+                    detail.append(f"已发送: {sent['count']} 个请求 / {sent['sum']/1024/1024:.2f}MB")
+            if isinstance(self.extractor.engine, (OpenAIOCREngine, AsyncOpenAIOCREngine, CachedOCREngine)):
+                detail.append(f"模型: {self.extractor.engine.model}")
+                detail.append(f"端点: {self.extractor.engine.endpoint}")
+            QMessageBox.information(self, "完成", "\n".join(detail))
+            self.status_label.setText("完成")
+            self.progress_bar.setValue(0)
+            self.progress_bar.setFormat("0.00%")
+
+    def on_video_open_failed(self, path, message):
+        if path != self.opening_path:
+            return
+        self.opening_path = None
+        if self.decoder_video is not self.video_info:
+            # An earlier open finished after this one was requested and the decoder kept it; show that video
+            self.show_video(self.decoder_video)
+        else:
+            # The decoder keeps the previous video loaded
+            self.slider.setEnabled(self.video_path is not None)
+            self.status_label.setText(self.format_time(self.cur_index) if self.video_path else "")
+        QMessageBox.critical(self, "错误", message)
 
     def on_seek(self, idx):
-        if not self.cap:
+        if self.video_path is None or self.opening_path is not None:
             return
         idx = int(idx)
         self.cur_index = idx
-        self.cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
-        ret, frame = self.cap.read()
-        if ret:
+        self.status_label.setText(self.format_time(idx))
+        frame = self.frame_cache.get(idx)
+        if frame is not None:
+            self.seek_timer.stop()
             self.label.set_image(frame)
-            self.status_label.setText(self.format_time(idx))
+            return
+        self.thumbnails.focus(idx)
+        near = self.thumbnails.nearest(idx)
+        if near is not None:
+            self.label.set_image(near[1], self.frame_size())
+        self.seek_timer.start()
+
+    def on_seek_settled(self):
+        self.frame_decoder.request(self.cur_index)
+
+    def on_frame_ready(self, index, frame):
+        # Earlier positions are dropped by the decoder, but one may still finish after the slider moved on
+        if index == self.cur_index and self.opening_path is None:
+            self.label.set_image(frame)
+
+    def frame_size(self):
+        frame = self.first_frame
+        return (frame.shape[1], frame.shape[0]) if frame is not None else None
+
+    def log(self, line):
+        self.log_sink.write(line)
+        if not self.log_timer.isActive():
+            self.log_timer.start()
+
+    def flush_log(self):
+        """Append everything logged since the last tick as one block"""
+        lines, dropped = self.log_sink.drain()
+        if not lines:
+            self.log_timer.stop()
+            return
+        if dropped:
+            lines.insert(0, f"... 省略 {dropped} 行 ...")
+        self.log_view.appendPlainText("\n".join(lines))
+
+    def closeEvent(self, event):
+        # Let an in-flight decode finish so the captures are released before the interpreter exits
+        self.seek_timer.stop()
+        workers = [w for w in (self.frame_decoder, self.thumbnails) if w is not None]
+        for worker in workers:
+            worker.stop()
+        for worker in workers:
+            worker.join(2.0)
+        self.log_sink.close()
+        super().closeEvent(event)
 
     def on_rect_changed(self, rect):
         if rect:
@@ -752,6 +804,12 @@ class MainWindow(QMainWindow):
         ms = int((index / max(1.0, self.fps)) * 1000)
         return f"时间 {format_srt_timestamp(ms)}"
 
+    def format_sampling(self, extractor):
+        mode = extractor.sampling_used or extractor.sampling
+        if extractor.grab_cost_ms or extractor.seek_cost_ms:
+            return f"{mode} (grab {extractor.grab_cost_ms:.2f}ms/帧, seek {extractor.seek_cost_ms:.1f}ms/次)"
+        return mode
+
     def format_wall(self, ts):
         if not ts:
             return ""
@@ -903,7 +961,7 @@ class MainWindow(QMainWindow):
             color: #3498db;
         }
 
-        QTextEdit {
+        QTextEdit, QPlainTextEdit {
             border: 1px solid #bdc3c7;
             border-radius: 8px;
             padding: 8px;
@@ -957,6 +1015,7 @@ class MainWindow(QMainWindow):
         """
 
 def main():
+    multiprocessing.freeze_support()  # Segment workers re-enter here in frozen builds
     app = QApplication(sys.argv)
     w = MainWindow()
     w.resize(960, 640)
@@ -0,0 +1,272 @@
+"""
+Metrics Module
+Per-stage latency and size histograms for extraction runs, with JSON and Prometheus output
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from array import array
+
+RESERVOIR_SIZE = 50000  # Values kept per histogram for percentiles; beyond this a uniform sample is kept
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BYTES_BUCKETS = tuple(256 * 4 ** k for k in range(10))  # 256B .. 64MB
+PROMETHEUS_PREFIX = "subtitle_extractor"
+
+
+class Histogram:
+    """Count, sum, min/max and a bounded reservoir of observations for percentiles"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.values = array('d')
+        self._rng = random.Random(0)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        if len(self.values) < RESERVOIR_SIZE:
+            self.values.append(value)
+        else:
+            n = self._rng.randrange(self.count)
+            if n < RESERVOIR_SIZE:
+                self.values[n] = value
+
+    def merge(self, other):
+        for value in other.values:
+            if len(self.values) < RESERVOIR_SIZE:
+                self.values.append(value)
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def summary(self):
+        ordered = sorted(self.values)
+
+        def pick(q):
+            return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))] if ordered else None
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "p50": pick(50),
+            "p95": pick(95),
+            "p99": pick(99),
+        }
+
+    def cumulative_buckets(self, bounds):
+        """Prometheus-style cumulative counts, scaled up from the reservoir when it is a sample"""
+        scale = self.count / len(self.values) if self.values else 0
+        ordered = sorted(self.values)
+        out = []
+        n = 0
+        for bound in bounds:
+            while n < len(ordered) and ordered[n] <= bound:
+                n += 1
+            out.append((bound, int(round(n * scale))))
+        return out
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["values"] = self.values.tolist()
+        del state["_rng"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.values = array('d', state["values"])
+        self._rng = random.Random(0)
+
+
+class _Timer:
+    __slots__ = ("metrics", "stage", "t0")
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe_time(self.stage, time.perf_counter() - self.t0)
+        return False
+
+
+class Metrics:
+    """Thread-safe registry of stage timers, size histograms and counters"""
+
+    enabled = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {}  # stage -> Histogram of seconds
+        self.sizes = {}  # name -> Histogram of bytes
+        self.counters = {}
+        self.started_at = time.time()
+
+    def timer(self, stage):
+        return _Timer(self, stage)
+
+    def observe_time(self, stage, seconds):
+        with self._lock:
+            hist = self.stages.get(stage)
+            if hist is None:
+                hist = self.stages[stage] = Histogram()
+            hist.add(seconds)
+
+    def observe_size(self, name, nbytes):
+        with self._lock:
+            hist = self.sizes.get(name)
+            if hist is None:
+                hist = self.sizes[name] = Histogram()
+            hist.add(nbytes)
+
+    def inc(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def merge(self, other):
+        """Fold in the metrics of another run, e.g. a segment worker process"""
+        with self._lock:
+            for mine, theirs in ((self.stages, other.stages), (self.sizes, other.sizes)):
+                for name, hist in theirs.items():
+                    mine.setdefault(name, Histogram()).merge(hist)
+            for name, n in other.counters.items():
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    def report(self):
+        with self._lock:
+            return {
+                "started_at": self.started_at,
+                "stages": {name: h.summary() for name, h in sorted(self.stages.items())},
+                "sizes": {name: h.summary() for name, h in sorted(self.sizes.items())},
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+    def format_lines(self):
+        """Human-readable table for the log view"""
+        rep = self.report()
+        lines = [f"{'阶段':<18}{'次数':>8}{'p50ms':>10}{'p95ms':>10}{'p99ms':>10}{'合计s':>10}"]
+        for name, s in rep["stages"].items():
+            lines.append(f"{name:<18}{s['count']:>8}{s['p50'] * 1000:>10.2f}{s['p95'] * 1000:>10.2f}"
+                         f"{s['p99'] * 1000:>10.2f}{s['sum']:>10.2f}")
+        for name, s in rep["sizes"].items():
+            lines.append(f"{name:<18}{s['count']:>8} 平均 {s['mean'] / 1024:.1f}KB | p95 {s['p95'] / 1024:.1f}KB | "
+                         f"合计 {s['sum'] / 1024 / 1024:.2f}MB")
+        for name, n in rep["counters"].items():
+            lines.append(f"{name:<18}{n:>8}")
+        return lines
+
+    def to_prometheus(self, labels=None):
+        """Prometheus text exposition format (for the node exporter textfile collector)"""
+        label_text = ",".join(f'{k}="{_escape_label(v)}"' for k, v in sorted((labels or {}).items()))
+
+        def fmt_labels(extra):
+            parts = [p for p in (label_text, extra) if p]
+            return "{" + ",".join(parts) + "}" if parts else ""
+
+        out = []
+        with self._lock:
+            families = (("stage_seconds", "stage", self.stages, SECONDS_BUCKETS),
+                        ("payload_bytes", "kind", self.sizes, BYTES_BUCKETS))
+            for family, key, hists, bounds in families:
+                if not hists:
+                    continue
+                metric = f"{PROMETHEUS_PREFIX}_{family}"
+                out.append(f"# TYPE {metric} histogram")
+                for name, hist in sorted(hists.items()):
+                    series = f'{key}="{name}"'
+                    for bound, n in hist.cumulative_buckets(bounds):
+                        le = f'le="{bound:g}"'
+                        out.append(f"{metric}_bucket{fmt_labels(series + ',' + le)} {n}")
+                    inf = series + ',le="+Inf"'
+                    out.append(f"{metric}_bucket{fmt_labels(inf)} {hist.count}")
+                    out.append(f"{metric}_sum{fmt_labels(series)} {hist.total:.6f}")
+                    out.append(f"{metric}_count{fmt_labels(series)} {hist.count}")
+            for name, n in sorted(self.counters.items()):
+                metric = f"{PROMETHEUS_PREFIX}_{name}_total"
+                out.append(f"# TYPE {metric} counter")
+                out.append(f"{metric}{fmt_labels('')} {n}")
+        return "\n".join(out) + "\n"
+
+    def write_json(self, path, extra=None):
+        data = self.report()
+        if extra:
+            data.update(extra)
+        _atomic_write(path, json.dumps(data, ensure_ascii=False, indent=2))
+
+    def write_prometheus(self, path, labels=None):
+        # The textfile collector may read at any moment, so never expose a half-written file
+        _atomic_write(path, self.to_prometheus(labels))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class NullMetrics:
+    """Drop-in for Metrics when instrumentation is off; every call is a no-op"""
+
+    enabled = False
+
+    def timer(self, stage):
+        return _NULL_TIMER
+
+    def observe_time(self, stage, seconds):
+        pass
+
+    def observe_size(self, name, nbytes):
+        pass
+
+    def inc(self, name, n=1):
+        pass
+
+    def merge(self, other):
+        pass
+
+
+NULL_METRICS = NullMetrics()
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _atomic_write(path, text):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
@@ -0,0 +1,257 @@
+"""
+OCR Cache Module
+Persistent content-addressed cache of recognition results
+"""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+ROW_OVERHEAD = 64  # Rough per-row bookkeeping cost counted against the size cap
+
+
+class OCRResultCache:
+    """SQLite-backed key/value store with a size cap and LRU eviction"""
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self._lock = threading.Lock()
+        # Segment processes share the file, so wait on their write locks instead of failing
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, text TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON results(last_used)")
+        self._conn.commit()
+        row = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()
+        self.total_bytes = int(row[0])
+
+    def __getstate__(self):
+        # Connections can't cross processes; a copy reopens the same database file
+        return {"path": self.path, "max_bytes": self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"], state["max_bytes"])
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT text FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return row[0]
+
+    def put(self, key: str, text: str):
+        size = len(key) + len(text.encode("utf-8")) + ROW_OVERHEAD
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM results WHERE key = ?", (key,)).fetchone()
+            if old is not None:
+                self.total_bytes -= int(old[0])
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, text, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, text, size, time.time()),
+            )
+            self.total_bytes += size
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop least recently used rows until the store is back under 90% of the cap"""
+        target = int(self.max_bytes * 0.9)
+        rows = self._conn.execute("SELECT key, size FROM results ORDER BY last_used ASC").fetchall()
+        drop = []
+        for key, size in rows:
+            if self.total_bytes <= target:
+                break
+            drop.append((key,))
+            self.total_bytes -= int(size)
+        self._conn.executemany("DELETE FROM results WHERE key = ?", drop)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+            self._conn.commit()
+            self.total_bytes = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class _InFlight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = ""
+        self.error = None  # Raised to coalesced waiters when the owner's request failed
+
+
+class CachedOCREngine:
+    """Wraps an OCR engine with the result cache and coalesces concurrent identical requests
+
+    Keys combine an exact digest of the crop's pixels with the engine's model, prompt
+    and system prompt, so editing any of them naturally misses the old entries. A
+    lossy hash would serve one line's text for another that differs by a single glyph.
+    """
+
+    def __init__(self, engine, cache: OCRResultCache):
+        self.engine = engine
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"], state["_inflight"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def __getattr__(self, name):
+        # Expose model/endpoint/etc. of the wrapped engine
+        if name.startswith("_") or name == "engine":
+            raise AttributeError(name)
+        return getattr(self.engine, name)
+
+    def cache_key(self, image_bgr) -> str:
+        pixels = np.ascontiguousarray(image_bgr)
+        parts = [
+            "%s:%s" % ("x".join(map(str, pixels.shape)), hashlib.sha256(pixels.tobytes()).hexdigest()),
+            getattr(self.engine, "model", ""),
+            getattr(self.engine, "prompt", ""),
+            getattr(self.engine, "system_prompt", ""),
+        ]
+        return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+    def _lookup(self, key):
+        """Return (cached_text, pending, owner); the caller owns the request when owner is True"""
+        text = self.cache.get(key)
+        if text is not None:
+            with self._lock:
+                self.hits += 1
+            return text, None, False
+        with self._lock:
+            pending = self._inflight.get(key)
+            if pending is None:
+                pending = _InFlight()
+                self._inflight[key] = pending
+                owner = True
+                self.misses += 1
+            else:
+                owner = False
+                self.coalesced += 1
+        return None, pending, owner
+
+    @staticmethod
+    def _storable(text, should_stop):
+        # A stop returns "" without asking the model; a blank answer given before any stop is a real result
+        return bool(text) or not (should_stop and should_stop())
+
+    def _complete(self, key, pending, text, should_stop):
+        pending.result = text
+        if self._storable(text, should_stop):
+            self.cache.put(key, text)
+
+    def _release(self, key, pending):
+        with self._lock:
+            self._inflight.pop(key, None)
+        pending.event.set()
+
+    def recognize(self, image_bgr, should_stop=None):
+        key = self.cache_key(image_bgr)
+        text, pending, owner = self._lookup(key)
+        if text is not None:
+            return text
+        if not owner:
+            pending.event.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.result
+        try:
+            text = self.engine.recognize(image_bgr, should_stop=should_stop)
+            self._complete(key, pending, text, should_stop)
+            return text
+        except Exception as e:
+            pending.error = e
+            raise
+        finally:
+            self._release(key, pending)
+
+    async def recognize_async(self, image_bgr, should_stop=None):
+        key = self.cache_key(image_bgr)
+        text, pending, owner = self._lookup(key)
+        if text is not None:
+            return text
+        if not owner:
+            # The owner may be a thread or another task, so wait on its event off the loop
+            await asyncio.get_running_loop().run_in_executor(None, pending.event.wait)
+            if pending.error is not None:
+                raise pending.error
+            return pending.result
+        try:
+            text = await self.engine.recognize_async(image_bgr, should_stop=should_stop)
+            self._complete(key, pending, text, should_stop)
+            return text
+        except Exception as e:
+            pending.error = e
+            raise
+        finally:
+            self._release(key, pending)
+
+    def _split_hits(self, images):
+        keys = [self.cache_key(img) for img in images]
+        texts = [self.cache.get(k) for k in keys]
+        misses = [n for n, t in enumerate(texts) if t is None]
+        with self._lock:
+            self.hits += len(images) - len(misses)
+            self.misses += len(misses)
+        return keys, texts, misses
+
+    def _merge(self, keys, texts, misses, fresh, should_stop):
+        for n, text in zip(misses, fresh):
+            texts[n] = text
+            if self._storable(text, should_stop):
+                self.cache.put(keys[n], text)
+        return texts
+
+    def recognize_batch(self, images, should_stop=None, strategy="multi_image"):
+        """Serve cached crops directly and send only the misses as one batch"""
+        keys, texts, misses = self._split_hits(images)
+        if not misses:
+            return texts
+        todo = [images[n] for n in misses]
+        if len(todo) > 1 and hasattr(self.engine, "recognize_batch"):
+            fresh = self.engine.recognize_batch(todo, should_stop=should_stop, strategy=strategy)
+        else:
+            fresh = [self.engine.recognize(img, should_stop=should_stop) for img in todo]
+        return self._merge(keys, texts, misses, fresh, should_stop)
+
+    async def recognize_batch_async(self, images, should_stop=None, strategy="multi_image"):
+        keys, texts, misses = self._split_hits(images)
+        if not misses:
+            return texts
+        todo = [images[n] for n in misses]
+        if len(todo) > 1 and hasattr(self.engine, "recognize_batch_async"):
+            fresh = await self.engine.recognize_batch_async(todo, should_stop=should_stop, strategy=strategy)
+        else:
+            fresh = await asyncio.gather(*[self.engine.recognize_async(img, should_stop=should_stop) for img in todo])
+        return self._merge(keys, texts, misses, fresh, should_stop)
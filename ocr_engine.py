@@ -0,0 +1,629 @@
+"""
+OCR Engine Module
+OpenAI-compatible vision OCR engines
+"""
+
+import base64
+import copy
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+import cv2
+import numpy as np
+import requests
+
+from metrics import NULL_METRICS
+from rate_limiter import limiter_for_config
+
+CHAT_COMPLETIONS_PATH = "/v1/chat/completions"
+
+BATCH_STRATEGIES = ("multi_image", "mosaic")
+BATCH_INSTRUCTIONS = {
+    "multi_image": "本条消息中共有{k}张图片。请按顺序分别识别每张图片，输出{k}行，每行以[序号]开头（如[1]），"
+                   "后面是该图片的字幕文本，同一张图片内的多行字幕用空格连接；某张图片没有字幕时该行只输出序号。",
+    "mosaic": "这张图片由{k}个字幕条从上到下拼接而成，各条之间以灰色横条分隔。请从上到下分别识别，输出{k}行，"
+              "每行以[序号]开头（如[1]），后面是该字幕条的文本，同一条内的多行字幕用空格连接；没有字幕的条目该行只输出序号。",
+}
+MOSAIC_SEPARATOR_PX = 8
+_BATCH_LINE = re.compile(r"^\s*[\[【(（]?\s*(\d+)\s*[\]】)）.:：、]\s*(.*)$")
+
+
+class DummyEngine:
+    def recognize(self, image_bgr, should_stop=None):
+        return ""
+
+
+IMAGE_FORMATS = ("png", "jpeg", "webp")
+VISION_PATCH_PX = 28  # Qwen-VL style models spend one token per 28x28 patch
+ANSWER_TOKENS = 64  # Allowance per crop for the answer when estimating a request's token cost
+
+
+@dataclass
+class EncodeSettings:
+    """How crops are turned into image payloads"""
+    format: str = "png"
+    quality: int = 90  # JPEG/WebP quality, ignored for PNG
+    grayscale: bool = False
+    target_text_height: int = 0  # Downscale so text lines are about this tall, 0 = off
+    max_pixels: int = 0  # Downscale so width * height stays under this, 0 = off
+
+    def __post_init__(self):
+        if self.format not in IMAGE_FORMATS:
+            raise ValueError(f"unknown image format: {self.format}")
+
+
+def estimate_text_height(gray):
+    """
+    Median height of the text lines in the crop, or the full height if no line stands out
+    Rows well above the background's edge energy are grouped into bands; gaps shorter than half a
+    neighbouring band (between ascenders and the x-height) are bridged, wider ones separate lines.
+    """
+    g = gray.astype(np.float32)
+    profile = (np.abs(cv2.Sobel(g, cv2.CV_32F, 1, 0, ksize=3)) + np.abs(cv2.Sobel(g, cv2.CV_32F, 0, 1, ksize=3))).sum(axis=1)
+    if not profile.size:
+        return gray.shape[0]
+    floor = float(np.percentile(profile, 10))
+    peak = float(profile.max())
+    if peak <= floor:
+        return gray.shape[0]
+    rows = np.nonzero(profile > floor + (peak - floor) * 0.1)[0]
+    runs = []  # [top, bottom] of consecutive strong rows
+    for y in rows:
+        if runs and y == runs[-1][1] + 1:
+            runs[-1][1] = y
+        else:
+            runs.append([y, y])
+    bands = [runs[0]]
+    for top, bottom in runs[1:]:
+        gap = top - bands[-1][1] - 1
+        if gap * 2 < max(bottom - top + 1, bands[-1][1] - bands[-1][0] + 1):
+            bands[-1][1] = bottom
+        else:
+            bands.append([top, bottom])
+    heights = [bottom - top + 1 for top, bottom in bands]
+    tallest = max(heights)
+    return int(np.median([h for h in heights if h * 4 >= tallest]))
+
+
+def prepare_image(image_bgr, settings=None):
+    """Apply the grayscale and downscaling parts of `settings`; never upscales"""
+    if settings is None:
+        return image_bgr
+    img = image_bgr
+    if settings.grayscale and img.ndim == 3:
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    h, w = img.shape[:2]
+    scale = 1.0
+    if settings.target_text_height > 0:
+        gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        scale = min(scale, settings.target_text_height / max(1, estimate_text_height(gray)))
+    if settings.max_pixels > 0 and w * h * scale * scale > settings.max_pixels:
+        scale = math.sqrt(settings.max_pixels / (w * h))
+    if scale < 1.0:
+        size = (max(1, int(w * scale)), max(1, int(h * scale)))
+        img = cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+    return img
+
+
+def compress_image(img, settings=None):
+    """Return (format, encoded bytes) for a prepared crop"""
+    fmt = settings.format if settings else "png"
+    if fmt == "jpeg":
+        _, buf = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, settings.quality])
+    elif fmt == "webp":
+        _, buf = cv2.imencode('.webp', img, [cv2.IMWRITE_WEBP_QUALITY, settings.quality])
+    else:
+        _, buf = cv2.imencode('.png', img)
+    return fmt, buf.tobytes()
+
+
+def to_data_url(fmt, data):
+    return f"data:image/{fmt};base64," + base64.b64encode(data).decode('ascii')
+
+
+def encode_prepared(img, settings=None, metrics=NULL_METRICS):
+    if not metrics.enabled:
+        return to_data_url(*compress_image(img, settings))
+    with metrics.timer("engine.compress"):
+        fmt, data = compress_image(img, settings)
+    metrics.observe_size("image", len(data))
+    with metrics.timer("engine.base64"):
+        return to_data_url(fmt, data)
+
+
+def encode_image(image_bgr, settings=None, metrics=NULL_METRICS):
+    with metrics.timer("engine.prepare"):
+        img = prepare_image(image_bgr, settings)
+    return encode_prepared(img, settings, metrics)
+
+
+def estimate_image_tokens(width, height, patch=VISION_PATCH_PX):
+    return math.ceil(width / patch) * math.ceil(height / patch)
+
+
+def estimate_request_tokens(images, prompt, system_prompt=""):
+    """
+    Upper estimate of a request's tokens for TPM limiting, from the crops before downscaling
+    One token per prompt character is generous for English and about right for Chinese.
+    """
+    tokens = len(prompt) + len(system_prompt or "")
+    for img in images:
+        tokens += estimate_image_tokens(img.shape[1], img.shape[0]) + ANSWER_TOKENS
+    return tokens
+
+
+def encode_settings_from_config(cfg):
+    return EncodeSettings(
+        format=cfg.image_format,
+        quality=cfg.image_quality,
+        grayscale=cfg.image_grayscale,
+        target_text_height=cfg.image_text_height,
+        max_pixels=cfg.image_max_pixels,
+    )
+
+
+def build_headers(api_key):
+    headers = {"Content-Type": "application/json"}
+    if api_key:
+        headers["Authorization"] = f"Bearer {api_key}"
+    return headers
+
+
+def build_payload(model, prompt, system_prompt, image_urls):
+    """Chat completions payload with the prompt followed by one image part per URL"""
+    messages = []
+    if system_prompt:
+        messages.append({"role": "system", "content": system_prompt})
+    content = [{"type": "text", "text": prompt}]
+    for url in image_urls:
+        content.append({"type": "image_url", "image_url": {"url": url}})
+    messages.append({"role": "user", "content": content})
+    return {"model": model, "messages": messages, "temperature": 0}
+
+
+ERROR_TIMEOUT = "timeout"
+ERROR_CONNECTION = "connection"
+ERROR_RATE_LIMIT = "rate_limit"
+ERROR_SERVER = "server"
+ERROR_CLIENT = "client"
+ERROR_PROTOCOL = "protocol"
+# Retries allowed per error class; client errors (bad key, unknown model) won't fix themselves
+DEFAULT_RETRIES = {
+    ERROR_TIMEOUT: 2,
+    ERROR_CONNECTION: 3,
+    ERROR_RATE_LIMIT: 5,
+    ERROR_SERVER: 3,
+    ERROR_PROTOCOL: 1,
+    ERROR_CLIENT: 0,
+}
+
+
+class OCRRequestError(Exception):
+    """
+    A recognition request that failed; `kind` is one of the ERROR_* classes
+    `retry_after` holds the server's Retry-After in seconds when it sent one
+    """
+
+    def __init__(self, kind, message, attempts=1, retry_after=None):
+        super().__init__(kind, message, attempts, retry_after)
+        self.kind = kind
+        self.message = message
+        self.attempts = attempts
+        self.retry_after = retry_after
+
+    def __str__(self):
+        return f"{self.message} ({self.kind}, 尝试 {self.attempts} 次)"
+
+
+def classify_status(status):
+    """Error class for an HTTP status, or None for success"""
+    if status < 400:
+        return None
+    if status == 408:
+        return ERROR_TIMEOUT
+    if status == 429:
+        return ERROR_RATE_LIMIT
+    if status >= 500:
+        return ERROR_SERVER
+    return ERROR_CLIENT
+
+
+def parse_retry_after(value):
+    """Seconds from a Retry-After header (delta-seconds or HTTP date), None if absent or malformed"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def completion_tokens(j):
+    """total_tokens from the usage block of a response, None when the server doesn't report it"""
+    usage = j.get("usage") if isinstance(j, dict) else None
+    if isinstance(usage, dict) and isinstance(usage.get("total_tokens"), int):
+        return usage["total_tokens"]
+    return None
+
+
+def parse_completion(j):
+    """Extract the assistant text from a chat completions response body"""
+    c = j.get("choices", [])
+    if not c:
+        return ""
+    m = c[0].get("message", {})
+    content = m.get("content", "")
+    if isinstance(content, list) and content and isinstance(content[0], dict):
+        t = content[0].get("text", "")
+        return t.strip()
+    if isinstance(content, str):
+        return content.strip()
+    return ""
+
+
+def check_completion(j):
+    """Answer text of a decoded response body; raises OCRRequestError for error bodies"""
+    if not isinstance(j, dict):
+        raise OCRRequestError(ERROR_PROTOCOL, "unexpected response body")
+    if j.get("error") and not j.get("choices"):
+        error = j["error"]
+        raise OCRRequestError(ERROR_SERVER, str(error.get("message", error) if isinstance(error, dict) else error))
+    return parse_completion(j)
+
+
+def stack_crops(images, separator=MOSAIC_SEPARATOR_PX):
+    """Stack crops vertically, left-aligned, with mid-gray separator bands between them"""
+    width = max(img.shape[1] for img in images)
+    parts = []
+    for n, img in enumerate(images):
+        if img.ndim == 2:
+            img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+        if img.shape[1] < width:
+            pad = np.zeros((img.shape[0], width - img.shape[1], 3), dtype=img.dtype)
+            img = np.hstack([img, pad])
+        if n:
+            parts.append(np.full((separator, width, 3), 128, dtype=np.uint8))
+        parts.append(img)
+    return np.vstack(parts)
+
+
+def build_batch_request(model, prompt, system_prompt, images, strategy, settings=None, metrics=NULL_METRICS):
+    """Payload asking for one numbered answer line per crop"""
+    if strategy not in BATCH_STRATEGIES:
+        raise ValueError(f"unknown batch strategy: {strategy}")
+    k = len(images)
+    text = prompt + "\n" + BATCH_INSTRUCTIONS[strategy].format(k=k)
+    if strategy == "mosaic":
+        with metrics.timer("engine.prepare"):
+            mosaic = stack_crops([prepare_image(img, settings) for img in images])
+        urls = [encode_prepared(mosaic, settings, metrics)]
+    else:
+        urls = [encode_image(img, settings, metrics) for img in images]
+    return build_payload(model, text, system_prompt, urls)
+
+
+def split_batch_answer(text, k):
+    """Split a batched answer into k texts, or return None when it can't be matched up reliably"""
+    lines = [ln for ln in text.replace("```", "").splitlines() if ln.strip()]
+    numbered = {}
+    last = None
+    for ln in lines:
+        m = _BATCH_LINE.match(ln)
+        if not m:
+            # Continuation of a multi-line answer for the previous crop
+            if last is not None:
+                numbered[last] = (numbered[last] + " " + ln.strip()).strip()
+            continue
+        n = int(m.group(1))
+        if n in numbered or not 1 <= n <= k:
+            return None
+        numbered[n] = m.group(2).strip()
+        last = n
+    if numbered:
+        if len(numbered) != k:
+            return None
+        return [numbered[n] for n in range(1, k + 1)]
+    # No markers at all: accept only an exact one-line-per-crop answer
+    if len(lines) == k:
+        return [ln.strip() for ln in lines]
+    return None
+
+
+@dataclass
+class RetryPolicy:
+    """Exponential backoff with full jitter, with a retry budget per error class"""
+    retries: dict = field(default_factory=lambda: dict(DEFAULT_RETRIES))
+    base_delay: float = 0.5
+    rate_limit_delay: float = 2.0  # Overloaded servers need longer to drain than a dropped connection
+    max_delay: float = 20.0
+    max_retry_after: float = 120.0  # Longer Retry-After values are capped so a run can't stall for hours
+
+    def should_retry(self, kind, attempt):
+        return attempt < self.retries.get(kind, 0)
+
+    def backoff(self, kind, attempt):
+        base = self.rate_limit_delay if kind == ERROR_RATE_LIMIT else self.base_delay
+        return random.uniform(0, min(self.max_delay, base * 2 ** attempt))
+
+    def delay(self, error, attempt):
+        """Wait before retrying `error`: the server's Retry-After when given, else jittered backoff"""
+        if error.retry_after is not None:
+            return min(self.max_retry_after, error.retry_after)
+        return self.backoff(error.kind, attempt)
+
+
+class AdaptiveDeadline:
+    """
+    Per-request timeout derived from recent latencies
+    Uses `ceiling` (the configured timeout) until `min_samples` requests succeeded, then
+    `multiplier` x the `quantile` latency, clamped to [floor, ceiling]. Each retry doubles it.
+    """
+
+    def __init__(self, ceiling, floor=2.0, multiplier=3.0, quantile=95, window=256, min_samples=8):
+        self.ceiling = ceiling
+        self.floor = min(floor, ceiling)
+        self.multiplier = multiplier
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def current(self, attempt=0):
+        with self._lock:
+            values = sorted(self._latencies)
+        if len(values) < self.min_samples:
+            return self.ceiling
+        q = values[min(len(values) - 1, int(round(self.quantile / 100 * (len(values) - 1))))]
+        return min(self.ceiling, max(self.floor, q * self.multiplier) * 2 ** attempt)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+def sleep_unless_stopped(seconds, should_stop):
+    """Sleep in short slices; returns True as soon as should_stop() does"""
+    end = time.monotonic() + seconds
+    while True:
+        if should_stop and should_stop():
+            return True
+        left = end - time.monotonic()
+        if left <= 0:
+            return False
+        time.sleep(min(0.1, left))
+
+
+class OpenAIOCREngine:
+    """
+    OpenAI-compatible engine over a requests session
+    Failed requests are retried per RetryPolicy; once the retries run out recognize raises
+    OCRRequestError instead of returning an empty string. A stop request returns "".
+    With a RateLimiter every attempt first queues for the config's RPM/TPM/concurrency budget.
+    """
+
+    metrics = NULL_METRICS  # Set by the extractor when instrumentation is on
+
+    def __init__(self, endpoint, api_key, model, prompt, system_prompt=None, encode_settings=None, path=CHAT_COMPLETIONS_PATH,
+                 timeout=30, retry_policy=None, limiter=None):
+        self.endpoint = endpoint
+        self.api_key = api_key
+        self.model = model
+        self.prompt = prompt
+        self.system_prompt = system_prompt or ""
+        self.encode_settings = encode_settings
+        self.path = path
+        self.timeout = timeout
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.limiter = limiter
+        self.deadlines = {}  # Images per request -> AdaptiveDeadline
+        self.retries = 0
+        self.session = requests.Session()
+        self.batch_fallbacks = 0  # Batches whose answer count didn't match and were re-sent singly
+
+    @classmethod
+    def from_config(cls, cfg, api_key, prompt=None):
+        return cls(cfg.api_base or cfg.url, api_key, cfg.model, prompt or cfg.prompt, cfg.system_prompt,
+                   encode_settings=encode_settings_from_config(cfg), path=cfg.api_path or CHAT_COMPLETIONS_PATH,
+                   timeout=cfg.timeout, limiter=limiter_for_config(cfg))
+
+    @property
+    def url(self):
+        return self.endpoint.rstrip('/') + '/' + self.path.lstrip('/')
+
+    def _estimate_tokens(self, images):
+        if self.limiter is None or not self.limiter.tpm:
+            return 0
+        return estimate_request_tokens(images, self.prompt, self.system_prompt)
+
+    def _encode_image(self, image_bgr):
+        return encode_image(image_bgr, self.encode_settings, self.metrics)
+
+    def _deadline(self, n_images):
+        deadline = self.deadlines.get(n_images)
+        if deadline is None:
+            # Batches take longer to prefill, so each request size learns its own latency
+            deadline = self.deadlines.setdefault(n_images, AdaptiveDeadline(self.timeout))
+        return deadline
+
+    def _post(self, body, timeout):
+        """POST one serialized chat completion and return (answer text, tokens used or None); raises OCRRequestError"""
+        metrics = self.metrics
+        metrics.inc("requests")
+        try:
+            with metrics.timer("engine.http"):
+                r = self.session.post(self.url, headers=build_headers(self.api_key), data=body, timeout=timeout)
+            kind = classify_status(r.status_code)
+            if kind is not None:
+                raise OCRRequestError(kind, f"HTTP {r.status_code}", retry_after=parse_retry_after(r.headers.get("Retry-After")))
+            metrics.observe_size("response", len(r.content))
+            with metrics.timer("engine.parse"):
+                j = r.json()
+                return check_completion(j), completion_tokens(j)
+        except OCRRequestError:
+            metrics.inc("request_errors")
+            raise
+        except requests.Timeout as e:
+            metrics.inc("request_errors")
+            raise OCRRequestError(ERROR_TIMEOUT, str(e) or "timed out")
+        except requests.RequestException as e:
+            metrics.inc("request_errors")
+            raise OCRRequestError(ERROR_CONNECTION, str(e))
+        except ValueError as e:
+            metrics.inc("request_errors")
+            raise OCRRequestError(ERROR_PROTOCOL, f"invalid JSON: {e}")
+
+    def _request(self, payload, n_images, should_stop, tokens=0):
+        """Send with retries; returns the answer text, or "" if should_stop() turns true while waiting"""
+        metrics = self.metrics
+        with metrics.timer("engine.serialize"):
+            body = json.dumps(payload)
+        metrics.observe_size("request", len(body))
+        deadline = self._deadline(n_images)
+        limiter = self.limiter
+        attempt = 0
+        while True:
+            if limiter is not None:
+                waited = limiter.acquire(tokens, should_stop)
+                if waited is None:
+                    return ""
+                metrics.observe_time("engine.queue_wait", waited)
+            t0 = time.perf_counter()
+            try:
+                text, used = self._post(body, deadline.current(attempt))
+            except OCRRequestError as e:
+                if limiter is not None:
+                    limiter.release()
+                    if e.kind == ERROR_RATE_LIMIT and e.retry_after:
+                        limiter.pause(min(self.retry_policy.max_retry_after, e.retry_after))
+                if not self.retry_policy.should_retry(e.kind, attempt):
+                    metrics.inc("request_failures")
+                    raise OCRRequestError(e.kind, e.message, attempt + 1, e.retry_after)
+                self.retries += 1
+                metrics.inc(f"retries_{e.kind}")
+                if sleep_unless_stopped(self.retry_policy.delay(e, attempt), should_stop):
+                    return ""
+                attempt += 1
+                continue
+            except BaseException:
+                if limiter is not None:
+                    limiter.release()
+                raise
+            if limiter is not None:
+                limiter.release(tokens, used)
+            deadline.observe(time.perf_counter() - t0)
+            return text
+
+    def recognize(self, image_bgr, should_stop=None):
+        """
+        Recognize text with optional stop check
+        should_stop: callable that returns True if should stop processing
+        """
+        # Quick check before making request
+        if should_stop and should_stop():
+            return ""
+
+        image_url = self._encode_image(image_bgr)
+        payload = build_payload(self.model, self.prompt, self.system_prompt, [image_url])
+        # The adaptive deadline stays a small multiple of typical latency, which keeps stop responsive
+        return self._request(payload, 1, should_stop, self._estimate_tokens([image_bgr]))
+
+    def recognize_batch(self, images, should_stop=None, strategy="multi_image"):
+        """
+        Recognize several crops with one request
+        Falls back to one request per crop when the answer can't be split into len(images) parts
+        """
+        if len(images) == 1:
+            return [self.recognize(images[0], should_stop=should_stop)]
+        if should_stop and should_stop():
+            return [""] * len(images)
+        payload = build_batch_request(self.model, self.prompt, self.system_prompt, images, strategy,
+                                      self.encode_settings, self.metrics)
+        text = self._request(payload, len(images), should_stop, self._estimate_tokens(images))
+        if should_stop and should_stop():
+            return [""] * len(images)
+        parts = split_batch_answer(text, len(images))
+        if parts is None:
+            self.batch_fallbacks += 1
+            return [self.recognize(img, should_stop=should_stop) for img in images]
+        return parts
+
+
+CALIBRATION_VARIANTS = [
+    EncodeSettings("png"),
+    EncodeSettings("jpeg", quality=90),
+    EncodeSettings("jpeg", quality=75, grayscale=True),
+    EncodeSettings("webp", quality=80),
+    EncodeSettings("jpeg", quality=85, target_text_height=32),
+    EncodeSettings("webp", quality=80, grayscale=True, target_text_height=24),
+]
+
+
+def calibrate_encoding(crops, variants=None, engine=None):
+    """
+    Measure each encoder setting on sample crops
+    Returns one dict per variant with average payload bytes, estimated image tokens and,
+    when an engine is given, average request latency, the texts it returned (None for a failed
+    request) and the number of failed requests
+    """
+    rows = []
+    for settings in variants or CALIBRATION_VARIANTS:
+        payload_bytes = 0
+        tokens = 0
+        for crop in crops:
+            img = prepare_image(crop, settings)
+            payload_bytes += len(encode_prepared(img, settings))
+            tokens += estimate_image_tokens(img.shape[1], img.shape[0])
+        row = {
+            "settings": settings,
+            "payload_bytes": payload_bytes // max(1, len(crops)),
+            "image_tokens": tokens // max(1, len(crops)),
+        }
+        if engine is not None:
+            probe = copy.copy(engine)
+            probe.encode_settings = settings
+            texts = []
+            errors = 0
+            t0 = time.perf_counter()
+            for crop in crops:
+                try:
+                    texts.append(probe.recognize(crop))
+                except OCRRequestError:
+                    # One failed request shouldn't cost the measurements of every other setting
+                    texts.append(None)
+                    errors += 1
+            row["latency_ms"] = (time.perf_counter() - t0) * 1000 / max(1, len(crops))
+            row["texts"] = texts
+            row["errors"] = errors
+        rows.append(row)
+    return rows
+
+
+def format_calibration_report(rows):
+    lines = [f"{'格式':<6}{'质量':>5}{'灰度':>5}{'字高':>5}{'像素上限':>10}{'字节/张':>10}{'图像token':>10}{'延迟ms':>9}"
+             f"{'失败':>5}"]
+    for row in rows:
+        st = row["settings"]
+        latency = f"{row['latency_ms']:.0f}" if "latency_ms" in row else "-"
+        errors = row.get("errors", "-")
+        lines.append(f"{st.format:<6}{st.quality:>5}{('是' if st.grayscale else '否'):>5}{st.target_text_height:>5}"
+                     f"{st.max_pixels:>10}{row['payload_bytes']:>10}{row['image_tokens']:>10}{latency:>9}{errors:>5}")
+    return "\n".join(lines)
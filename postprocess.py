@@ -0,0 +1,190 @@
+"""
+Post-processing Module
+Configurable filter pipeline applied to every model answer before segmentation
+
+Rules live in configs/postprocess.json and are compiled once into one regular expression
+per rule group. Stages run in order; a stage that empties the text ends the pipeline.
+    reject                  drop the answer when it matches a rule group and is at most max_length long
+    strip                   remove leading label prefixes and quotes wrapping the whole answer
+    normalize_whitespace    collapse runs of spaces inside lines, trim lines and drop blank ones
+"""
+
+import json
+import os
+import re
+import threading
+
+CONFIG_FILE = "postprocess.json"
+
+# The reject group makes the same decisions as the hard-coded filter this pipeline replaced; the strip and
+# normalize_whitespace stages are new and do change answers that carry a label, wrapping quotes or extra spaces
+DEFAULT_STAGES = [
+    {
+        "name": "reject_descriptive",
+        "type": "reject",
+        "rules": [
+            {
+                # Descriptive "no subtitles" answers are short
+                "max_length": 20,
+                "patterns": [
+                    "图中无", "没有字幕", "无字幕", "没有文字", "无文字",
+                    "没有可读", "无可读", "没有内容", "无内容",
+                    "图片中无", "图片中没有", "画面无", "画面中无",
+                    "未发现", "未找到", "不存在",
+                    "no subtitle", "no text", "no readable",
+                    "no content", "nothing", "empty",
+                    "图中", "图片中", "画面", "此图", "该图",
+                    "截图", "视频", "帧",
+                ],
+            },
+            {
+                # Very short answers talking about the image rather than quoting it
+                "max_length": 15,
+                "patterns": [
+                    "字幕", "文字", "文本", "内容",
+                    "截图", "图片", "画面", "视频", "帧",
+                ],
+            },
+        ],
+    },
+    {
+        "name": "strip_quotes",
+        "type": "strip",
+        "prefixes": ["字幕：", "字幕:", "subtitle:", "subtitles:"],
+        "quotes": ["\"\"", "“”", "「」", "『』"],
+    },
+    {
+        "name": "normalize_whitespace",
+        "type": "normalize_whitespace",
+    },
+]
+
+STAGE_TYPES = ("reject", "strip", "normalize_whitespace")
+_SPACE_RUN = re.compile(r"[ \t　\xa0]+")
+# Inner whitespace normalize_whitespace would change: anything but single spaces and newlines
+_NEEDS_NORMALIZE = re.compile(r"[^\S \n]|[ \n][ \n]")
+
+
+def _literal_alternation(patterns, regexes=()):
+    parts = [re.escape(p) for p in sorted(set(patterns), key=len, reverse=True)] + list(regexes)
+    return "|".join(parts)
+
+
+class _Stage:
+    def __init__(self, spec):
+        self.name = spec.get("name") or spec["type"]
+        self.type = spec["type"]
+        if self.type not in STAGE_TYPES:
+            raise ValueError(f"unknown post-processing stage type: {self.type}")
+        self.enabled = spec.get("enabled", True)
+        self.rules = []  # (max_length or None, compiled pattern) for reject
+        self.prefix = None
+        self.quoted = None
+        self.openers = frozenset()
+        if self.type == "reject":
+            for rule in spec.get("rules", []):
+                pattern = _literal_alternation(rule.get("patterns", []), rule.get("regex", []))
+                if pattern:
+                    self.rules.append((rule.get("max_length"), re.compile(pattern, re.IGNORECASE)))
+        elif self.type == "strip":
+            prefixes = spec.get("prefixes", [])
+            if prefixes:
+                self.prefix = re.compile(r"^\s*(?:" + _literal_alternation(prefixes) + r")\s*", re.IGNORECASE)
+            pairs = [q for q in spec.get("quotes", []) if len(q) == 2]
+            if pairs:
+                # One group per pair, and only when the opening quote's first closing quote ends the answer,
+                # so '"Hi," she said, "bye"' and 「a」b「c」 are left alone
+                self.openers = frozenset(q[0] for q in pairs)
+                self.quoted = re.compile("|".join(
+                    rf"^\s*{re.escape(q[0])}((?:(?!{re.escape(q[1])}).)*){re.escape(q[1])}\s*$" for q in pairs
+                ), re.DOTALL)
+
+    def apply(self, text):
+        if self.type == "reject":
+            n = len(text)
+            for max_length, pattern in self.rules:
+                if (max_length is None or n <= max_length) and pattern.search(text):
+                    return ""
+            return text
+        if self.type == "strip":
+            if self.prefix is not None:
+                m = self.prefix.match(text)
+                if m:
+                    text = text[m.end():]
+            if text.lstrip()[:1] in self.openers:
+                m = self.quoted.match(text)
+                if m:
+                    text = next(g for g in m.groups() if g is not None).strip()
+            return text
+        if not (text[0].isspace() or text[-1].isspace() or _NEEDS_NORMALIZE.search(text)):
+            return text
+        lines = (_SPACE_RUN.sub(" ", line).strip() for line in text.splitlines())
+        return "\n".join(line for line in lines if line)
+
+
+class PostProcessor:
+    """Ordered, compiled post-processing stages with per-stage hit counters"""
+
+    def __init__(self, stages=None):
+        self.spec = stages if stages is not None else DEFAULT_STAGES
+        self.stages = [_Stage(s) for s in self.spec]
+        self.hits = {s.name: 0 for s in self.stages}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def fresh(self):
+        """Same rules with zeroed counters, e.g. for a segment worker whose hits are merged back later"""
+        return PostProcessor(self.spec)
+
+    def apply(self, text):
+        """Filtered answer text; "" when a stage rejects it"""
+        if not text:
+            return ""
+        for stage in self.stages:
+            if not stage.enabled:
+                continue
+            out = stage.apply(text)
+            if out != text:
+                with self._lock:
+                    self.hits[stage.name] += 1
+                text = out
+                if not text:
+                    return ""
+        return text
+
+    def stats(self):
+        with self._lock:
+            return dict(self.hits)
+
+    def merge_hits(self, hits):
+        with self._lock:
+            for name, n in hits.items():
+                self.hits[name] = self.hits.get(name, 0) + n
+
+
+def load_postprocessor(config_dir):
+    """
+    PostProcessor from <config_dir>/postprocess.json, or the built-in rules when there is no file
+    Raises ValueError for an unreadable or invalid file so the caller can report it.
+    """
+    path = os.path.join(config_dir, CONFIG_FILE)
+    if not os.path.exists(path):
+        return PostProcessor()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return PostProcessor(data["stages"])
+    except (OSError, ValueError, KeyError, TypeError, re.error) as e:
+        raise ValueError(f"{path}: {e}") from e
+
+
+def format_hits(hits):
+    return " | ".join(f"{name} {n}" for name, n in hits.items())
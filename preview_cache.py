@@ -0,0 +1,340 @@
+"""
+Preview Cache Module
+Background video opening, thumbnail index and decoded-frame LRU so the preview never decodes on the GUI thread
+
+Nothing here imports Qt; the window turns the decoder callbacks into signals.
+"""
+
+import collections
+import threading
+from dataclasses import dataclass
+
+import cv2
+
+THUMB_WIDTH = 192
+THUMB_INTERVAL_S = 2.0  # One thumbnail every this many seconds of video ...
+MAX_THUMBNAILS = 720  # ... but no more than this many (~45MB at 16:9)
+NEAR_THUMB_SLOTS = 8  # A thumbnail further away than this many slots is not shown for a position
+FOCUS_RADIUS = 4  # Slots around the slider position indexed before the rest of the timeline
+FRAME_CACHE_BYTES = 192 * 1024 * 1024
+DEFER_POLL_S = 0.01
+READ_AHEAD = 8  # Frames decoded after an exact request, so stepping forward is instant
+SEQUENTIAL_SEEK = 48  # Decode forward instead of seeking when the target is at most this many frames ahead
+
+
+class FrameCache:
+    """LRU of full-resolution preview frames keyed by frame index, bounded by bytes"""
+
+    def __init__(self, max_bytes=FRAME_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._frames = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, index):
+        with self._lock:
+            frame = self._frames.get(index)
+            if frame is None:
+                self.misses += 1
+                return None
+            self._frames.move_to_end(index)
+            self.hits += 1
+            return frame
+
+    def __contains__(self, index):
+        with self._lock:
+            return index in self._frames
+
+    def put(self, index, frame):
+        with self._lock:
+            old = self._frames.pop(index, None)
+            if old is not None:
+                self.bytes -= old.nbytes
+            self._frames[index] = frame
+            self.bytes += frame.nbytes
+            while self.bytes > self.max_bytes and len(self._frames) > 1:
+                _, evicted = self._frames.popitem(last=False)
+                self.bytes -= evicted.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self.bytes = 0
+
+
+class FrameReader:
+    """VideoCapture that tracks its position, so short forward jumps decode instead of seeking"""
+
+    def __init__(self, cap, pos=0):
+        self.cap = cap
+        self.pos = pos  # Index of the frame the next read() returns; -1 when unknown
+
+    def read(self, index):
+        """Frame `index` as BGR, or None"""
+        if not 0 <= index - self.pos <= SEQUENTIAL_SEEK:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+            self.pos = index
+        while self.pos < index:
+            if not self.cap.grab():
+                self.pos = -1
+                return None
+            self.pos += 1
+        ok, frame = self.cap.read()
+        if not ok:
+            self.pos = -1
+            return None
+        self.pos += 1
+        return frame
+
+    def release(self):
+        self.cap.release()
+
+
+def coarse_to_fine(n):
+    """Slot order 0, n/2, n/4, 3n/4, ... so the whole timeline gets coarse coverage first"""
+    order = []
+    seen = bytearray(n)
+    step = 1 << max(0, (n - 1).bit_length())
+    while step:
+        for i in range(0, n, step):
+            if not seen[i]:
+                seen[i] = 1
+                order.append(i)
+        step >>= 1
+    return order
+
+
+class ThumbnailIndex:
+    """
+    Downscaled frames at regular intervals, decoded by a background thread on its own VideoCapture
+    Slots near the slider position (see focus) are filled first, then the rest coarse to fine.
+    While `defer_to()` is true (e.g. FrameDecoder.busy) no new thumbnail is started, so exact frames win the CPU.
+    """
+
+    def __init__(self, path, frame_count, fps, width=THUMB_WIDTH, interval_s=THUMB_INTERVAL_S,
+                 max_thumbnails=MAX_THUMBNAILS, defer_to=None):
+        self.path = path
+        self.defer_to = defer_to
+        self.frame_count = max(1, frame_count)
+        self.slots = max(1, min(max_thumbnails, int(self.frame_count / max(1.0, fps * interval_s))))
+        self.interval = self.frame_count / self.slots
+        self.width = width
+        self.thumbs = [None] * self.slots
+        self.filled = 0  # Slots visited, including ones that failed to decode
+        self._visited = bytearray(self.slots)
+        self.error = None
+        self._focus = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def slot_frame(self, slot):
+        return int(slot * self.interval)
+
+    def slot_of(self, index):
+        return max(0, min(self.slots - 1, int(round(index / self.interval))))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def done(self):
+        return self.filled >= self.slots
+
+    def focus(self, index):
+        """Index the slots around `index` next"""
+        self._focus = self.slot_of(index)
+
+    def nearest(self, index, max_slots=NEAR_THUMB_SLOTS):
+        """(frame index, thumbnail) of the closest indexed slot, or None"""
+        center = self.slot_of(index)
+        for d in range(max_slots + 1):
+            for slot in (center - d, center + d):
+                if 0 <= slot < self.slots and self.thumbs[slot] is not None:
+                    return self.slot_frame(slot), self.thumbs[slot]
+        return None
+
+    def _next_slot(self, order, cursor):
+        focus = self._focus
+        if focus is not None:
+            for d in range(FOCUS_RADIUS + 1):
+                for slot in (focus + d, focus - d):
+                    if 0 <= slot < self.slots and not self._visited[slot]:
+                        return slot, cursor
+            self._focus = None
+        while cursor < len(order) and self._visited[order[cursor]]:
+            cursor += 1
+        return (order[cursor], cursor + 1) if cursor < len(order) else (None, cursor)
+
+    def _run(self):
+        cap = cv2.VideoCapture(self.path)
+        if not cap.isOpened():
+            self.error = "无法打开视频"
+            return
+        reader = FrameReader(cap)
+        try:
+            order = coarse_to_fine(self.slots)
+            cursor = 0
+            while not self._stop.is_set():
+                if self.defer_to is not None and self.defer_to():
+                    self._stop.wait(DEFER_POLL_S)
+                    continue
+                slot, cursor = self._next_slot(order, cursor)
+                if slot is None:
+                    break
+                self._visited[slot] = 1
+                # None past the real end (frame counts are estimates); nearest() then uses a neighbour
+                frame = reader.read(self.slot_frame(slot))
+                if frame is not None:
+                    h, w = frame.shape[:2]
+                    self.thumbs[slot] = cv2.resize(frame, (self.width, max(1, round(h * self.width / w))),
+                                                   interpolation=cv2.INTER_AREA)
+                self.filled += 1
+        finally:
+            reader.release()
+
+
+@dataclass
+class VideoInfo:
+    """Probe results of a video opened by FrameDecoder"""
+    path: str
+    fps: float
+    frame_count: int
+    first_frame: object  # BGR ndarray
+
+    @property
+    def frame_size(self):
+        return self.first_frame.shape[1], self.first_frame.shape[0]
+
+
+class FrameDecoder:
+    """
+    Background preview decoding: owns the preview VideoCapture, opens files and decodes exact frames
+    Requests are coalesced. A new open drops every pending request, and a new seek replaces one not yet
+    started, so only the latest slider position is decoded. An open superseded before it completes is
+    dropped without a callback; otherwise the video named by the last on_opened is the one loaded. After a seek a few following frames are read
+    ahead into the FrameCache. Results go to the callbacks, which run on the decoder thread:
+        on_opened(VideoInfo), on_error(path, message), on_frame(index, frame)
+    """
+
+    def __init__(self, cache, on_opened=None, on_error=None, on_frame=None, read_ahead=READ_AHEAD):
+        self.cache = cache
+        self.read_ahead = read_ahead
+        self.on_opened = on_opened
+        self.on_error = on_error
+        self.on_frame = on_frame
+        self._reader = None
+        self._cond = threading.Condition()
+        self._open = None
+        self._wanted = None
+        self._working = False
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def open(self, path):
+        """Open `path` in the background; the current video stays loaded if it fails"""
+        with self._cond:
+            self._open = path
+            self._wanted = None
+            self._cond.notify()
+
+    def request(self, index):
+        """Decode frame `index` unless cached; replaces any request not yet started"""
+        if index in self.cache:
+            return
+        with self._cond:
+            self._wanted = index
+            self._cond.notify()
+
+    def busy(self):
+        with self._cond:
+            return self._open is not None or self._wanted is not None or self._working
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+    def _superseded(self):
+        return self._open is not None or self._wanted is not None or self._stopped
+
+    def _run(self):
+        try:
+            while True:
+                with self._cond:
+                    while self._open is None and self._wanted is None and not self._stopped:
+                        self._cond.wait()
+                    if self._stopped:
+                        return
+                    path, self._open = self._open, None
+                    index, self._wanted = (None, None) if path is not None else (self._wanted, None)
+                    self._working = True
+                try:
+                    if path is not None:
+                        self._open_video(path)
+                    elif self._reader is not None:
+                        self._decode(index)
+                finally:
+                    with self._cond:
+                        self._working = False
+        finally:
+            if self._reader is not None:
+                self._reader.release()
+
+    def _open_video(self, path):
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            self._emit(self.on_error, path, "无法打开视频")
+            return
+        ok, frame = cap.read()
+        if not ok:
+            cap.release()
+            self._emit(self.on_error, path, "无法读取视频帧")
+            return
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        info = VideoInfo(path, fps if fps > 0 else 25.0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0), frame)
+        with self._cond:
+            if self._open is not None or self._stopped:
+                # A newer open is queued; keep the current video so on_opened always names what is loaded
+                cap.release()
+                return
+        if self._reader is not None:
+            self._reader.release()
+        self._reader = FrameReader(cap, pos=1)
+        self.cache.clear()
+        self.cache.put(0, frame)
+        self._emit(self.on_opened, info)
+
+    def _decode(self, index):
+        frame = self._reader.read(index)
+        if frame is None:
+            return
+        self.cache.put(index, frame)
+        self._emit(self.on_frame, index, frame)
+        for ahead in range(index + 1, index + 1 + self.read_ahead):
+            if self._superseded():
+                break
+            if ahead in self.cache:
+                continue
+            frame = self._reader.read(ahead)
+            if frame is None:
+                break
+            self.cache.put(ahead, frame)
+
+    @staticmethod
+    def _emit(callback, *args):
+        if callback is not None:
+            callback(*args)
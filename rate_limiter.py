@@ -0,0 +1,257 @@
+"""
+Rate Limiter Module
+Client-side requests/tokens per minute and concurrency limits, shared by every engine using one API config
+"""
+
+import asyncio
+import collections
+import logging
+import threading
+import time
+
+BURST_SECONDS = 6.0  # A full bucket holds this many seconds of the per-minute budget
+STOP_POLL_S = 0.1  # How often a queued request checks should_stop
+
+log = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Refills `per_minute` units evenly. Reservations may overdraw the bucket; the caller then
+    waits until the debt has refilled, so queued requests go out in order at exactly the rate.
+    """
+
+    def __init__(self, per_minute, burst_seconds=BURST_SECONDS):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount, now):
+        """Take `amount` and return the seconds to wait before using it"""
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        self.level -= amount
+        return max(0.0, -self.level / self.rate)
+
+    def adjust(self, amount):
+        """Give back (positive) or charge (negative) units once the real cost is known"""
+        self.level = min(self.capacity, self.level + amount)
+
+
+class _Waiter:
+    __slots__ = ("event", "loop", "future", "handed")
+
+    def __init__(self, loop=None):
+        self.loop = loop
+        self.event = threading.Event() if loop is None else None
+        self.future = loop.create_future() if loop is not None else None
+        self.handed = False
+
+    def wake(self):
+        # Called with the limiter lock held; the slot now belongs to this waiter
+        self.handed = True
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class RateLimiter:
+    """
+    RPM / TPM token buckets plus a concurrency cap, usable from threads and asyncio alike
+    Requests queue instead of failing; concurrency slots are handed over first come, first served.
+    A 429 with Retry-After pauses everyone sharing the limiter.
+    """
+
+    def __init__(self, key, rpm=0, tpm=0, max_concurrency=0):
+        self.key = key
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+        self._requests = TokenBucket(rpm) if rpm else None
+        self._tokens = TokenBucket(tpm) if tpm else None
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters = collections.deque()
+        self.paused_until = 0.0
+        self.queued = 0  # Requests that had to wait
+        self.waited = 0.0  # Total seconds spent waiting
+
+    def __reduce__(self):
+        # Each process gets its own limiter from the registry (scaled by set_process_share)
+        return get_limiter, (self.key, self.rpm, self.tpm, self.max_concurrency)
+
+    def _try_slot(self, loop=None):
+        """Take a slot, or queue a waiter and return it (caller holds the lock)"""
+        if not self.max_concurrency or (self._active < self.max_concurrency and not self._waiters):
+            self._active += 1
+            return None
+        waiter = _Waiter(loop)
+        self._waiters.append(waiter)
+        return waiter
+
+    def _give_up(self, waiter):
+        """Leave the queue after a stop; a slot handed over in the meantime is passed on"""
+        with self._lock:
+            if not waiter.handed:
+                self._waiters.remove(waiter)
+                return
+        self._release_slot()
+
+    def _release_slot(self):
+        with self._lock:
+            if self._waiters:
+                self._waiters.popleft().wake()
+            else:
+                self._active -= 1
+
+    def _reserve(self, tokens):
+        with self._lock:
+            now = time.monotonic()
+            wait = 0.0
+            if self._requests is not None:
+                wait = self._requests.reserve(1, now)
+            if self._tokens is not None and tokens:
+                wait = max(wait, self._tokens.reserve(tokens, now))
+            return now + wait
+
+    def _remaining(self, ready):
+        with self._lock:
+            return max(ready, self.paused_until) - time.monotonic()
+
+    def _record(self, t0):
+        waited = time.monotonic() - t0
+        if waited > 0.001:
+            with self._lock:
+                self.queued += 1
+                self.waited += waited
+        return waited
+
+    def acquire(self, tokens=0, should_stop=None):
+        """
+        Block until a slot and the rate budget for `tokens` are free
+        Returns the seconds spent queued, or None if should_stop() turned true (nothing is held then)
+        """
+        t0 = time.monotonic()
+        with self._lock:
+            waiter = self._try_slot()
+        if waiter is not None:
+            while not waiter.event.wait(STOP_POLL_S):
+                if should_stop and should_stop():
+                    self._give_up(waiter)
+                    return None
+        ready = self._reserve(tokens)
+        while True:
+            left = self._remaining(ready)
+            if left <= 0:
+                break
+            if should_stop and should_stop():
+                self._release_slot()
+                return None
+            time.sleep(min(left, STOP_POLL_S))
+        return self._record(t0)
+
+    async def acquire_async(self, tokens=0, should_stop=None):
+        """asyncio variant of acquire"""
+        t0 = time.monotonic()
+        with self._lock:
+            waiter = self._try_slot(asyncio.get_running_loop())
+        if waiter is not None:
+            try:
+                while not waiter.future.done():
+                    await asyncio.wait((waiter.future,), timeout=STOP_POLL_S)
+                    if not waiter.future.done() and should_stop and should_stop():
+                        self._give_up(waiter)
+                        return None
+            except asyncio.CancelledError:
+                self._give_up(waiter)
+                raise
+        ready = self._reserve(tokens)
+        try:
+            while True:
+                left = self._remaining(ready)
+                if left <= 0:
+                    break
+                if should_stop and should_stop():
+                    self._release_slot()
+                    return None
+                await asyncio.sleep(min(left, STOP_POLL_S))
+        except asyncio.CancelledError:
+            self._release_slot()
+            raise
+        return self._record(t0)
+
+    def release(self, estimated_tokens=0, used_tokens=None):
+        """Free the slot; `used_tokens` from the response corrects the TPM estimate"""
+        if self._tokens is not None and used_tokens is not None:
+            with self._lock:
+                self._tokens.adjust(estimated_tokens - used_tokens)
+        self._release_slot()
+
+    def pause(self, seconds):
+        """Hold back every request sharing this limiter, e.g. for a 429 Retry-After"""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def stats(self):
+        with self._lock:
+            return {"queued": self.queued, "waited_s": round(self.waited, 3), "active": self._active,
+                    "waiting": len(self._waiters)}
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+_process_share = 1
+_process_index = 0
+
+
+def set_process_share(n, index=0):
+    """Split limits over `n` processes, this one being number `index` (segment workers call this before unpickling engines)"""
+    global _process_share, _process_index
+    _process_share = max(1, n)
+    _process_index = index % _process_share
+
+
+def split_concurrency(max_concurrency, share, index):
+    """Concurrency slots of process `index` out of `share`; the slots of all processes add up to max_concurrency"""
+    return max_concurrency // share + (1 if index < max_concurrency % share else 0)
+
+
+def concurrency_cap(engine):
+    """Most requests `engine` can have in flight under its limiters, or None when nothing caps it"""
+    members = getattr(engine, "members", None)
+    if members:
+        caps = [concurrency_cap(m.engine) for m in members]
+        return None if None in caps else sum(caps)
+    limiter = getattr(engine, "limiter", None)
+    return (limiter.max_concurrency or None) if limiter is not None else None
+
+
+def get_limiter(key, rpm=0, tpm=0, max_concurrency=0):
+    """Shared limiter for `key` (an API config id), or None when no limit is set"""
+    if not (rpm or tpm or max_concurrency):
+        return None
+    share, index = _process_share, _process_index
+    concurrency = split_concurrency(max_concurrency, share, index) if max_concurrency else 0
+    if max_concurrency and not concurrency:
+        # The extractor caps segments at the concurrency limit, so only a limit it could not see ends up here
+        log.warning("process %d of %d gets none of the %d concurrent requests allowed for %s; using 1",
+                    index + 1, share, max_concurrency, key)
+        concurrency = 1
+    limits = (rpm / share, tpm / share, concurrency)
+    with _registry_lock:
+        limiter = _registry.get((key,) + limits)
+        if limiter is None:
+            # Editing a config's limits changes the registry key, so the new limits take effect
+            limiter = _registry[(key,) + limits] = RateLimiter(key, *limits)
+        return limiter
+
+
+def limiter_for_config(cfg):
+    return get_limiter(cfg.id, cfg.rpm, cfg.tpm, cfg.max_concurrency)
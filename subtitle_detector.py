@@ -0,0 +1,114 @@
+"""
+Subtitle Detector Module
+Cheap local check for whether a crop contains subtitle text at all
+"""
+
+import cv2
+import numpy as np
+
+DEFAULT_PRESENCE_THRESHOLD = 0.35
+BRIGHT_LEVEL = 170  # Gray level from which a pixel counts as subtitle text (bright text on a dark outline)
+
+
+class SubtitlePresenceDetector:
+    """Scores crops from edge density, stroke-width regularity and bright-text-on-dark contrast
+
+    Scores are in 0..1; crops scoring below `threshold` are treated as having no
+    subtitle. The default threshold leans towards recall, since a false positive
+    only costs one model call while a false negative loses a line.
+    """
+
+    def __init__(self, threshold=DEFAULT_PRESENCE_THRESHOLD, bright_level=BRIGHT_LEVEL):
+        self.threshold = threshold
+        self.bright_level = bright_level
+
+    def features(self, image_bgr):
+        gray = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2GRAY) if image_bgr.ndim == 3 else image_bgr
+        if gray.shape[0] > 96:
+            # Feature scale doesn't need full 4K resolution
+            s = 96 / gray.shape[0]
+            gray = cv2.resize(gray, (max(1, int(gray.shape[1] * s)), 96), interpolation=cv2.INTER_AREA)
+        size = max(1, gray.size)
+        edges = cv2.Canny(gray, 100, 200)
+        edge_density = float(np.count_nonzero(edges)) / size
+
+        mask = (gray >= self.bright_level).astype(np.uint8)
+        bright_ratio = float(np.count_nonzero(mask)) / size
+        contrast = 0.0
+        stroke_mean = 0.0
+        stroke_cv = 1.0
+        if 0 < bright_ratio < 1:
+            # Compare text pixels with the ring just outside them (outline/shadow/background)
+            ring = cv2.dilate(mask, np.ones((5, 5), np.uint8)) - mask
+            if np.count_nonzero(ring):
+                contrast = float(gray[mask > 0].mean()) - float(gray[ring > 0].mean())
+            dist = cv2.distanceTransform(mask, cv2.DIST_L2, 3)
+            ridge = (dist > 0) & (dist >= cv2.dilate(dist, np.ones((3, 3), np.uint8)))
+            widths = dist[ridge] * 2
+            if widths.size >= 8:
+                stroke_mean = float(widths.mean())
+                stroke_cv = float(widths.std() / max(1e-6, stroke_mean))
+        return {
+            "edge_density": edge_density,
+            "bright_ratio": bright_ratio,
+            "contrast": contrast,
+            "stroke_width": stroke_mean,
+            "stroke_cv": stroke_cv,
+            "height": gray.shape[0],
+        }
+
+    def score(self, image_bgr):
+        f = self.features(image_bgr)
+        s_edge = min(1.0, f["edge_density"] / 0.04)
+        if 0.003 <= f["bright_ratio"] <= 0.35:
+            s_bright = 1.0
+        elif f["bright_ratio"] > 0:
+            s_bright = 0.3
+        else:
+            s_bright = 0.0
+        s_contrast = min(1.0, max(0.0, f["contrast"] / 80.0))
+        # Glyph strokes are thin relative to the strip and fairly uniform
+        thin = 0 < f["stroke_width"] <= f["height"] * 0.25
+        s_stroke = max(0.0, 1.0 - f["stroke_cv"]) if thin else 0.0
+        return 0.3 * s_edge + 0.2 * s_bright + 0.3 * s_contrast + 0.2 * s_stroke
+
+    def has_subtitle(self, image_bgr):
+        return self.score(image_bgr) >= self.threshold
+
+
+def evaluate_presence(records, threshold):
+    """
+    Precision/recall of `score >= threshold` against OCR ground truth
+    records: iterable of (score, has_text) where has_text comes from the filtered OCR result
+    """
+    tp = fp = fn = tn = 0
+    for score, has_text in records:
+        predicted = score >= threshold
+        if predicted and has_text:
+            tp += 1
+        elif predicted:
+            fp += 1
+        elif has_text:
+            fn += 1
+        else:
+            tn += 1
+    return {
+        "threshold": threshold,
+        "tp": tp, "fp": fp, "fn": fn, "tn": tn,
+        "precision": tp / (tp + fp) if tp + fp else 1.0,
+        "recall": tp / (tp + fn) if tp + fn else 1.0,
+        "skip_rate": (fn + tn) / max(1, tp + fp + fn + tn),
+    }
+
+
+def suggest_threshold(records, min_recall=0.99):
+    """Highest threshold (in 0.01 steps) that keeps recall at or above `min_recall`"""
+    records = list(records)
+    best = 0.0
+    for n in range(0, 101):
+        t = n / 100
+        if evaluate_presence(records, t)["recall"] >= min_recall:
+            best = t
+        else:
+            break
+    return best